@@ -1,33 +1,64 @@
-import sys
-import WonderPy.core.wwMain
+import math
+
+import robotCache
+import sensorFilters
+from frameHelpers import StatusLine
+
+
+# how much of each new reading the smoothed readings take.
+SMOOTHING = 0.3
+
+# the rotations are only worked out again once the smoothed readings have moved by more than this, in g.
+ROTATION_DEADBAND = 0.01
 
 
 class MyClass(object):
 
+    def __init__(self):
+        self._status = StatusLine([
+            ("x"   , "%7.2f"),
+            ("y"   , "%7.2f"),
+            ("z"   , "%7.2f"),
+            ("z_yz", "%7.2f"),
+            ("y_yz", "%7.2f"),
+            ("z_xz", "%7.2f"),
+            ("x_xz", "%7.2f"),
+            ("x_xy", "%7.2f"),
+            ("y_xy", "%7.2f"),
+        ])
+        self._x = sensorFilters.EMA(SMOOTHING)
+        self._y = sensorFilters.EMA(SMOOTHING)
+        self._z = sensorFilters.EMA(SMOOTHING)
+        self._rotated_at = None
+        self._degrees = None
+
     def on_sensors(self, robot):
         """
-        Print the raw accelerometer data along each axis.
+        Print the smoothed accelerometer data along each axis.
         Also the convenience rotation data.
         See the comments in wwSensorAccelerometer.py for details.
         """
         sensor = robot.sensors.accelerometer
-        things = [
-            ("x"   , sensor.x),
-            ("y"   , sensor.y),
-            ("z"   , sensor.z),
-            ("z_yz", sensor.degrees_z_yz()),
-            ("y_yz", sensor.degrees_y_yz()),
-            ("z_xz", sensor.degrees_z_xz()),
-            ("x_xz", sensor.degrees_x_xz()),
-            ("x_xy", sensor.degrees_x_xy()),
-            ("y_xy", sensor.degrees_y_xy()),
-        ]
-        s = ""
-        for thing in things:
-            s += "%s: %7.2f  " % (thing[0], thing[1])
-        sys.stdout.write('\r%s' % (s))
-        sys.stdout.flush()
+        x = self._x.update(sensor.x)
+        y = self._y.update(sensor.y)
+        z = self._z.update(sensor.z)
+
+        # the rotations take six lots of trig, so only redo them when the robot has actually moved.
+        # they're worked out from the smoothed readings, the same way as in wwSensorAccelerometer.py.
+        at = self._rotated_at
+        if (at is None or abs(x - at[0]) > ROTATION_DEADBAND or abs(y - at[1]) > ROTATION_DEADBAND
+                or abs(z - at[2]) > ROTATION_DEADBAND):
+            self._rotated_at = (x, y, z)
+            self._degrees = (
+                math.degrees(math.atan2(y, z)),     # z_yz
+                math.degrees(math.atan2(z, y)),     # y_yz
+                math.degrees(math.atan2(x, z)),     # z_xz
+                math.degrees(math.atan2(z, x)),     # x_xz
+                math.degrees(math.atan2(y, x)),     # x_xy
+                math.degrees(math.atan2(x, y)),     # y_xy
+            )
+        self._status.update(x, y, z, *self._degrees)
 
 
 if __name__ == "__main__":
-    WonderPy.core.wwMain.start(MyClass())
+    robotCache.start(MyClass())
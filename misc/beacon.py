@@ -1,31 +1,68 @@
-import sys
-import WonderPy.core.wwMain
 from WonderPy.core.wwConstants import WWRobotConstants
 
+from beaconTracker import BeaconTracker
+from frameHelpers import StatusLine
+import robotCache
+
 
 class MyClass(object):
 
+    def __init__(self):
+        self._status = StatusLine([
+            ("Left" , "%15s"),
+            ("raw"  , "%15s"),
+            ("Right", "%15s"),
+            ("raw"  , "%15s"),
+            ("seen" , "%-30s"),
+        ])
+        self._beacons = {}
+        self._names   = {}
+
     def on_connect(self, robot):
         if not robot.has_ability(WWRobotConstants.WWRobotAbilities.BEACON_SENSE, True):
             exit(1)
 
-        # a rolling number of sensor-events from the robot we'll analyze.
-        # smaller values here lead to less latency in reporting "no robot", but also more false-negatives.
-        robot.sensors.beacon.data_window_size = 25
+        # the robot's own filter is the 'mode' of a fixed window of readings. smaller windows report "no robot"
+        # sooner but have more false-negatives. the tracker filters the raw readings instead, with a window
+        # which shrinks while the answer is clear and grows while it's borderline.
+        self._beacons[robot] = BeaconTracker()
+
+    def _name(self, robot_type):
+        return WWRobotConstants.RobotTypeNames[robot_type] if robot_type else 'None'
+
+    def _seen(self, present):
+        # every robot type in view, with how sure the tracker is. cached, as it rarely changes.
+        key = tuple((robot_type, int(share * 10) * 10) for robot_type, share in present)
+        text = self._names.get(key)
+        if text is None:
+            text = " ".join("%s %d%%" % (self._name(robot_type), percent) for robot_type, percent in key) or 'None'
+            self._names[key] = text
+        return text
 
     def on_sensors(self, robot):
         b = robot.sensors.beacon
+        beacons = self._beacons.get(robot)
+        if beacons is None:
+            beacons = self._beacons[robot] = BeaconTracker()
+        beacons.update(b)
 
-        # filtered value is the 'mode' of the data window.
-        nl_filtered = WWRobotConstants.RobotTypeNames[b.robot_type_left ] if b.robot_type_left  else 'None'
-        nr_filtered = WWRobotConstants.RobotTypeNames[b.robot_type_right] if b.robot_type_right else 'None'
+        # filtered value is the robot type the tracker reports on that side.
+        nl_filtered = self._name(beacons.left.nearest())
+        nr_filtered = self._name(beacons.right.nearest())
 
         # filtered value is the most recent data (likely None)
-        nl_raw      = WWRobotConstants.RobotTypeNames[b.robot_type_left_raw ] if b.robot_type_left_raw   else 'None'
-        nr_raw      = WWRobotConstants.RobotTypeNames[b.robot_type_right_raw] if b.robot_type_right_raw  else 'None'
-        sys.stdout.write('\rLeft: %15s (%15s)   Right: %15s (%15s)' % (nl_filtered, nl_raw, nr_filtered, nr_raw))
-        sys.stdout.flush()
+        nl_raw      = self._name(b.robot_type_left_raw)
+        nr_raw      = self._name(b.robot_type_right_raw)
+        status = self._status
+        status.set(0, nl_filtered)
+        status.set(1, nl_raw)
+        status.set(2, nr_filtered)
+        status.set(3, nr_raw)
+        # listing every robot in view takes some work, so only when it'll be shown.
+        if status.due():
+            status.set(4, self._seen(beacons.present()))
+        status.write()
 
 
 if __name__ == "__main__":
-    WonderPy.core.wwMain.start(MyClass())
+    robotCache.start(MyClass())
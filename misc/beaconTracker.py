@@ -0,0 +1,334 @@
+"""
+Tracks which robots a robot's beacon sensor can see, from its raw readings.
+
+The robot's own filter, robot.sensors.beacon.data_window_size, reports the mode of the last N readings.
+A larger N means fewer false "None"s, because readings of a robot that is there are often missing,
+but it also means waiting longer to hear that a robot has gone, or has arrived.
+
+BeaconWindow keeps a count of each reading in a ring buffer, updated as readings come and go,
+so the mode, and the share of the window each robot type has, take the same time whatever the window size.
+It also adapts the window: it shrinks towards min_size while the answer is clear, so changes come through
+quickly, and grows towards max_size while it's borderline, gathering evidence before it decides.
+
+BeaconTracker is a pair of BeaconWindows, one for each side, fed from robot.sensors.beacon:
+
+  self.beacons = beaconTracker.BeaconTracker()
+  ...
+  self.beacons.update(robot.sensors.beacon)
+  for robot_type, confidence in self.beacons.left.present(): ...
+
+Run this file to compare it with rescanning the window each frame, on synthetic streams or a recording:
+
+  python misc/beaconTracker.py
+  python misc/beaconTracker.py --recording beacon.wwsr
+"""
+
+import argparse
+import collections
+import random
+import time
+
+from WonderPy.core.wwConstants import WWRobotConstants
+
+
+# the window starts at, and never grows past, this many readings. the same as beacon.py used before.
+MAX_WINDOW = 25
+
+# and never shrinks below this many.
+MIN_WINDOW = 6
+
+# a robot type is reported present while at least this share of the readings in the window are of it.
+PRESENT_FRACTION = 0.2
+
+# a share within this factor of PRESENT_FRACTION is borderline, and the window grows to settle it.
+BORDERLINE_FACTOR = 2.0
+
+# the robot types the synthetic streams are made of.
+ROBOT_TYPES = [WWRobotConstants.RobotType.WW_ROBOT_DASH,
+               WWRobotConstants.RobotType.WW_ROBOT_DOT,
+               WWRobotConstants.RobotType.WW_ROBOT_CUE]
+
+# time.perf_counter() is Python 3 only.
+_clock = getattr(time, 'perf_counter', time.time)
+
+
+class BeaconWindow(object):
+    """
+    the last few readings from one side of the beacon sensor. a reading is a robot type, or None.
+    """
+
+    def __init__(self, max_size=MAX_WINDOW, min_size=MIN_WINDOW, present_fraction=PRESENT_FRACTION, adaptive=True):
+        self.max_size         = max_size
+        self.min_size         = min(min_size, max_size)
+        self.present_fraction = present_fraction
+        self.adaptive         = adaptive
+        self.size             = max_size
+        self.counts           = {}
+        self._ring            = [None] * max_size
+        self._start           = 0
+        self._len             = 0
+        # readings by how many times they're in the window, so the mode is found without looking through it.
+        # each in the order they reached that count, which plain dicts don't keep before Python 3.7.
+        self._by_count        = collections.defaultdict(collections.OrderedDict)
+        self._max_count       = 0
+        self._nearest         = None
+
+    def __len__(self):
+        return self._len
+
+    def _add(self, reading):
+        n = self.counts.get(reading, 0)
+        if n:
+            del self._by_count[n][reading]
+        self.counts[reading] = n + 1
+        self._by_count[n + 1][reading] = True
+        if n + 1 > self._max_count:
+            self._max_count = n + 1
+
+    def _remove(self, reading):
+        n = self.counts[reading]
+        del self._by_count[n][reading]
+        if n == 1:
+            del self.counts[reading]
+        else:
+            self.counts[reading] = n - 1
+            self._by_count[n - 1][reading] = True
+        if n == self._max_count and not self._by_count[n]:
+            self._max_count = n - 1
+
+    def _drop_oldest(self):
+        self._remove(self._ring[self._start])
+        self._start = (self._start + 1) % self.max_size
+        self._len -= 1
+
+    def update(self, reading):
+        """
+        add a reading, dropping the oldest ones as needed, and return the mode.
+        """
+        while self._len >= self.size:
+            self._drop_oldest()
+        self._ring[(self._start + self._len) % self.max_size] = reading
+        self._len += 1
+        self._add(reading)
+        if self.adaptive:
+            self._adapt()
+        return self.mode()
+
+    def _adapt(self):
+        # at most a handful of robot types, so this is a few comparisons.
+        low  = self.present_fraction / BORDERLINE_FACTOR
+        high = self.present_fraction * BORDERLINE_FACTOR
+        borderline = False
+        for reading, n in self.counts.items():
+            if reading is not None and low * self._len < n < high * self._len:
+                borderline = True
+                break
+        if borderline:
+            if self.size < self.max_size:
+                self.size += 1
+        elif self.size > self.min_size:
+            self.size -= 1
+            if self._len > self.size:
+                self._drop_oldest()
+
+    def mode(self):
+        """
+        the most common reading in the window, as data_window_size gives. ties go to the one which got there first.
+        """
+        if self._max_count == 0:
+            return None
+        for reading in self._by_count[self._max_count]:
+            return reading
+
+    def confidence(self, reading=None):
+        """
+        the share of the window which is the given reading, or the mode.
+        """
+        if self._len == 0:
+            return 0.0
+        if reading is None and self._max_count:
+            return self._max_count / float(self._len)
+        return self.counts.get(reading, 0) / float(self._len)
+
+    def present(self):
+        """
+        every robot type seen in at least present_fraction of the window, as (robot type, share),
+        the most often seen first.
+        """
+        if self._len == 0:
+            return []
+        threshold = self.present_fraction * self._len
+        found = [(reading, n / float(self._len)) for reading, n in self.counts.items()
+                 if reading is not None and n >= threshold]
+        found.sort(key=lambda item: -item[1])
+        return found
+
+    def nearest(self):
+        """
+        the robot type seen most, if any is present, else None.
+        once reported, a robot type stays so until its share falls below half of present_fraction, so it doesn't flicker.
+        """
+        if self._len == 0:
+            self._nearest = None
+            return None
+        best = None
+        best_n = 0
+        for reading, n in self.counts.items():
+            if reading is not None and n > best_n:
+                best, best_n = reading, n
+        current = self._nearest
+        keep = self.present_fraction / BORDERLINE_FACTOR * self._len
+        if current is not None and self.counts.get(current, 0) >= keep and self.counts[current] >= best_n:
+            return current
+        if best is None or best_n < self.present_fraction * self._len:
+            best = current if current is not None and self.counts.get(current, 0) >= keep else None
+        self._nearest = best
+        return best
+
+
+class BeaconTracker(object):
+    """
+    a BeaconWindow for each side of the beacon sensor.
+    """
+
+    def __init__(self, max_size=MAX_WINDOW, min_size=MIN_WINDOW, present_fraction=PRESENT_FRACTION, adaptive=True):
+        self.left  = BeaconWindow(max_size, min_size, present_fraction, adaptive)
+        self.right = BeaconWindow(max_size, min_size, present_fraction, adaptive)
+
+    def update(self, beacon):
+        """
+        add the raw readings from robot.sensors.beacon.
+        """
+        self.left.update(beacon.robot_type_left_raw)
+        self.right.update(beacon.robot_type_right_raw)
+
+    def present(self):
+        """
+        every robot type seen on either side, with the larger of its shares.
+        """
+        found = dict(self.left.present())
+        for reading, share in self.right.present():
+            if share > found.get(reading, 0.0):
+                found[reading] = share
+        return sorted(found.items(), key=lambda item: -item[1])
+
+
+class RescanWindow(object):
+    """
+    the mode of a fixed window, counted afresh each reading. what the benchmark compares against.
+    """
+
+    def __init__(self, size=MAX_WINDOW, present_fraction=PRESENT_FRACTION):
+        self.readings = collections.deque(maxlen=size)
+        self.present_fraction = present_fraction
+
+    def update(self, reading):
+        self.readings.append(reading)
+        return self.mode()
+
+    def mode(self):
+        return collections.Counter(self.readings).most_common(1)[0][0]
+
+    def nearest(self):
+        counts = collections.Counter(r for r in self.readings if r is not None)
+        if not counts:
+            return None
+        reading, n = counts.most_common(1)[0]
+        return reading if n >= self.present_fraction * len(self.readings) else None
+
+
+def synthetic_stream(frames, seed=0, hit_rate=0.45, false_rate=0.01, mean_segment=90):
+    """
+    a list of (truth, reading): which robot type is really in view, or None, changing now and then,
+    and what the sensor reported. a robot in view is only seen in hit_rate of the frames,
+    and in false_rate of them a wrong robot type is reported.
+    """
+    rnd = random.Random(seed)
+    stream = []
+    truth = None
+    left = 0
+    for _ in range(frames):
+        if left == 0:
+            truth = rnd.choice([None, None] + ROBOT_TYPES)
+            left = max(10, int(rnd.expovariate(1.0 / mean_segment)))
+        left -= 1
+        if rnd.random() < false_rate:
+            reading = rnd.choice(ROBOT_TYPES)
+        elif truth is not None and rnd.random() < hit_rate:
+            reading = truth
+        else:
+            reading = None
+        stream.append((truth, reading))
+    return stream
+
+
+def recorded_stream(path, side):
+    """
+    the raw readings from one side, 'left' or 'right', of a sensorRecorder.py recording.
+    there's no truth for these.
+    """
+    import sensorRecorder
+
+    recording = sensorRecorder.Recording.load(path)
+    return [(None, None if value == sensorRecorder.NO_BEACON else value)
+            for value in recording.columns['beacon_%s_raw' % side]]
+
+
+def evaluate(window, stream):
+    """
+    feed a stream to a window, and return the time per reading, how many times its answer changed,
+    how many frames it was wrong, and the mean number of frames it took to catch up with a change in the truth.
+    """
+    answers = []
+    t = _clock()
+    for _, reading in stream:
+        window.update(reading)
+        answers.append(window.nearest())
+    elapsed = _clock() - t
+
+    changes = sum(1 for a, b in zip(answers, answers[1:]) if a != b)
+    wrong = sum(1 for (truth, _), answer in zip(stream, answers) if answer != truth)
+    lags = []
+    for n in range(1, len(stream)):
+        if stream[n][0] != stream[n - 1][0]:
+            truth = stream[n][0]
+            m = n
+            while m < len(stream) and stream[m][0] == truth and answers[m] != truth:
+                m += 1
+            if m < len(stream) and stream[m][0] == truth:
+                lags.append(m - n)
+    lag = sum(lags) / float(len(lags)) if lags else 0.0
+    return elapsed / max(1, len(stream)), changes, wrong, lag
+
+
+def benchmark(stream, sizes=(25, 100, 400), has_truth=True):
+    print("%d readings" % (len(stream)))
+    print("%-30s %10s %8s %8s %10s" % ("", "us/reading", "changes", "wrong", "lag frames"))
+    for size in sizes:
+        for label, window in (("rescan, window %d" % size, RescanWindow(size)),
+                              ("counted, window %d" % size, BeaconWindow(size, adaptive=False)),
+                              ("adaptive, window %d-%d" % (MIN_WINDOW, size), BeaconWindow(size))):
+            per, changes, wrong, lag = evaluate(window, stream)
+            if has_truth:
+                print("%-30s %10.2f %8d %8d %10.1f" % (label, per * 1e6, changes, wrong, lag))
+            else:
+                print("%-30s %10.2f %8d %8s %10s" % (label, per * 1e6, changes, "-", "-"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare beacon filters on synthetic or recorded readings.")
+    parser.add_argument('--recording', default=None, help='use the beacon readings in a sensorRecorder.py recording')
+    parser.add_argument('--frames', type=int, default=30000, help='how many synthetic readings')
+    parser.add_argument('--hit-rate', type=float, default=0.45, help='how often a robot in view is seen')
+    args = parser.parse_args()
+    if args.recording:
+        # each side is a window of its own, as in BeaconTracker.
+        for side in ('left', 'right'):
+            print("%s side:" % side)
+            benchmark(recorded_stream(args.recording, side), has_truth=False)
+    else:
+        benchmark(synthetic_stream(args.frames, hit_rate=args.hit_rate))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""
+Opt-in timing for an example's callbacks.
+
+Wrap an example's delegate in ProfiledDelegate and it times every on_connect and on_sensors call,
+counts the calls which went over the frame budget, counts the sensor frames which never arrived,
+and measures how long after the sensors arrived each command was staged. The times go into
+histograms with a fixed number of buckets, so recording one is a few integer operations and
+the memory used doesn't grow with the number of frames.
+
+The report is printed at exit, and whenever the process gets SIGUSR1.
+
+  python misc/callbackProfiler.py misc/headPanTilt.py
+  python misc/callbackProfiler.py misc/distance.py --replay distance.wwsr
+  python misc/callbackProfiler.py --overhead
+"""
+
+import argparse
+import atexit
+import signal
+import sys
+import time
+
+import WonderPy.core.wwBTLEMgr
+
+import robotCache
+import sensorRecorder
+
+
+# sensors arrive about 30 times per second, so on_sensors has this long before it holds up the next frame.
+FRAME_SECONDS = 1.0 / 30.0
+
+# a gap between frames longer than this many frames means frames were dropped.
+DROPPED_FRAME_GAP = 1.5
+
+# each power of two is split into 2**(SUB_BUCKET_BITS-1) buckets, so values are kept to within about 3%.
+SUB_BUCKET_BITS = 6
+
+# _clock() is Python 3 only.
+_clock = getattr(time, 'perf_counter', time.time)
+
+
+class LatencyHistogram(object):
+    """
+    a log-linear histogram of microseconds, in the style of HdrHistogram.
+    values below 2**SUB_BUCKET_BITS are exact, larger ones share buckets 1/2**(SUB_BUCKET_BITS-1) of their size.
+    """
+
+    def __init__(self, max_seconds=60.0):
+        self.count  = 0
+        self.total  = 0
+        self.max    = 0
+        self._sub   = 1 << SUB_BUCKET_BITS
+        self.counts = [0] * self._index(int(max_seconds * 1e6) + 1) + [0]
+
+    def _index(self, us):
+        e = us.bit_length() - SUB_BUCKET_BITS
+        if e <= 0:
+            return us
+        return (e << SUB_BUCKET_BITS) + (us >> e)
+
+    def _value(self, index):
+        # the largest value which lands in a bucket.
+        e = index >> SUB_BUCKET_BITS
+        if e == 0:
+            return index
+        return (((index & (self._sub - 1)) + 1) << e) - 1
+
+    def record(self, seconds):
+        us = int(seconds * 1e6)
+        self.count += 1
+        self.total += us
+        if us > self.max:
+            self.max = us
+        index = self._index(us)
+        if index >= len(self.counts):
+            index = len(self.counts) - 1
+        self.counts[index] += 1
+
+    def percentile(self, fraction):
+        """
+        the value in microseconds which fraction of the recorded values are at or below.
+        """
+        if self.count == 0:
+            return 0
+        target = max(1, int(round(fraction * self.count)))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(self._value(index), self.max)
+        return self.max
+
+    def summary(self):
+        if self.count == 0:
+            return "no calls"
+        return ("%d calls, mean %dus, p50 %dus, p99 %dus, max %dus" %
+                (self.count, self.total // self.count, self.percentile(0.5), self.percentile(0.99), self.max))
+
+
+class _TimedCommands(object):
+    """
+    stands in for robot.cmds or one of its groups, noting when each stage_ command is called.
+    """
+
+    def __init__(self, target, profiler):
+        self._target   = target
+        self._profiler = profiler
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if name.startswith('stage_'):
+            profiler = self._profiler
+
+            def staged(*args, **kwargs):
+                profiler.note_staged()
+                return attr(*args, **kwargs)
+            wrapped = staged
+        elif callable(attr):
+            wrapped = attr
+        else:
+            wrapped = _TimedCommands(attr, self._profiler)
+        # cache it, so later lookups don't come back here.
+        setattr(self, name, wrapped)
+        return wrapped
+
+
+class _ProfiledRobot(object):
+    """
+    stands in for a robot when it's passed to the example, so the commands it stages can be timed.
+    robot.cmds can't be replaced, so everything but cmds and commands comes from the robot itself.
+    """
+
+    def __init__(self, robot, profiler):
+        self._robot   = robot
+        self.cmds     = _TimedCommands(robot.cmds, profiler)
+        self.commands = self.cmds
+
+    def __getattr__(self, name):
+        return getattr(self._robot, name)
+
+
+class ProfiledDelegate(object):
+    """
+    wraps an example's delegate, timing its on_connect and on_sensors.
+    """
+
+    def __init__(self, delegate, budget_seconds=FRAME_SECONDS, report_at_exit=True):
+        self.delegate       = delegate
+        self.budget_seconds = budget_seconds
+        self.on_connect_times = LatencyHistogram()
+        self.on_sensors_times = LatencyHistogram()
+        self.staged_times     = LatencyHistogram()
+        self.overruns  = 0
+        self.dropped   = 0
+        self._arrival  = None
+        self._last_arrival = None
+        self._staged_this_frame = False
+        self._robots   = {}
+        self._has_on_connect = hasattr(delegate, 'on_connect')
+        self._has_on_sensors = hasattr(delegate, 'on_sensors')
+
+        if report_at_exit:
+            atexit.register(self.report)
+        if hasattr(signal, 'SIGUSR1'):
+            signal.signal(signal.SIGUSR1, lambda signum, frame: self.report())
+
+    def _profiled(self, robot):
+        # the stand-in holds on to the robot, so its id isn't reused while it's in here.
+        profiled = self._robots.get(id(robot))
+        if profiled is None:
+            profiled = self._robots[id(robot)] = _ProfiledRobot(robot, self)
+        return profiled
+
+    def note_staged(self):
+        # only the first command staged in a frame counts: that's how long the frame took to react.
+        if self._arrival is not None and not self._staged_this_frame:
+            self._staged_this_frame = True
+            self.staged_times.record(_clock() - self._arrival)
+
+    def on_connect(self, robot):
+        if not self._has_on_connect:
+            return
+        t = _clock()
+        self.delegate.on_connect(self._profiled(robot))
+        self.on_connect_times.record(_clock() - t)
+
+    def on_sensors(self, robot):
+        arrival = _clock()
+        if self._last_arrival is not None:
+            gap = (arrival - self._last_arrival) / FRAME_SECONDS
+            if gap > DROPPED_FRAME_GAP:
+                self.dropped += int(round(gap)) - 1
+        self._last_arrival = arrival
+        if not self._has_on_sensors:
+            return
+
+        self._arrival = arrival
+        self._staged_this_frame = False
+        self.delegate.on_sensors(self._profiled(robot))
+        elapsed = _clock() - arrival
+        self.on_sensors_times.record(elapsed)
+        if elapsed > self.budget_seconds:
+            self.overruns += 1
+        self._arrival = None
+
+    def __getattr__(self, name):
+        # pass along any other callbacks the example has.
+        return getattr(self.delegate, name)
+
+    def report(self):
+        sys.stderr.write("\n%s callbacks:\n" % (type(self.delegate).__name__))
+        sys.stderr.write("  on_connect:      %s\n" % (self.on_connect_times.summary()))
+        sys.stderr.write("  on_sensors:      %s\n" % (self.on_sensors_times.summary()))
+        sys.stderr.write("  sensors->staged: %s\n" % (self.staged_times.summary()))
+        sys.stderr.write("  over the %0.1fms budget: %d, dropped frames: %d\n" %
+                         (self.budget_seconds * 1000.0, self.overruns, self.dropped))
+        sys.stderr.flush()
+
+
+def overhead(frames=200000):
+    """
+    the cost ProfiledDelegate adds to each on_sensors call, using a handler which does nothing.
+    """
+    class Nothing(object):
+        def on_sensors(self, robot):
+            pass
+
+    robot = sensorRecorder.ReplayRobot({})
+    plain = Nothing()
+    profiled = ProfiledDelegate(Nothing(), report_at_exit=False)
+    results = []
+    for delegate in (plain, profiled):
+        t = _clock()
+        for _ in range(frames):
+            delegate.on_sensors(robot)
+        results.append((_clock() - t) / frames)
+    print("on_sensors: %0.2fus plain, %0.2fus profiled, %0.2fus overhead per frame" %
+          (results[0] * 1e6, results[1] * 1e6, (results[1] - results[0]) * 1e6))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time an example's callbacks.")
+    parser.add_argument('example', nargs='?', help='the example file, eg misc/distance.py')
+    parser.add_argument('--replay', default=None, help='replay a sensorRecorder.py recording rather than using a robot')
+    parser.add_argument('--budget-ms', type=float, default=FRAME_SECONDS * 1000.0, help='the time on_sensors may take')
+    parser.add_argument('--overhead', action='store_true', help="measure the profiler's own cost and exit")
+    WonderPy.core.wwBTLEMgr.WWBTLEManager.setup_argument_parser(parser)
+    robotCache.add_arguments(parser)
+    args = parser.parse_args()
+
+    if args.overhead:
+        overhead()
+        return
+    if args.example is None:
+        parser.error("an example is needed")
+
+    profiled = ProfiledDelegate(sensorRecorder.load_example(args.example), args.budget_ms / 1000.0)
+    if args.replay:
+        # replaying is as fast as possible, so dropped frames don't mean anything.
+        sensorRecorder.replay(profiled, sensorRecorder.Recording.load(args.replay), quiet=True)
+        profiled.dropped = 0
+    else:
+        robotCache.start(profiled, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+A layer between an example and robot.cmds which drops staged commands that wouldn't change anything.
+
+Sensor handlers typically stage the same LED colors, eyering, head angles or wheel speeds on every frame,
+whether or not they've changed. Each one costs Bluetooth bandwidth the robot could be using for
+something else. Wrapped with dedup(), a stage_ command is only passed on if its values differ from the
+ones last sent on that channel by more than the channel's epsilon, or if REFRESH_SECONDS have passed
+since they were sent, in case the robot missed them.
+
+  def on_connect(self, robot):
+      self._cmds = dedupCommands.dedup(robot)     # stage commands through self._cmds instead of robot.cmds
+
+do_ commands, and anything else, are passed straight through.
+"""
+
+import time
+
+
+# how far apart two values on a channel must be to be worth sending. channels not listed must match exactly.
+EPSILONS = {
+    "RGB"    : 1.0 / 255.0,     # color components, 0 to 1
+    "eyering": 1.0 / 255.0,     # brightness. the LEDs themselves must match exactly
+    "head"   : 0.5,             # degrees
+    "body"   : 0.5,             # cm/s, degrees/s
+}
+
+# unchanged values are sent again after this long anyway.
+REFRESH_SECONDS = 1.0
+
+
+def _freeze(value):
+    # a copy of the arguments which later changes can't reach, eg an LED list which is updated in place.
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _close(a, b, epsilon):
+    if isinstance(a, tuple):
+        if not isinstance(b, tuple) or len(a) != len(b):
+            return False
+        for x, y in zip(a, b):
+            if not _close(x, y, epsilon):
+                return False
+        return True
+    if isinstance(a, bool) or isinstance(b, bool):
+        return a == b
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)):
+        return abs(a - b) <= epsilon
+    return a == b
+
+
+class _DedupChannel(object):
+    """
+    one group of commands, eg robot.cmds.RGB. each stage_ command remembers what it last sent.
+    """
+
+    def __init__(self, target, name, owner):
+        self._target = target
+        self._name   = name
+        self._owner  = owner
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if name.startswith('stage_'):
+            attr = self._owner._deduplicated(attr, "%s.%s" % (self._name, name), self._name)
+        # cache it, so later lookups don't come back here.
+        setattr(self, name, attr)
+        return attr
+
+
+class DedupCommands(object):
+    """
+    stands in for robot.cmds. see dedup().
+    """
+
+    def __init__(self, cmds, epsilons=None, refresh_seconds=REFRESH_SECONDS):
+        self._target         = cmds
+        self.epsilons        = dict(EPSILONS if epsilons is None else epsilons)
+        self.refresh_seconds = refresh_seconds
+        self.sent            = {}
+        self.suppressed      = {}
+
+    def _deduplicated(self, command, key, channel):
+        epsilon = self.epsilons.get(channel, 0.0)
+        last = [None, 0.0]      # the arguments last sent, and when
+        self.sent[key] = 0
+        self.suppressed[key] = 0
+
+        def stage(*args, **kwargs):
+            now = time.time()
+            values = (_freeze(args), tuple(sorted(kwargs.items())))
+            if last[0] is not None and now - last[1] < self.refresh_seconds and _close(values, last[0], epsilon):
+                self.suppressed[key] += 1
+                return None
+            last[0] = values
+            last[1] = now
+            self.sent[key] += 1
+            return command(*args, **kwargs)
+        return stage
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            attr = _DedupChannel(attr, name, self)
+        setattr(self, name, attr)
+        return attr
+
+    def summary(self):
+        sent = sum(self.sent.values())
+        suppressed = sum(self.suppressed.values())
+        lines = ["staged commands: %d sent, %d suppressed" % (sent, suppressed)]
+        for key in sorted(self.sent):
+            lines.append("  %-32s %6d sent %6d suppressed" % (key, self.sent[key], self.suppressed[key]))
+        return "\n".join(lines)
+
+
+def dedup(robot, epsilons=None, refresh_seconds=REFRESH_SECONDS):
+    """
+    return a DedupCommands wrapping robot.cmds. robot.cmds can't be replaced,
+    so keep the wrapper and stage commands through it.
+    """
+    return DedupCommands(robot.cmds, epsilons, refresh_seconds)
@@ -1,12 +1,34 @@
-import sys
 from threading import Thread
-import WonderPy.core.wwMain
 from WonderPy.core.wwConstants import WWRobotConstants
 from WonderPy.util import wwMath
 
+import dedupCommands
+import robotCache
+import sensorFilters
+from frameHelpers import StatusLine
+
 
 class MyClass(object):
 
+    def __init__(self):
+        self._status = StatusLine([
+            ("front left-facing dist" , "%7.2f"),
+            ("refl"                   , "%7.2f"),
+            ("front right-facing dist", "%7.2f"),
+            ("refl"                   , "%7.2f"),
+            ("front rear dist"        , "%7.2f"),
+            ("refl"                   , "%7.2f"),
+        ])
+
+        # the raw distances jump around by a few cm from frame to frame.
+        # smooth them, and only move the head or change speed when the change is big enough to matter,
+        # so the robot isn't sent a stream of tiny corrections.
+        self._front = sensorFilters.Kalman1D(process_variance=1.0, measurement_variance=4.0)
+        self._rear  = sensorFilters.Kalman1D(process_variance=1.0, measurement_variance=4.0)
+        self._tilt  = sensorFilters.Deadband(1.0)       # degrees
+        self._speed = sensorFilters.Deadband(2.0)       # cm/s
+        self._cmds  = None
+
     def on_sensors(self, robot):
         """
         Print the distance data from each of the three distance sensors,
@@ -17,37 +39,37 @@ class MyClass(object):
         if not robot.has_ability(WWRobotConstants.WWRobotAbilities.DISTANCE_DETECT, True):
             exit(1)
 
+        # only send the head and body commands when they change.
+        if self._cmds is None:
+            self._cmds = dedupCommands.dedup(robot)
+
         flf = robot.sensors.distance_front_left_facing
         frf = robot.sensors.distance_front_right_facing
         rer = robot.sensors.distance_rear
 
         # print out the values
-        things = [
-            ("front left-facing dist" , flf.distance_approximate),
-            ("refl"                   , flf.reflectance),
-            ("front right-facing dist", frf.distance_approximate),
-            ("refl"                   , frf.reflectance),
-            ("front rear dist"        , rer.distance_approximate),
-            ("refl"                   , rer.reflectance),
-        ]
-        s = ""
-        for thing in things:
-            s += "%s: %7.2f  " % (thing[0], thing[1])
-        sys.stdout.write('\r%s' % (s))
-        sys.stdout.flush()
+        self._status.update(
+            flf.distance_approximate,
+            flf.reflectance,
+            frf.distance_approximate,
+            frf.reflectance,
+            rer.distance_approximate,
+            rer.reflectance,
+        )
 
         # move the head up/down in response to the front distance
-        front            = (flf.distance_approximate + frf.distance_approximate) * 0.5
+        front            = self._front.update((flf.distance_approximate + frf.distance_approximate) * 0.5)
+        rear             = self._rear.update(rer.distance_approximate)
         front_normalized = wwMath.inverse_lerp(0.0, 50.0, front)
         head_tilt        = wwMath.lerp(robot.head_tilt_min_deg, robot.head_tilt_max_deg, front_normalized)
-        robot.cmds.head.stage_tilt_angle(head_tilt)
+        self._cmds.head.stage_tilt_angle(self._tilt.update(head_tilt))
 
         # move the robot away from nearby obstacles
         dist_norm_front = 1.0 - wwMath.clamp01(front/10.0)
-        dist_norm_rear  = 1.0 - wwMath.clamp01(rer.distance_approximate/10.0)
+        dist_norm_rear  = 1.0 - wwMath.clamp01(rear/10.0)
         dist_norm_delta = dist_norm_rear - dist_norm_front
-        robot.cmds.body.stage_linear_angular(dist_norm_delta * 40.0, 0)
+        self._cmds.body.stage_linear_angular(self._speed.update(dist_norm_delta * 40.0), 0)
 
 
 if __name__ == "__main__":
-    WonderPy.core.wwMain.start(MyClass())
+    robotCache.start(MyClass())
@@ -0,0 +1,43 @@
+"""
+File helpers shared by the examples.
+
+replace(src, dst) - rename src over dst, for writing a file to a temporary name and then putting it in place.
+quiet()           - send sys.stdout to os.devnull for the duration of a with block.
+"""
+
+import contextlib
+import os
+import sys
+
+
+def replace(src, dst):
+    """
+    rename src to dst, replacing dst if it's there.
+    os.replace() is Python 3 only. Python 2's os.rename() replaces dst on POSIX, but not on Windows,
+    where dst is removed first. that leaves a moment with no dst, so readers must cope with it missing.
+    """
+    if hasattr(os, 'replace'):
+        os.replace(src, dst)
+        return
+    try:
+        os.rename(src, dst)
+    except OSError:
+        if not os.path.exists(dst):
+            raise
+        os.remove(dst)
+        os.rename(src, dst)
+
+
+@contextlib.contextmanager
+def quiet():
+    """
+    hide whatever is printed inside the with block. contextlib.redirect_stdout() is Python 3 only.
+    """
+    stdout = sys.stdout
+    devnull = open(os.devnull, 'w')
+    sys.stdout = devnull
+    try:
+        yield
+    finally:
+        sys.stdout = stdout
+        devnull.close()
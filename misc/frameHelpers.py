@@ -0,0 +1,190 @@
+"""
+Helpers for on_sensors handlers which run 30 times a second, per robot, for as long as the example runs.
+
+They set everything up once, so a frame reuses the same objects rather than building new lists,
+dicts and strings each time:
+
+ButtonLEDs   - a precomputed table from buttons to eyering LEDs, applied to an LED list in place.
+StatusLine   - a fixed-width status line. Only the fields whose values changed are formatted again,
+               and the line is written at most STATUS_SECONDS apart.
+
+Run this file with some examples to measure how much each of their frames allocates:
+
+  python misc/frameHelpers.py misc/accelerometer.py misc/distance.py misc/headPanTilt.py tutorial/02_sensors.py
+"""
+
+import argparse
+import math
+import sys
+import time
+
+import fileHelpers
+
+
+# the eyering has 12 LEDs. index 0 is at 12 o'clock, increasing clockwise.
+EYERING_LEDS = 12
+
+# the status line is written at most this often. the terminal can't show 30 updates a second anyway.
+STATUS_SECONDS = 0.1
+
+# the button lights 02_sensors.py uses: each minor button lights 3 LEDs, and the main one the remaining 3.
+DEFAULT_BUTTON_LEDS = (
+    ('button_1'   , ( 7, 8,  9)),
+    ('button_2'   , ( 3, 4,  5)),
+    ('button_3'   , (11, 0,  1)),
+    ('button_main', ( 2, 6, 10)),
+)
+
+
+class ButtonLEDs(object):
+    """
+    lights eyering LEDs according to which buttons are pressed.
+    """
+
+    def __init__(self, table=DEFAULT_BUTTON_LEDS):
+        self.table = tuple((name, tuple(indices)) for name, indices in table)
+        self.leds  = [False] * EYERING_LEDS
+
+    def update(self, sensors):
+        """
+        set self.leds in place from the buttons, and return it.
+        """
+        leds = self.leds
+        for name, indices in self.table:
+            pressed = getattr(sensors, name).pressed
+            for index in indices:
+                leds[index] = pressed
+        return leds
+
+
+class StatusLine(object):
+    """
+    a line of fixed-width fields, rewritten in place with '\\r'.
+    fields is a list of (label, format), eg [("x", "%7.2f"), ("y", "%7.2f")].
+    """
+
+    def __init__(self, fields, min_seconds=STATUS_SECONDS, stream=None):
+        self.labels      = [label for label, _ in fields]
+        self.formats     = [label + ": " + fmt + "  " for label, fmt in fields]
+        self.values      = [None] * len(fields)
+        self.texts       = [""] * len(fields)
+        self.changed     = [False] * len(fields)
+        self.min_seconds = min_seconds
+        self.stream      = stream
+        self._next_write = 0.0
+        self._dirty      = False
+
+    def set(self, index, value):
+        if value != self.values[index]:
+            self.values[index] = value
+            self.changed[index] = True
+            self._dirty = True
+
+    def update(self, *values):
+        """
+        set every field, in order, and write the line if it's time to.
+        """
+        for index, value in enumerate(values):
+            self.set(index, value)
+        self.write()
+
+    def due(self):
+        """
+        whether the line would be written now, for fields which are only worth working out when they'll be seen.
+        """
+        return time.time() >= self._next_write
+
+    def write(self, force=False):
+        if not self._dirty:
+            return
+        now = time.time()
+        if not force and now < self._next_write:
+            return
+        self._next_write = now + self.min_seconds
+        self._dirty = False
+        changed = self.changed
+        for index, value in enumerate(self.values):
+            if changed[index]:
+                changed[index] = False
+                self.texts[index] = self.formats[index] % (value,)
+        stream = self.stream or sys.stdout
+        stream.write('\r' + "".join(self.texts))
+        stream.flush()
+
+
+def _synthetic_recording(frames, seed=0):
+    import random
+    import sensorRecorder
+    from WonderPy.core.wwConstants import WWRobotConstants
+
+    rnd = random.Random(seed)
+    recording = sensorRecorder.Recording({'name': 'bench', 'head_pan_min_deg': -120.0, 'head_pan_max_deg': 120.0,
+                                          'head_tilt_min_deg': -7.5, 'head_tilt_max_deg': 22.5})
+    sensors = sensorRecorder.ReplaySensors()
+    for n in range(frames):
+        sensors.accelerometer.x = math.sin(n / 40.0)
+        sensors.accelerometer.y = math.cos(n / 50.0)
+        sensors.accelerometer.z = 1.0
+        for value in (sensors.distance_front_left_facing, sensors.distance_front_right_facing, sensors.distance_rear):
+            value.distance_approximate = rnd.uniform(0.0, 60.0)
+            value.reflectance = rnd.random()
+        sensors.head_pan.degrees  = (n % 240) - 120.0
+        sensors.head_tilt.degrees = (n % 30) - 7.5
+        for button in sensors._buttons:
+            button.pressed = rnd.random() < 0.1
+        sensors.beacon.robot_type_left  = None if n % 5 else WWRobotConstants.RobotType.WW_ROBOT_DASH
+        sensors.beacon.robot_type_right = None if n % 7 else WWRobotConstants.RobotType.WW_ROBOT_DOT
+        recording.add(n / 30.0, sensors)
+    return recording
+
+
+def allocations(example, frames=3000):
+    """
+    replay synthetic sensors into an example, and return the average of how far each frame takes
+    the memory in use above where it started, in bytes.
+    """
+    try:
+        import tracemalloc
+    except ImportError:
+        raise Exception("measuring allocations needs tracemalloc, which is Python 3 only")
+    import sensorRecorder
+
+    recording = _synthetic_recording(frames)
+    delegate = sensorRecorder.load_example(example)
+    robot = sensorRecorder.ReplayRobot(recording.meta)
+    with fileHelpers.quiet():
+        if hasattr(delegate, 'on_connect'):
+            delegate.on_connect(robot)
+        # the first frames set things up, so leave them out.
+        for n in range(10):
+            robot.sensors.set_frame(recording.columns, n)
+            delegate.on_sensors(robot)
+
+        tracemalloc.start()
+        total = 0
+        for n in range(10, frames):
+            robot.sensors.set_frame(recording.columns, n)
+            if hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+            else:
+                # before Python 3.9 the peak can only be reset by tracing again.
+                tracemalloc.stop()
+                tracemalloc.start()
+            before = tracemalloc.get_traced_memory()[0]
+            delegate.on_sensors(robot)
+            total += tracemalloc.get_traced_memory()[1] - before
+        tracemalloc.stop()
+    return total / float(frames - 10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure how much each of an example's frames allocates.")
+    parser.add_argument('examples', nargs='+', help='example files, eg misc/distance.py')
+    parser.add_argument('--frames', type=int, default=3000, help='how many frames to replay')
+    args = parser.parse_args()
+    for example in args.examples:
+        print("%-28s %8.0f bytes allocated at peak per frame" % (example, allocations(example, args.frames)))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,31 @@
-import sys
 import colorsys
 
-import WonderPy
 from WonderPy.core.wwConstants import WWRobotConstants
 from WonderPy.util import wwMath
 
+import dedupCommands
+from frameHelpers import StatusLine
+import robotCache
+
 
 class MyClass(object):
 
+    def __init__(self):
+        self._status = StatusLine([
+            ("pan" , "%7.2f"),
+            ("tilt", "%7.2f"),
+        ])
+        self._cmds = None
+
     def on_connect(self, robot):
         if not robot.has_ability(WWRobotConstants.WWRobotAbilities.HEAD_MOVE, True):
             exit(1)
 
+        # only send the colors when they change.
+        self._cmds = dedupCommands.dedup(robot)
+
         # turn off the eyering to show the other lights better
-        robot.cmds.eyering.stage_eyering([False] * 12, 0.0)
+        self._cmds.eyering.stage_eyering([False] * 12, 0.0)
 
         print("Turn my head this way and that!")
 
@@ -26,15 +38,7 @@ class MyClass(object):
         pan  = robot.sensors.head_pan .degrees
         tilt = robot.sensors.head_tilt.degrees
 
-        things = [
-            ("pan" , pan ),
-            ("tilt", tilt),
-        ]
-        s = ""
-        for thing in things:
-            s += "%s: %7.2f  " % (thing[0], thing[1])
-        sys.stdout.write('\r%s' % (s))
-        sys.stdout.flush()
+        self._status.update(pan, tilt)
 
         # hsv
         pan_normalized = wwMath.clamp01(wwMath.inverse_lerp(robot.head_pan_min_deg , robot.head_pan_max_deg , pan ))
@@ -49,8 +53,8 @@ class MyClass(object):
             v = 1.0
 
         r, g, b = colorsys.hsv_to_rgb(h, s, v)
-        robot.cmds.RGB.stage_all(r, g, b)
+        self._cmds.RGB.stage_all(r, g, b)
 
 
 if __name__ == "__main__":
-    WonderPy.core.wwMain.start(MyClass())
+    robotCache.start(MyClass())
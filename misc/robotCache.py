@@ -0,0 +1,374 @@
+"""
+Quicker starts for the examples: remember the last robot connected to, and connect straight back to it.
+
+WonderPy.core.wwMain.start() scans for robots before on_connect is called. Without --connect-eager
+the scan runs its full length, so that every robot nearby can be found and one chosen.
+Starting an example with robotCache.start() instead records the name, type and address of each robot
+it connects to in LAST_ROBOT_FILE, and adds a --reconnect-last option which turns that record into
+--connect-name, --connect-type and --connect-eager. The scan then ends as soon as that robot is seen.
+WonderPy's manager can only pick robots by name and type, so the address is kept for reference.
+
+  python misc/distance.py --reconnect-last
+
+start() imports WonderPy.core.wwMain itself, when it's called, so modules which only import an example,
+such as sketchSim.py and sketchPlan.py's workers, don't load WonderPy's Bluetooth manager.
+
+Run this file to measure each example's import time and time to on_connect, with a stub in place of
+WonderPy's BTLE manager which models a scan, both scanning as usual and with --reconnect-last:
+  python misc/robotCache.py
+  python misc/robotCache.py misc/sketcher.py --imports 10
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import fileHelpers
+
+
+LAST_ROBOT_FILE = os.path.join(os.path.expanduser("~"), ".wonderpy", "last_robot.json")
+
+# the stub BTLE manager's scan: how long it runs for without --connect-eager, the shortest real scan,
+# when each of the robots nearby is first seen, and how long connecting takes once a robot is chosen.
+STUB_SCAN_SECONDS    = 5.0
+STUB_CONNECT_SECONDS = 0.1
+STUB_ROBOTS          = [
+    # (seconds until seen, name, type, address)
+    (0.4, "Dash", "dash", "stub-0001"),
+    (0.7, "Dot" , "dot" , "stub-0002"),
+]
+
+EXAMPLES = ["accelerometer.py", "beacon.py", "distance.py", "headPanTilt.py", "sketcher.py", "sketchStars.py"]
+
+# the line the benchmark's child processes report their times on.
+_REPORT = "robotCache: "
+
+# written to stderr by the child just before it runs the example, so its own imports can be told apart.
+_EXAMPLE_STARTS = "robotCache: running the example"
+
+
+def _get(obj, *names):
+    for name in names:
+        obj = getattr(obj, name, None)
+        if obj is None:
+            return None
+    return obj
+
+
+def robot_type_name(robot_type):
+    """
+    the name --connect-type takes for a robot type, eg "dash". None for types it doesn't take, such as DFU robots.
+    """
+    from WonderPy.core.wwConstants import WWRobotConstants
+
+    types = WWRobotConstants.RobotType
+    return {types.WW_ROBOT_DASH: "dash", types.WW_ROBOT_DOT: "dot", types.WW_ROBOT_CUE: "cue"}.get(robot_type)
+
+
+def robot_address(robot):
+    """
+    the Bluetooth address, or the id the platform uses instead of it, of a connected robot.
+    """
+    for names in (('address',), ('_btleDevice', 'address'), ('_btleDevice', 'id')):
+        value = _get(robot, *names)
+        if value is not None:
+            return str(value)
+    return None
+
+
+def load(path=None):
+    """
+    the last robot connected to, as a dict of name, type and address, or None if there isn't one.
+    """
+    path = path or LAST_ROBOT_FILE
+    if not os.path.isfile(path):
+        return None
+    with open(path) as f:
+        try:
+            last = json.load(f)
+        except ValueError:
+            return None
+    return last if last.get("name") else None
+
+
+def save(robot, path=None):
+    """
+    remember robot as the last one connected to.
+    """
+    path = path or LAST_ROBOT_FILE
+    last = {
+        "name"   : robot.name,
+        "type"   : robot_type_name(getattr(robot, 'robot_type', None)),
+        "address": robot_address(robot),
+    }
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+    tmp = path + ".tmp"
+    with open(tmp, 'w') as f:
+        json.dump(last, f)
+    fileHelpers.replace(tmp, path)
+    return last
+
+
+class RememberRobot(object):
+    """
+    wraps an example, saving each robot it connects to.
+    """
+
+    def __init__(self, delegate, path=None):
+        self.delegate = delegate
+        self.path     = path
+
+    def on_connect(self, robot):
+        try:
+            save(robot, self.path)
+        except (OSError, TypeError) as e:
+            print("could not remember %s: %s" % (robot.name, e))
+        if hasattr(self.delegate, 'on_connect'):
+            self.delegate.on_connect(robot)
+
+    def __getattr__(self, name):
+        # pass along any other callbacks the example has.
+        return getattr(self.delegate, name)
+
+
+def add_arguments(parser):
+    parser.add_argument('--reconnect-last', action='store_true',
+                        help='connect to the last robot connected to, without waiting for the scan to finish')
+
+
+def apply(args):
+    """
+    turn --reconnect-last into the options WonderPy's BTLE manager takes. any --connect-name or --connect-type
+    given as well are kept.
+    """
+    if not getattr(args, 'reconnect_last', False):
+        return args
+    last = load()
+    if last is None:
+        print("no robot has connected yet, scanning as usual.")
+        return args
+    print("reconnecting to %s (%s, %s)" % (last["name"], last.get("type"), last.get("address")))
+    if not getattr(args, 'connect_name', None):
+        args.connect_name = [last["name"]]
+    if not getattr(args, 'connect_type', None) and last.get("type"):
+        args.connect_type = [last["type"]]
+    args.connect_eager = True
+    return args
+
+
+def start(delegate, args=None):
+    """
+    WonderPy.core.wwMain.start(), remembering the robot connected to, and with --reconnect-last.
+    args are parsed from the command line if not given. if they are, the parser should have had add_arguments().
+    """
+    import WonderPy.core.wwMain
+    import WonderPy.core.wwBTLEMgr
+
+    if args is None:
+        parser = argparse.ArgumentParser(description='Options.')
+        WonderPy.core.wwBTLEMgr.WWBTLEManager.setup_argument_parser(parser)
+        add_arguments(parser)
+        args = parser.parse_args()
+    WonderPy.core.wwMain.start(RememberRobot(delegate), apply(args))
+
+
+class StubRobot(object):
+    """
+    a connected robot for the stub manager. it takes any command, and its button is never pressed:
+    anything which waits on the robot waits forever.
+    """
+
+    def __init__(self, name, robot_type, address):
+        self.name       = name
+        self.robot_type = robot_type
+        self.address    = address
+
+    def has_ability(self, ability, warn=False):
+        return True
+
+    def __getattr__(self, name):
+        import threading
+
+        if name.startswith('block_until'):
+            return lambda *args, **kwargs: threading.Event().wait()
+        return _StubCommands()
+
+
+class _StubCommands(object):
+
+    def __getattr__(self, name):
+        return self
+
+    def __call__(self, *args, **kwargs):
+        return None
+
+
+class StubManager(object):
+    """
+    stands in for WonderPy.core.wwMain.start() and its BTLE manager, for the benchmark.
+    it waits as a scan would, calls on_connect with a StubRobot, and reports when it did, and then ends the process.
+    """
+
+    def __init__(self, launched):
+        self.launched = launched
+
+    def _report(self, **times):
+        sys.__stdout__.write(_REPORT + json.dumps(times) + "\n")
+        sys.__stdout__.flush()
+
+    def start(self, delegate, args=None):
+        from WonderPy.core.wwConstants import WWRobotConstants
+
+        started = time.time()
+        names = getattr(args, 'connect_name', None)
+        types = getattr(args, 'connect_type', None)
+        eager = getattr(args, 'connect_eager', False)
+        found = [r for r in STUB_ROBOTS if (not names or r[1] in names) and (not types or r[2] in types)]
+        if not found:
+            self._report(error="no robot matches")
+            os._exit(1)
+        seen, name, type_name, address = found[0]
+        # eagerly, the first robot which matches is taken as soon as it's seen. otherwise the scan runs its course.
+        wait = seen if eager else max(seen, STUB_SCAN_SECONDS)
+        time.sleep(wait + STUB_CONNECT_SECONDS)
+        robot_type = [k for k in WWRobotConstants.RobotTypeNames if robot_type_name(k) == type_name][0]
+        robot = StubRobot(name, robot_type, address)
+        connected = time.time()
+        delegate.on_connect(robot)
+        self._report(imported=started - self.launched, connected=connected - self.launched,
+                     returned=time.time() - self.launched)
+        os._exit(0)
+
+
+def _child(cache_file, launched, scan_seconds, example, argv):
+    """
+    run an example as __main__ in this process, with the stub manager in place of the BTLE manager.
+    """
+    # runpy imports pkgutil the first time it runs a file. it's imported here so it isn't counted against the example.
+    import pkgutil
+    import runpy
+    import WonderPy.core.wwMain
+
+    global LAST_ROBOT_FILE, STUB_SCAN_SECONDS
+    LAST_ROBOT_FILE   = cache_file
+    STUB_SCAN_SECONDS = scan_seconds
+    WonderPy.core.wwMain.start = StubManager(launched).start
+    # the example imports this file as robotCache, which is a different module from this __main__.
+    sys.modules['robotCache'] = sys.modules[__name__]
+    sys.path.insert(0, os.path.dirname(os.path.abspath(example)))
+    sys.argv = [example] + argv
+    sys.stderr.write(_EXAMPLE_STARTS + "\n")
+    sys.stderr.flush()
+    runpy.run_path(example, run_name='__main__')
+    # the example returned without connecting.
+    sys.__stdout__.write(_REPORT + json.dumps({"error": "start() was not called"}) + "\n")
+
+
+def launch(example, argv, cache_file, python_flags=()):
+    """
+    run an example against the stub manager in a new process.
+    returns (the times it reported, what it wrote to stderr).
+    """
+    import subprocess
+
+    launched = time.time()
+    command = [sys.executable] + list(python_flags) + [os.path.abspath(__file__), '--child', cache_file,
+                                                       repr(launched), repr(STUB_SCAN_SECONDS), example] + list(argv)
+    # subprocess.run() is Python 3 only.
+    child = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    stdout, stderr = child.communicate()
+    for line in stdout.splitlines():
+        if line.startswith(_REPORT):
+            return json.loads(line[len(_REPORT):]), stderr
+    return {"error": (stderr.strip().splitlines() or ["no report"])[-1]}, stderr
+
+
+def slowest_imports(importtime, count):
+    """
+    the count slowest imports made directly by the example, from python -X importtime's output, in ms.
+    """
+    top = []
+    lines = importtime.splitlines()
+    if _EXAMPLE_STARTS in lines:
+        lines = lines[lines.index(_EXAMPLE_STARTS) + 1:]
+    for line in lines:
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit() or name.startswith("  "):
+            continue
+        top.append((int(cumulative) / 1000.0, name.strip()))
+    return sorted(top, reverse=True)[:count]
+
+
+def _median(values):
+    # statistics.median() is Python 3 only.
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2.0
+
+
+def benchmark(examples, runs=3, imports=0):
+    # only the benchmark needs this, so the examples don't wait for it.
+    import tempfile
+
+    print("stub scan: %0.1fs, or until the robot is seen after %0.1fs with --reconnect-last. connecting: %0.1fs" %
+          (STUB_SCAN_SECONDS, STUB_ROBOTS[0][0], STUB_CONNECT_SECONDS))
+    print("%-20s %-16s %12s %14s" % ("example", "", "imports ms", "on_connect ms"))
+    directory = tempfile.mkdtemp()
+    cache_file = os.path.join(directory, "last_robot.json")
+    for example in examples:
+        for mode, argv in (("scan", []), ("reconnect-last", ['--reconnect-last'])):
+            if mode == "scan" and os.path.isfile(cache_file):
+                os.remove(cache_file)
+            times = []
+            for _ in range(runs):
+                result, _ = launch(example, argv, cache_file)
+                if "error" in result:
+                    print("%-20s %-16s %s" % (os.path.basename(example), mode, result["error"]))
+                    break
+                times.append(result)
+            if len(times) == runs:
+                print("%-20s %-16s %12.0f %14.0f" %
+                      (os.path.basename(example), mode,
+                       _median(t["imported"] for t in times) * 1000.0,
+                       _median(t["connected"] for t in times) * 1000.0))
+        if imports:
+            _, stderr = launch(example, [], cache_file, ['-X', 'importtime'])
+            for ms, name in slowest_imports(stderr, imports):
+                print("%20s %-28s %8.1f" % ("", name, ms))
+    if os.path.isfile(cache_file):
+        os.remove(cache_file)
+    os.rmdir(directory)
+
+
+def main():
+    if len(sys.argv) > 5 and sys.argv[1] == '--child':
+        _child(sys.argv[2], float(sys.argv[3]), float(sys.argv[4]), sys.argv[5], sys.argv[6:])
+        return
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Time the examples' imports and connection, against a stub robot.")
+    parser.add_argument('examples', metavar='example.py', nargs='*',
+                        default=[os.path.join(here, name) for name in EXAMPLES], help='the examples to run')
+    parser.add_argument('--runs', metavar='N', type=int, default=3, help='run each example this many times')
+    parser.add_argument('--imports', metavar='N', type=int, default=0,
+                        help="also list each example's N slowest imports")
+    parser.add_argument('--scan-seconds', metavar='s', type=float, help='how long the stub scan runs for')
+    args = parser.parse_args()
+    if args.imports and sys.version_info < (3, 7):
+        parser.error("--imports needs python -X importtime, which is Python 3.7 or later")
+    if args.scan_seconds is not None:
+        global STUB_SCAN_SECONDS
+        STUB_SCAN_SECONDS = args.scan_seconds
+    benchmark(args.examples, args.runs, args.imports)
+
+
+if __name__ == "__main__":
+    main()
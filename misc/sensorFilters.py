@@ -0,0 +1,219 @@
+"""
+Streaming filters for sensor values, for smoothing them in on_sensors before acting on them.
+
+Each filter takes one sample at a time with update(value), which does a fixed amount of work per sample,
+and returns the filtered value. batch(values) runs the same filter over a whole
+recorded stream at once, carrying on from the filter's current state, using numpy if it's installed.
+
+EMA           - exponential moving average. smooth, cheap, lags a little.
+MovingMedian  - the median of the last few samples. removes spikes without blurring steps.
+Kalman1D      - a one-dimensional Kalman filter for a slowly changing value measured with noise.
+Deadband      - holds its output until the input moves more than a set amount. stops tiny corrections.
+Hysteresis    - an on/off switch with separate on and off thresholds, so it doesn't chatter.
+
+  self.front = sensorFilters.Kalman1D(process_variance=0.5, measurement_variance=4.0)
+  ...
+  front = self.front.update(robot.sensors.distance_front_left_facing.distance_approximate)
+"""
+
+import bisect
+import math
+
+
+_np = False
+
+
+def _numpy():
+    """
+    numpy, imported the first time a batch needs it, so the examples which only call update() don't wait for it.
+    None if it isn't installed.
+    """
+    global _np
+    if _np is False:
+        try:
+            import numpy
+            _np = numpy
+        except ImportError:
+            _np = None
+    return _np
+
+
+class EMA(object):
+
+    def __init__(self, alpha, value=None):
+        """
+        alpha is how much of each new sample is taken, from 0 (never change) to 1 (no smoothing).
+        """
+        self.alpha = alpha
+        self.value = value
+
+    def update(self, x):
+        if self.value is None:
+            self.value = x
+        else:
+            self.value += self.alpha * (x - self.value)
+        return self.value
+
+    def batch(self, values):
+        np = _numpy()
+        if np is None:
+            return [self.update(x) for x in values]
+        x = np.asarray(values, dtype=float)
+        if len(x) == 0:
+            return x
+        if self.value is None:
+            self.value = x[0]
+        out = np.empty_like(x)
+        # y[n] = d**n * (y[-1] + a * sum(x[k] / d**k)). done in blocks so d**k stays representable.
+        a, d = self.alpha, 1.0 - self.alpha
+        block = max(1, min(64, int(250.0 / max(-math.log10(d), 1e-9)))) if d > 0.0 else len(x)
+        start = 0
+        while start < len(x):
+            chunk = x[start:start + block]
+            if d > 0.0:
+                powers = d ** np.arange(1, len(chunk) + 1)
+                out[start:start + len(chunk)] = powers * (self.value + a * np.cumsum(chunk / powers))
+            else:
+                out[start:start + len(chunk)] = chunk
+            self.value = out[start + len(chunk) - 1]
+            start += len(chunk)
+        return out
+
+
+class MovingMedian(object):
+
+    def __init__(self, window):
+        self.window  = window
+        self._ring   = [0.0] * window
+        self._sorted = []
+        self._next   = 0
+
+    def update(self, x):
+        if len(self._sorted) == self.window:
+            # the sorted window is at most a few samples long, so removing and inserting is a short memmove.
+            old = self._ring[self._next]
+            del self._sorted[bisect.bisect_left(self._sorted, old)]
+        self._ring[self._next] = x
+        self._next = (self._next + 1) % self.window
+        bisect.insort(self._sorted, x)
+        n = len(self._sorted)
+        if n % 2:
+            return self._sorted[n // 2]
+        return 0.5 * (self._sorted[n // 2 - 1] + self._sorted[n // 2])
+
+    def batch(self, values):
+        np = _numpy()
+        if np is None or len(values) < self.window:
+            return [self.update(x) for x in values]
+        x = np.asarray(values, dtype=float)
+        # the first few need the samples already in the window, so go one at a time until it's full of new ones.
+        head = [self.update(v) for v in x[:self.window - 1]]
+        # a view with one row per window. sliding_window_view() would do, but needs numpy 1.20.
+        windows = np.lib.stride_tricks.as_strided(x, shape=(len(x) - self.window + 1, self.window),
+                                                  strides=(x.strides[0], x.strides[0]))
+        out = np.concatenate([np.asarray(head, dtype=float), np.median(windows, axis=1)])
+        for v in x[-self.window:]:
+            self.update(v)
+        return out
+
+
+class Kalman1D(object):
+
+    def __init__(self, process_variance, measurement_variance, value=None, variance=None):
+        """
+        process_variance is how much the true value may change between samples,
+        measurement_variance how noisy each sample is.
+        """
+        self.q = process_variance
+        self.r = measurement_variance
+        self.value = value
+        self.variance = measurement_variance if variance is None else variance
+
+    def _gain(self):
+        p = self.variance + self.q
+        k = p / (p + self.r)
+        self.variance = (1.0 - k) * p
+        return k
+
+    def update(self, x):
+        if self.value is None:
+            self.value = x
+            return x
+        self.value += self._gain() * (x - self.value)
+        return self.value
+
+    def batch(self, values):
+        np = _numpy()
+        if np is None:
+            return [self.update(x) for x in values]
+        x = np.asarray(values, dtype=float)
+        out = np.empty_like(x)
+        n = 0
+        # the gains don't depend on the samples, and settle within a few dozen samples,
+        # after which this is an EMA with the settled gain.
+        while n < len(x):
+            if self.value is None:
+                self.value = x[n]
+            else:
+                last = self.variance
+                k = self._gain()
+                self.value += k * (x[n] - self.value)
+                if abs(self.variance - last) < 1e-12 * max(last, 1e-12):
+                    out[n] = self.value
+                    n += 1
+                    break
+            out[n] = self.value
+            n += 1
+        if n < len(x):
+            ema = EMA(k, self.value)
+            out[n:] = ema.batch(x[n:])
+            self.value = ema.value
+        return out
+
+
+class Deadband(object):
+
+    def __init__(self, width, value=None):
+        self.width = width
+        self.value = value
+
+    def update(self, x):
+        if self.value is None or abs(x - self.value) > self.width:
+            self.value = x
+        return self.value
+
+    def batch(self, values):
+        return [self.update(x) for x in values]
+
+
+class Hysteresis(object):
+
+    def __init__(self, low, high, on=False):
+        """
+        turns on when the input goes above high, and off again when it goes below low.
+        """
+        self.low  = low
+        self.high = high
+        self.on   = on
+
+    def update(self, x):
+        if self.on:
+            if x < self.low:
+                self.on = False
+        elif x > self.high:
+            self.on = True
+        return self.on
+
+    def batch(self, values):
+        np = _numpy()
+        if np is None:
+            return [self.update(x) for x in values]
+        x = np.asarray(values, dtype=float)
+        # +1 where a sample switches it on, -1 where it switches off, 0 in between: the state is the last switch.
+        switch = np.where(x > self.high, 1, np.where(x < self.low, -1, 0))
+        index = np.where(switch != 0, np.arange(len(x)), -1)
+        last = np.maximum.accumulate(index)
+        out = np.where(last < 0, self.on, switch[np.maximum(last, 0)] > 0)
+        if len(x):
+            self.on = bool(out[-1])
+        return out
@@ -0,0 +1,413 @@
+"""
+Records a robot's sensors to a file, and replays them into any example's on_sensors, without a robot.
+
+Recording wraps an example: it runs as usual against the real robot, and each set of sensors it's given
+is also saved, with its time. The file is columnar: one typed array per field, so an hour at 30Hz
+is a few megabytes and loads in one read per column.
+
+  python misc/sensorRecorder.py record misc/distance.py --out distance.wwsr
+  python misc/sensorRecorder.py replay misc/distance.py distance.wwsr --realtime
+  python misc/sensorRecorder.py replay misc/distance.py distance.wwsr --repeat 10 --quiet
+
+Replaying feeds each recorded frame to the example's on_sensors, either at the recorded pace
+or as fast as possible, and reports how long on_sensors took per frame.
+The replayed robot accepts any command and just counts them.
+"""
+
+import argparse
+import array
+import json
+import math
+import os
+import struct
+import sys
+import time
+
+try:
+    from importlib.util import spec_from_file_location, module_from_spec
+except ImportError:     # Python 2
+    import imp
+    spec_from_file_location = None
+
+import WonderPy.core.wwBTLEMgr
+
+import fileHelpers
+import robotCache
+
+
+MAGIC = b'WWSR'
+VERSION = 1
+
+_HEADER = struct.Struct('<4sIII')   # magic, version, frame count, metadata length
+
+NAN = float('nan')
+
+# robots without a sensor record NaN, or -1 for the beacon, in its columns.
+# the beacon columns hold WWRobotConstants.RobotType values, eg 1001 for Dash, so they're 16 bit.
+NO_BEACON = -1
+
+# time.perf_counter() is Python 3 only.
+_clock = getattr(time, 'perf_counter', time.time)
+
+
+def _get(obj, *names):
+    for name in names:
+        obj = getattr(obj, name, None)
+        if obj is None:
+            return None
+    return obj
+
+
+def _f(value):
+    return NAN if value is None else value
+
+
+def _beacon(value):
+    return NO_BEACON if value is None else value
+
+
+def _buttons(sensors):
+    bits = 0
+    for n, name in enumerate(('button_main', 'button_1', 'button_2', 'button_3')):
+        if _get(sensors, name, 'pressed'):
+            bits |= 1 << n
+    return bits
+
+
+# (column, array typecode, function of robot.sensors)
+COLUMNS = [
+    ('accel_x'          , 'f', lambda s: _f(_get(s, 'accelerometer', 'x'))),
+    ('accel_y'          , 'f', lambda s: _f(_get(s, 'accelerometer', 'y'))),
+    ('accel_z'          , 'f', lambda s: _f(_get(s, 'accelerometer', 'z'))),
+    ('dist_fl'          , 'f', lambda s: _f(_get(s, 'distance_front_left_facing' , 'distance_approximate'))),
+    ('refl_fl'          , 'f', lambda s: _f(_get(s, 'distance_front_left_facing' , 'reflectance'))),
+    ('dist_fr'          , 'f', lambda s: _f(_get(s, 'distance_front_right_facing', 'distance_approximate'))),
+    ('refl_fr'          , 'f', lambda s: _f(_get(s, 'distance_front_right_facing', 'reflectance'))),
+    ('dist_rear'        , 'f', lambda s: _f(_get(s, 'distance_rear', 'distance_approximate'))),
+    ('refl_rear'        , 'f', lambda s: _f(_get(s, 'distance_rear', 'reflectance'))),
+    ('head_pan'         , 'f', lambda s: _f(_get(s, 'head_pan' , 'degrees'))),
+    ('head_tilt'        , 'f', lambda s: _f(_get(s, 'head_tilt', 'degrees'))),
+    ('buttons'          , 'B', _buttons),
+    ('beacon_left'      , 'h', lambda s: _beacon(_get(s, 'beacon', 'robot_type_left'))),
+    ('beacon_right'     , 'h', lambda s: _beacon(_get(s, 'beacon', 'robot_type_right'))),
+    ('beacon_left_raw'  , 'h', lambda s: _beacon(_get(s, 'beacon', 'robot_type_left_raw'))),
+    ('beacon_right_raw' , 'h', lambda s: _beacon(_get(s, 'beacon', 'robot_type_right_raw'))),
+]
+
+# robot attributes the examples use, saved once with the recording.
+ROBOT_ATTRIBUTES = ['name', 'head_pan_min_deg', 'head_pan_max_deg', 'head_tilt_min_deg', 'head_tilt_max_deg']
+
+
+class Recording(object):
+
+    def __init__(self, meta=None):
+        self.meta    = meta or {}
+        self.times   = array.array('d')
+        self.columns = dict((name, array.array(code)) for name, code, _ in COLUMNS)
+
+    def __len__(self):
+        return len(self.times)
+
+    def add(self, t, sensors):
+        self.times.append(t)
+        for name, _, getter in COLUMNS:
+            self.columns[name].append(getter(sensors))
+
+    def save(self, path):
+        """
+        write the recording, via a temporary file so a half-written one never replaces a good one.
+        """
+        meta = dict(self.meta)
+        meta['columns'] = [(name, code) for name, code, _ in COLUMNS]
+        meta_bytes = json.dumps(meta).encode('utf-8')
+        tmp = path + ".tmp"
+        with open(tmp, 'wb') as f:
+            f.write(_HEADER.pack(MAGIC, VERSION, len(self.times), len(meta_bytes)))
+            f.write(meta_bytes)
+            self.times.tofile(f)
+            for name, _, _ in COLUMNS:
+                self.columns[name].tofile(f)
+        fileHelpers.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            magic, version, count, meta_len = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError("%s is not a version %d sensor recording" % (path, VERSION))
+            meta = json.loads(f.read(meta_len).decode('utf-8'))
+            recording = cls(meta)
+            recording.times.fromfile(f, count)
+            recording.columns = {}
+            for name, code in meta.pop('columns'):
+                recording.columns[name] = array.array(code)
+                recording.columns[name].fromfile(f, count)
+        return recording
+
+
+class Recorder(object):
+    """
+    wraps an example, recording the sensors it's given.
+    """
+
+    def __init__(self, delegate, path, save_seconds=10.0):
+        self.delegate     = delegate
+        self.path         = path
+        self.save_seconds = save_seconds
+        self.recording    = Recording()
+        self._start       = None
+        self._last_save   = 0.0
+
+    def on_connect(self, robot):
+        self.recording.meta = dict((name, getattr(robot, name, None)) for name in ROBOT_ATTRIBUTES)
+        if hasattr(self.delegate, 'on_connect'):
+            self.delegate.on_connect(robot)
+
+    def on_sensors(self, robot):
+        now = time.time()
+        if self._start is None:
+            self._start = now
+        self.recording.add(now - self._start, robot.sensors)
+
+        # save as we go, since the usual way to stop is ctrl-c.
+        if now - self._last_save > self.save_seconds:
+            self._last_save = now
+            self.recording.save(self.path)
+
+        if hasattr(self.delegate, 'on_sensors'):
+            self.delegate.on_sensors(robot)
+
+    def __getattr__(self, name):
+        # pass along any other callbacks the example has.
+        return getattr(self.delegate, name)
+
+
+# the replayed sensors. each is one object whose values are swapped in for every frame,
+# so replaying doesn't allocate.
+
+class _Value(object):
+    pass
+
+
+class _Button(object):
+
+    def __init__(self):
+        self.pressed = False
+
+
+class _Accelerometer(object):
+    """
+    the recorded x, y, z, with rotations worked out from them.
+    """
+
+    def __init__(self):
+        self.x = 0.0
+        self.y = 0.0
+        self.z = 0.0
+
+    # the same as WonderPy's WWSensorAccelerometer.
+
+    def degrees_z_yz(self):
+        return math.degrees(math.atan2(self.y, self.z))
+
+    def degrees_y_yz(self):
+        return math.degrees(math.atan2(self.z, self.y))
+
+    def degrees_z_xz(self):
+        return math.degrees(math.atan2(self.x, self.z))
+
+    def degrees_x_xz(self):
+        return math.degrees(math.atan2(self.z, self.x))
+
+    def degrees_y_xy(self):
+        return math.degrees(math.atan2(self.x, self.y))
+
+    def degrees_x_xy(self):
+        return math.degrees(math.atan2(self.y, self.x))
+
+
+class _Beacon(object):
+
+    def __init__(self):
+        self.data_window_size    = 0
+        self.robot_type_left     = None
+        self.robot_type_right    = None
+        self.robot_type_left_raw = None
+        self.robot_type_right_raw = None
+
+
+class ReplaySensors(object):
+
+    def __init__(self):
+        self.accelerometer               = _Accelerometer()
+        self.distance_front_left_facing  = _Value()
+        self.distance_front_right_facing = _Value()
+        self.distance_rear               = _Value()
+        self.head_pan                    = _Value()
+        self.head_tilt                   = _Value()
+        self.beacon                      = _Beacon()
+        self.button_main                 = _Button()
+        self.button_1                    = _Button()
+        self.button_2                    = _Button()
+        self.button_3                    = _Button()
+        self._buttons = (self.button_main, self.button_1, self.button_2, self.button_3)
+
+    def set_frame(self, columns, n):
+        c = columns
+        self.accelerometer.x = c['accel_x'][n]
+        self.accelerometer.y = c['accel_y'][n]
+        self.accelerometer.z = c['accel_z'][n]
+        self.distance_front_left_facing.distance_approximate  = c['dist_fl'][n]
+        self.distance_front_left_facing.reflectance           = c['refl_fl'][n]
+        self.distance_front_right_facing.distance_approximate = c['dist_fr'][n]
+        self.distance_front_right_facing.reflectance          = c['refl_fr'][n]
+        self.distance_rear.distance_approximate               = c['dist_rear'][n]
+        self.distance_rear.reflectance                        = c['refl_rear'][n]
+        self.head_pan.degrees  = c['head_pan'][n]
+        self.head_tilt.degrees = c['head_tilt'][n]
+        bits = c['buttons'][n]
+        for k, button in enumerate(self._buttons):
+            button.pressed = bool(bits & (1 << k))
+        for attr, name in (('robot_type_left', 'beacon_left'), ('robot_type_right', 'beacon_right'),
+                           ('robot_type_left_raw', 'beacon_left_raw'), ('robot_type_right_raw', 'beacon_right_raw')):
+            value = c[name][n]
+            setattr(self.beacon, attr, None if value == NO_BEACON else value)
+
+
+class _Commands(object):
+    """
+    accepts any robot command, eg robot.cmds.eyering.stage_eyering(..), and counts it.
+    """
+
+    def __init__(self, counts, prefix=""):
+        self._counts = counts
+        self._prefix = prefix
+
+    def __getattr__(self, name):
+        if name.startswith('stage_') or name.startswith('do_'):
+            key = self._prefix + name
+
+            def command(*args, **kwargs):
+                self._counts[key] = self._counts.get(key, 0) + 1
+            attr = command
+        else:
+            attr = _Commands(self._counts, self._prefix + name + ".")
+        # cache it, so later lookups don't come back here.
+        setattr(self, name, attr)
+        return attr
+
+
+class ReplayRobot(object):
+
+    def __init__(self, meta):
+        self.sensors        = ReplaySensors()
+        self.command_counts = {}
+        self.cmds           = _Commands(self.command_counts)
+        self.commands       = self.cmds
+        for name in ROBOT_ATTRIBUTES:
+            setattr(self, name, meta.get(name))
+        if self.name is None:
+            self.name = "replay"
+
+    def has_ability(self, ability, warn=False):
+        return True
+
+
+def load_example(path, class_name="MyClass"):
+    """
+    import an example file without running it, and return a new instance of its delegate class.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
+    name = os.path.splitext(os.path.basename(path))[0]
+    if spec_from_file_location is None:
+        module = imp.load_source(name, path)
+    else:
+        spec = spec_from_file_location(name, path)
+        module = module_from_spec(spec)
+        spec.loader.exec_module(module)
+    return getattr(module, class_name)()
+
+
+def _replay_frames(delegate, robot, recording, realtime, repeat):
+    costs = []
+    for _ in range(repeat):
+        start = time.time()
+        for n in range(len(recording)):
+            if realtime:
+                wait = start + recording.times[n] - time.time()
+                if wait > 0:
+                    time.sleep(wait)
+            robot.sensors.set_frame(recording.columns, n)
+            t = _clock()
+            delegate.on_sensors(robot)
+            costs.append(_clock() - t)
+    return costs
+
+
+def replay(delegate, recording, realtime=False, repeat=1, quiet=False):
+    """
+    feed each frame of the recording to delegate.on_sensors.
+    returns the time each call took, in seconds.
+    """
+    robot = ReplayRobot(recording.meta)
+    if hasattr(delegate, 'on_connect'):
+        delegate.on_connect(robot)
+
+    if quiet:
+        with fileHelpers.quiet():
+            costs = _replay_frames(delegate, robot, recording, realtime, repeat)
+    else:
+        costs = _replay_frames(delegate, robot, recording, realtime, repeat)
+    return costs, robot.command_counts
+
+
+def report(costs, command_counts):
+    if not costs:
+        print("no frames replayed")
+        return
+    values = sorted(costs)
+
+    def pct(fraction):
+        return values[min(len(values) - 1, int(fraction * len(values)))] * 1e6
+
+    print("\n%d frames: mean %0.1fus  p50 %0.1fus  p99 %0.1fus  max %0.1fus per on_sensors" %
+          (len(values), sum(values) / len(values) * 1e6, pct(0.5), pct(0.99), values[-1] * 1e6))
+    for name in sorted(command_counts):
+        print("  %-40s %d" % (name, command_counts[name]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Record sensors from a robot, or replay them into an example.')
+    sub = parser.add_subparsers(dest='mode')
+    rec = sub.add_parser('record', help='run an example against the robot, recording its sensors')
+    rec.add_argument('example', help='the example file, eg misc/distance.py')
+    rec.add_argument('--out', default='sensors.wwsr', help='the recording to write')
+    WonderPy.core.wwBTLEMgr.WWBTLEManager.setup_argument_parser(rec)
+    robotCache.add_arguments(rec)
+    rep = sub.add_parser('replay', help='replay a recording into an example')
+    rep.add_argument('example', help='the example file, eg misc/distance.py')
+    rep.add_argument('recording', help='the recording to replay')
+    rep.add_argument('--realtime', action='store_true', help='replay at the recorded pace, not as fast as possible')
+    rep.add_argument('--repeat', type=int, default=1, help='replay the recording this many times')
+    rep.add_argument('--quiet', action='store_true', help="hide the example's output")
+    args = parser.parse_args()
+
+    if args.mode == 'record':
+        recorder = Recorder(load_example(args.example), args.out)
+        try:
+            robotCache.start(recorder, args)
+        finally:
+            recorder.recording.save(args.out)
+            print("\nrecorded %d frames to %s" % (len(recorder.recording), args.out))
+    elif args.mode == 'replay':
+        recording = Recording.load(args.recording)
+        costs, counts = replay(load_example(args.example), recording, args.realtime, args.repeat, args.quiet)
+        report(costs, counts)
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+A cache of resampled SVG geometry for the sketcher.
+
+Parsing and resampling an SVG with svgpathtools can take seconds for complex files,
+and the sketcher used to redo that work before every drawing.
+This caches the resulting lists of robot points in two places:
+
+* in memory, in a small least-recently-used table, for repeated draws in one session.
+* on disk, in a compact binary file which is memory-mapped when it's read back.
+
+Entries are keyed by a hash of the file's contents plus the bounding box and sampling distance,
+so editing the SVG or changing the options simply misses the cache.
+Writing a new entry for a file removes any older entries for that same file.
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections import OrderedDict
+
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".wonderpy", "sketch_cache")
+
+# how many drawings to keep in memory.
+LRU_SIZE = 8
+
+# bump this if the file format or the meaning of the cached points changes.
+CACHE_VERSION = 1
+
+_MAGIC  = b'WWSC'
+_HEADER = struct.Struct('<4sII')    # magic, version, number of strokes
+
+
+def _file_digest(filename):
+    h = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def cache_key(filename, bbox, units_per_point, variant=''):
+    """
+    a key which changes whenever the file contents, the bounding-box, the sampling distance,
+    or the variant (eg the resampling engine) change.
+    """
+    h = hashlib.sha1()
+    h.update(_file_digest(filename).encode('ascii'))
+    h.update(repr((CACHE_VERSION, tuple(float(v) for v in bbox), float(units_per_point), str(variant))).encode('ascii'))
+    return h.hexdigest()
+
+
+def write_point_lists(path, point_lists):
+    """
+    write the point lists as a header, the stroke offsets (uint32), and the interleaved x, y coordinates (float64).
+    """
+    offsets = array('I', [0])
+    coords  = array('d')
+    for point_list in point_lists:
+        for p in point_list:
+            coords.append(p[0])
+            coords.append(p[1])
+        offsets.append(len(coords) // 2)
+
+    if sys.byteorder != 'little':
+        offsets.byteswap()
+        coords.byteswap()
+
+    with open(path, 'wb') as f:
+        f.write(_HEADER.pack(_MAGIC, CACHE_VERSION, len(point_lists)))
+        offsets.tofile(f)
+        coords.tofile(f)
+
+
+def read_point_lists(path):
+    """
+    memory-map a file written by write_point_lists() and return its lists of (x, y) tuples.
+    returns None if the file is not a valid cache file.
+    """
+    with open(path, 'rb') as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # empty file
+            return None
+    try:
+        if len(mm) < _HEADER.size:
+            return None
+        magic, version, num_strokes = _HEADER.unpack_from(mm, 0)
+        if magic != _MAGIC or version != CACHE_VERSION:
+            return None
+
+        offsets_start = _HEADER.size
+        coords_start  = offsets_start + 4 * (num_strokes + 1)
+        offsets = struct.unpack_from('<%dI' % (num_strokes + 1), mm, offsets_start)
+        num_coords = offsets[-1] * 2
+        if len(mm) != coords_start + 8 * num_coords:
+            return None
+
+        coords = struct.unpack_from('<%dd' % num_coords, mm, coords_start)
+    finally:
+        mm.close()
+
+    point_lists = []
+    for n in range(num_strokes):
+        c = coords[offsets[n] * 2:offsets[n + 1] * 2]
+        point_lists.append(list(zip(c[0::2], c[1::2])))
+    return point_lists
+
+
+class SketchCache(object):
+
+    def __init__(self, cache_dir=CACHE_DIR, lru_size=LRU_SIZE):
+        self.cache_dir = cache_dir
+        self.lru_size  = lru_size
+        self._lru      = OrderedDict()
+        self.hits_memory = 0
+        self.hits_disk   = 0
+        self.misses      = 0
+
+    def _file_prefix(self, filename):
+        return hashlib.sha1(os.path.abspath(filename).encode('utf-8')).hexdigest()[:12]
+
+    def _path_for(self, filename, key):
+        return os.path.join(self.cache_dir, "%s-%s.wwsc" % (self._file_prefix(filename), key))
+
+    def _remember(self, key, point_lists):
+        # re-inserting moves the key to the most recently used end.
+        self._lru.pop(key, None)
+        self._lru[key] = point_lists
+        while len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    def _store(self, filename, key, point_lists):
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+        # remove stale entries for this file, and then write the new entry atomically.
+        prefix = self._file_prefix(filename) + '-'
+        for name in os.listdir(self.cache_dir):
+            if name.startswith(prefix):
+                os.remove(os.path.join(self.cache_dir, name))
+
+        import tempfile
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        os.close(fd)
+        write_point_lists(tmp_path, point_lists)
+        os.rename(tmp_path, self._path_for(filename, key))
+
+    def get_point_lists(self, filename, bbox, units_per_point, loader, variant=''):
+        """
+        return the cached point lists for this file and settings,
+        or call loader() to make them and cache the result.
+        bbox is (x_min, x_max, y_min, y_max) in cm.
+        """
+        key = cache_key(filename, bbox, units_per_point, variant)
+
+        if key in self._lru:
+            point_lists = self._lru.pop(key)
+            self._lru[key] = point_lists
+            self.hits_memory += 1
+            return point_lists
+
+        path = self._path_for(filename, key)
+        point_lists = None
+        if os.path.isfile(path):
+            point_lists = read_point_lists(path)
+
+        if point_lists is not None:
+            self.hits_disk += 1
+        else:
+            self.misses += 1
+            point_lists = [[(p[0], p[1]) for p in point_list] for point_list in loader()]
+            try:
+                self._store(filename, key, point_lists)
+            except (IOError, OSError) as e:
+                print("could not write sketch cache: %s" % (e))
+
+        self._remember(key, point_lists)
+        return point_lists
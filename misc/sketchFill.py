@@ -0,0 +1,323 @@
+"""
+Replacing thin filled shapes with single centerline strokes.
+
+Many SVG files draw a line as a long, thin filled shape. The robot can only trace outlines,
+so a simple stroke such as the letter "T" turns into eight edges, most of them running alongside each other.
+See "Choosing SVG files" in sketcher.md.
+
+This stage works on the robot point lists. The closed paths are rasterized together, using the even-odd rule
+for holes, and the filled area is split into connected regions. Each region is thinned to a one-pixel skeleton.
+If a region is no wider than a given stroke width, its skeleton is traced back into polylines
+which replace the region's outlines, as long as every outline lies along the skeleton. Everything else is left alone,
+including slivers no wider than a raster cell, such as the gap between two copies of the same outline.
+
+A point is anything indexable as p[0], p[1].
+"""
+
+import math
+from collections import deque
+
+
+# the size of one raster cell, as a fraction of the stroke width. smaller is more accurate and slower.
+CELL_FRACTION = 0.2
+
+# the raster is never finer than this.
+CELL_MIN_CM = 0.1
+
+# a path is closed if its ends are within this many raster cells.
+CLOSED_CELLS = 2.0
+
+# an outline is only replaced if this much of it lies within half the stroke width, and a cell, of the centerlines.
+COVERED_FRACTION = 0.95
+
+_SQRT2 = math.sqrt(2.0)
+
+
+def _length(points):
+    return sum(math.hypot(b[0] - a[0], b[1] - a[1]) for a, b in zip(points[:-1], points[1:]))
+
+
+class _Grid(object):
+    """
+    a raster with a one-cell empty border, stored as a flat list indexed by row * w + column.
+    """
+
+    def __init__(self, x0, y0, x1, y1, cell):
+        self.cell = cell
+        self.x0 = x0 - cell
+        self.y0 = y0 - cell
+        self.w = int(math.ceil((x1 - x0) / cell)) + 3
+        self.h = int(math.ceil((y1 - y0) / cell)) + 3
+
+    def index(self, x, y):
+        c = int((x - self.x0) / self.cell)
+        r = int((y - self.y0) / self.cell)
+        return min(max(r, 0), self.h - 1) * self.w + min(max(c, 0), self.w - 1)
+
+    def center(self, i):
+        r, c = divmod(i, self.w)
+        return self.x0 + (c + 0.5) * self.cell, self.y0 + (r + 0.5) * self.cell
+
+
+def _rasterize(polygons, grid):
+    """
+    even-odd fill of the polygons, sampling at cell centers.
+    """
+    mask = bytearray(grid.w * grid.h)
+    edges = []
+    for poly in polygons:
+        for a, b in zip(poly, poly[1:] + poly[:1]):
+            if a[1] != b[1]:
+                edges.append((a[0], a[1], b[0], b[1]))
+
+    for r in range(1, grid.h - 1):
+        y = grid.y0 + (r + 0.5) * grid.cell
+        xs = []
+        for ax, ay, bx, by in edges:
+            if (ay <= y < by) or (by <= y < ay):
+                xs.append(ax + (y - ay) * (bx - ax) / (by - ay))
+        xs.sort()
+        row = r * grid.w
+        for k in range(0, len(xs) - 1, 2):
+            c0 = int(math.ceil((xs[k]     - grid.x0) / grid.cell - 0.5))
+            c1 = int(math.floor((xs[k + 1] - grid.x0) / grid.cell - 0.5))
+            for c in range(max(c0, 1), min(c1, grid.w - 2) + 1):
+                mask[row + c] = 1
+    return mask
+
+
+def _label(mask, w):
+    """
+    label the 4-connected regions of the mask. returns (labels, number of regions). label 0 is empty.
+    """
+    labels = [0] * len(mask)
+    count = 0
+    for start in range(len(mask)):
+        if not mask[start] or labels[start]:
+            continue
+        count += 1
+        labels[start] = count
+        queue = deque([start])
+        while queue:
+            i = queue.popleft()
+            for j in (i - w, i + w, i - 1, i + 1):
+                if mask[j] and not labels[j]:
+                    labels[j] = count
+                    queue.append(j)
+    return labels, count
+
+
+def _distance(mask, w):
+    """
+    two-pass chamfer distance, in cells, from each filled cell to the nearest empty cell.
+    """
+    inf = float('inf')
+    d = [inf if m else 0.0 for m in mask]
+    n = len(mask)
+    forward  = ((-w - 1, _SQRT2), (-w, 1.0), (-w + 1, _SQRT2), (-1, 1.0))
+    backward = (( w + 1, _SQRT2), ( w, 1.0), ( w - 1, _SQRT2), ( 1, 1.0))
+    for i in range(w + 1, n - w - 1):
+        if d[i]:
+            for o, cost in forward:
+                v = d[i + o] + cost
+                if v < d[i]:
+                    d[i] = v
+    for i in range(n - w - 2, w, -1):
+        if d[i]:
+            for o, cost in backward:
+                v = d[i + o] + cost
+                if v < d[i]:
+                    d[i] = v
+    return d
+
+
+def _thin(mask, w):
+    """
+    Zhang-Suen thinning, in place.
+    """
+    pixels = set(i for i in range(len(mask)) if mask[i])
+    changed = True
+    while changed:
+        changed = False
+        for step in (0, 1):
+            remove = []
+            for i in pixels:
+                p2, p3, p4 = mask[i - w], mask[i - w + 1], mask[i + 1]
+                p5, p6, p7 = mask[i + w + 1], mask[i + w], mask[i + w - 1]
+                p8, p9     = mask[i - 1], mask[i - w - 1]
+                b = p2 + p3 + p4 + p5 + p6 + p7 + p8 + p9
+                if b < 2 or b > 6:
+                    continue
+                seq = (p2, p3, p4, p5, p6, p7, p8, p9, p2)
+                if sum(1 for k in range(8) if not seq[k] and seq[k + 1]) != 1:
+                    continue
+                if step == 0 and (p2 and p4 and p6 or p4 and p6 and p8):
+                    continue
+                if step == 1 and (p2 and p4 and p8 or p2 and p6 and p8):
+                    continue
+                remove.append(i)
+            for i in remove:
+                mask[i] = 0
+                pixels.discard(i)
+            changed = changed or bool(remove)
+    return pixels
+
+
+def _trace(pixels, w):
+    """
+    trace a one-pixel-wide skeleton into lists of cell indices.
+    diagonal neighbours only count when no shared orthogonal neighbour is set,
+    so staircases don't look like junctions.
+    """
+    def neighbours(i):
+        ret = [j for j in (i - w, i + w, i - 1, i + 1) if j in pixels]
+        for dr, dc in ((-w, -1), (-w, 1), (w, -1), (w, 1)):
+            j = i + dr + dc
+            if j in pixels and (i + dr) not in pixels and (i + dc) not in pixels:
+                ret.append(j)
+        return ret
+
+    nbrs  = dict((i, neighbours(i)) for i in pixels)
+    nodes = set(i for i in pixels if len(nbrs[i]) != 2)
+    used  = set()
+
+    def walk(start, first):
+        line = [start]
+        prev, cur = start, first
+        used.add((min(prev, cur), max(prev, cur)))
+        while True:
+            line.append(cur)
+            if cur in nodes or cur == start:
+                return line
+            nxt = [k for k in nbrs[cur] if k != prev and (min(cur, k), max(cur, k)) not in used]
+            if not nxt:
+                return line
+            prev, cur = cur, nxt[0]
+            used.add((min(prev, cur), max(prev, cur)))
+
+    lines = []
+    for n in nodes:
+        for m in nbrs[n]:
+            if (min(n, m), max(n, m)) not in used:
+                lines.append(walk(n, m))
+    # what remains are closed loops.
+    for i in pixels:
+        for m in nbrs[i]:
+            if (min(i, m), max(i, m)) not in used:
+                lines.append(walk(i, m))
+    return lines
+
+
+def _smooth(points):
+    """
+    a three-point moving average, to soften the raster staircase. the ends stay put.
+    """
+    if len(points) < 3:
+        return points
+    ret = [points[0]]
+    for a, b, c in zip(points[:-2], points[1:-1], points[2:]):
+        ret.append(((a[0] + b[0] + c[0]) / 3.0, (a[1] + b[1] + c[1]) / 3.0))
+    ret.append(points[-1])
+    return ret
+
+
+def centerlines(point_lists, stroke_width_cm, verbose=True):
+    """
+    return new point lists in which filled regions no wider than stroke_width_cm
+    are drawn as single centerline strokes instead of as outlines.
+    """
+    cell = max(CELL_MIN_CM, stroke_width_cm * CELL_FRACTION)
+
+    def is_closed(s):
+        return len(s) > 2 and math.hypot(s[0][0] - s[-1][0], s[0][1] - s[-1][1]) <= cell * CLOSED_CELLS
+
+    closed = [[(p[0], p[1]) for p in s] for s in point_lists if is_closed(s)]
+    if not closed:
+        return list(point_lists)
+
+    xs = [p[0] for s in closed for p in s]
+    ys = [p[1] for s in closed for p in s]
+    grid = _Grid(min(xs), min(ys), max(xs), max(ys), cell)
+    w = grid.w
+
+    mask = _rasterize(closed, grid)
+    labels, count = _label(mask, w)
+    dist = _distance(mask, w)
+
+    # thin every region to its skeleton. the distance to the edge along the skeleton is half the region's width.
+    # the median is used so that the wider spots where strokes meet don't count.
+    pixels = _thin(bytearray(mask), w)
+    half_widths = {}
+    for i in pixels:
+        half_widths.setdefault(labels[i], []).append(dist[i])
+    thin = set()
+    for lab, values in half_widths.items():
+        values.sort()
+        width = (values[len(values) // 2] * 2.0 - 1.0) * cell
+        # a region no wider than a cell is too narrow for the raster to find its middle.
+        if cell < width <= stroke_width_cm:
+            thin.add(lab)
+
+    # the centerlines of each thin region.
+    pixels = set(i for i in pixels if labels[i] in thin)
+    lines = {}
+    for line in _trace(pixels, w):
+        points = _smooth([grid.center(i) for i in line])
+        # drop short spurs, which are artifacts of thinning at corners.
+        if _length(points) < stroke_width_cm and len(line) < len(pixels):
+            continue
+        lines.setdefault(labels[line[0]], []).append((line, points))
+
+    # the cells near enough to each region's centerlines for an outline there to be drawn by them.
+    reach = int(math.ceil(stroke_width_cm * 0.5 / cell)) + 1
+    near = {}
+    for lab, region_lines in lines.items():
+        cells = near.setdefault(lab, set())
+        for line, _ in region_lines:
+            for i in line:
+                for dr in range(-reach, reach + 1):
+                    for dc in range(-reach, reach + 1):
+                        cells.add(i + dr * w + dc)
+
+    # each closed path is an outline of whichever region most of its points border.
+    # a region is only replaced if it has outlines, and its centerlines cover every one of them.
+    outlines = []
+    uncovered = set()
+    for s in point_lists:
+        lab = None
+        if is_closed(s):
+            votes = {}
+            for p in s:
+                i = grid.index(p[0], p[1])
+                for j in (i, i - w, i + w, i - 1, i + 1, i - w - 1, i - w + 1, i + w - 1, i + w + 1):
+                    if labels[j]:
+                        votes[labels[j]] = votes.get(labels[j], 0) + 1
+                        break
+            if votes:
+                lab = max(votes, key=votes.get)
+        if lab in thin:
+            cells = near.get(lab, ())
+            covered = sum(1 for p in s if grid.index(p[0], p[1]) in cells)
+            if covered < COVERED_FRACTION * len(s):
+                uncovered.add(lab)
+        outlines.append((lab, s))
+    thin = set(lab for lab, _ in outlines if lab in thin) - uncovered
+
+    if not thin:
+        if verbose:
+            print("no filled regions narrower than %0.2fcm" % (stroke_width_cm))
+        return list(point_lists)
+
+    ret = [s for lab, s in outlines if lab not in thin]
+    added = 0
+    for lab in thin:
+        for _, points in lines.get(lab, ()):
+            ret.append(points)
+            added += 1
+
+    if verbose:
+        before = sum(_length(s) for s in point_lists)
+        after  = sum(_length(s) for s in ret)
+        print("%d thin filled regions replaced by %d centerlines. drawing length %0.1fcm -> %0.1fcm (%0.1fcm saved)" %
+              (len(thin), added, before, after, before - after))
+    return ret
@@ -0,0 +1,141 @@
+"""
+Splitting one drawing between several robots.
+
+The drawing is cut into regions by recursive bisection: at each step the region is cut across its longer side,
+at the position which balances the amount of drawing on either side. Strokes which cross a cut are split there.
+A robot's body reaches ROBOT_RADIUS_CM beyond its pen, so each region stops that far short of every cut,
+and the robots drawing either side of a cut can't run into each other.
+The strokes in the band along each cut are the seams, which one robot draws once the regions are finished.
+
+Each robot is placed at the center of its own region and draws its strokes relative to that spot,
+so each robot's point lists are translated by its origin offset.
+WonderPy connects each program to one robot, so each part is drawn by its own sketcher.py, with --part.
+
+A point is anything indexable as p[0], p[1].
+"""
+
+import math
+
+
+# how far a robot's body reaches beyond the Sketch Kit's pen. Dash and Cue are about 20cm across.
+ROBOT_RADIUS_CM = 12.0
+
+
+def _length(points):
+    return sum(math.hypot(b[0] - a[0], b[1] - a[1]) for a, b in zip(points[:-1], points[1:]))
+
+
+def _bbox(strokes):
+    xs = [p[0] for s in strokes for p in s]
+    ys = [p[1] for s in strokes for p in s]
+    if not xs:
+        return 0.0, 0.0, 0.0, 0.0
+    return min(xs), max(xs), min(ys), max(ys)
+
+
+def _cut_position(strokes, axis, fraction):
+    """
+    the coordinate along axis at which fraction of the total drawing length lies below.
+    """
+    pieces = []
+    for s in strokes:
+        for a, b in zip(s[:-1], s[1:]):
+            pieces.append(((a[axis] + b[axis]) * 0.5, math.hypot(b[0] - a[0], b[1] - a[1])))
+    if not pieces:
+        return 0.0
+    pieces.sort()
+    target = sum(w for _, w in pieces) * fraction
+    acc = 0.0
+    for c, w in pieces:
+        acc += w
+        if acc >= target:
+            return c
+    return pieces[-1][0]
+
+
+def _split_stroke(stroke, axis, cut):
+    """
+    split a stroke where it crosses the line coordinate[axis] == cut.
+    returns (strokes below the cut, strokes at or above the cut).
+    """
+    below, above = [], []
+    current = [(stroke[0][0], stroke[0][1])]
+    current_below = stroke[0][axis] < cut
+    for a, b in zip(stroke[:-1], stroke[1:]):
+        b_below = b[axis] < cut
+        if b_below != current_below:
+            t = (cut - a[axis]) / (b[axis] - a[axis])
+            crossing = (a[0] + (b[0] - a[0]) * t, a[1] + (b[1] - a[1]) * t)
+            current.append(crossing)
+            (below if current_below else above).append(current)
+            current = [crossing]
+            current_below = b_below
+        current.append((b[0], b[1]))
+    (below if current_below else above).append(current)
+    return [s for s in below if len(s) > 1], [s for s in above if len(s) > 1]
+
+
+def _bisect(strokes, n, clearance):
+    """
+    returns (the strokes of each of n regions, the seams between them).
+    """
+    if n <= 1 or not strokes:
+        return [strokes] + [[] for _ in range(n - 1)], []
+
+    x0, x1, y0, y1 = _bbox(strokes)
+    axis = 0 if (x1 - x0) >= (y1 - y0) else 1
+    n_low = n // 2
+    cut = _cut_position(strokes, axis, float(n_low) / n)
+
+    low, seams, high = [], [], []
+    for s in strokes:
+        s_low, s_rest = _split_stroke(s, axis, cut - clearance)
+        low.extend(s_low)
+        for r in s_rest:
+            r_seam, r_high = _split_stroke(r, axis, cut + clearance)
+            seams.extend(r_seam)
+            high.extend(r_high)
+    regions_low,  seams_low  = _bisect(low,  n_low,     clearance)
+    regions_high, seams_high = _bisect(high, n - n_low, clearance)
+    return regions_low + regions_high, seams + seams_low + seams_high
+
+
+def partition(point_lists, num_robots, clearance_cm=ROBOT_RADIUS_CM):
+    """
+    split the strokes into num_robots spatially separate, roughly equal sets, at least 2 * clearance_cm apart,
+    and the seams between them.
+    returns num_robots + 1 parts, each (origin_offset, point_lists), where the point lists are relative to
+    origin_offset, the spot where that part's robot should be placed. the last part is the seams, relative to
+    the center of the drawing, to be drawn once the others are finished and their robots taken away.
+    a part with nothing to draw has origin_offset None, and its robot should be kept off the drawing.
+    """
+    regions, seams = _bisect([s for s in point_lists if len(s) > 0], num_robots, clearance_cm)
+    ret = []
+    for strokes in regions:
+        if not strokes:
+            ret.append((None, []))
+            continue
+        x0, x1, y0, y1 = _bbox(strokes)
+        ox, oy = (x0 + x1) * 0.5, (y0 + y1) * 0.5
+        local = [[(p[0] - ox, p[1] - oy) for p in s] for s in strokes]
+        ret.append(((ox, oy), local))
+    ret.append(((0.0, 0.0) if seams else None, seams))
+    return ret
+
+
+def report(parts):
+    """
+    print where to place each part's robot, the region it will draw in, and how much it will draw.
+    """
+    for n, (offset, strokes) in enumerate(parts):
+        seams = n == len(parts) - 1
+        name = "part %d%s" % (n + 1, " (the seams)" if seams else "")
+        if offset is None:
+            print("%s: nothing to draw. keep its robot off the drawing." % (name))
+            continue
+        x0, x1, y0, y1 = _bbox(strokes)
+        print("%s: %splace at (%0.1f, %0.1f)cm from the drawing center, facing forward. "
+              "draws %d paths, %0.1fcm, within x [%0.1f, %0.1f] y [%0.1f, %0.1f]" %
+              (name, "once the other parts are finished and their robots taken away, " if seams else "",
+               offset[0], offset[1], len(strokes), sum(_length(s) for s in strokes),
+               x0 + offset[0], x1 + offset[0], y0 + offset[1], y1 + offset[1]))
@@ -0,0 +1,108 @@
+"""
+Progress checkpoints for sketch jobs, so an interrupted drawing can be resumed.
+
+When a drawing starts, the planned point lists are saved next to a small JSON checkpoint file.
+After each stretch of drawing the checkpoint is rewritten with the index of the path being drawn,
+the index of the way-point reached within it, and the robot's pose at that moment.
+Rewriting the checkpoint is a few hundred bytes and an atomic rename.
+
+When the drawing is finished both files are removed.
+"""
+
+import json
+import math
+import os
+
+import fileHelpers
+import sketchCache
+
+
+JOB_FILE = os.path.join(os.path.expanduser("~"), ".wonderpy", "sketch_job.json")
+
+
+def _plan_file(job_file):
+    return os.path.splitext(job_file)[0] + ".wwsc"
+
+
+class SketchJob(object):
+
+    def __init__(self, job_file, point_lists, path_index=0, point_index=0, pose=(0.0, 0.0, 0.0), source=None):
+        self.job_file    = job_file
+        self.point_lists = point_lists
+        self.path_index  = path_index
+        self.point_index = point_index
+        self.pose        = pose
+        self.source      = source
+
+    @classmethod
+    def create(cls, job_file, point_lists, source=None):
+        """
+        start a new job, saving the planned point lists.
+        """
+        directory = os.path.dirname(job_file)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        sketchCache.write_point_lists(_plan_file(job_file), point_lists)
+        job = cls(job_file, point_lists, source=source)
+        job.save(0, 0, (0.0, 0.0, 0.0))
+        return job
+
+    @classmethod
+    def load(cls, job_file):
+        """
+        return the unfinished job saved in job_file, or None if there isn't one.
+        """
+        plan_file = _plan_file(job_file)
+        if not os.path.isfile(job_file) or not os.path.isfile(plan_file):
+            return None
+        with open(job_file) as f:
+            try:
+                state = json.load(f)
+            except ValueError:
+                return None
+        point_lists = sketchCache.read_point_lists(plan_file)
+        if point_lists is None or state["path_index"] >= len(point_lists):
+            return None
+        return cls(job_file, point_lists, state["path_index"], state["point_index"], tuple(state["pose"]),
+                   state.get("source"))
+
+    def save(self, path_index, point_index, pose):
+        """
+        record that the robot has drawn up to point_index of path path_index, and is at pose (x, y, degrees).
+        """
+        self.path_index  = path_index
+        self.point_index = point_index
+        self.pose        = pose
+        tmp = self.job_file + ".tmp"
+        with open(tmp, 'w') as f:
+            json.dump({
+                "path_index" : path_index,
+                "point_index": point_index,
+                "pose"       : list(pose),
+                "source"     : self.source,
+            }, f)
+        fileHelpers.replace(tmp, self.job_file)
+
+    def finish(self):
+        for filename in (self.job_file, _plan_file(self.job_file)):
+            if os.path.isfile(filename):
+                os.remove(filename)
+
+
+def pose_at(robot, points, index):
+    """
+    the robot's pose (x, y, degrees) after drawing up to points[index].
+    uses the robot's own pose sensor if it has one, otherwise the way-points.
+    """
+    pose = getattr(getattr(robot, 'sensors', None), 'pose', None)
+    if pose is not None and hasattr(pose, 'x'):
+        return (pose.x, pose.y, pose.degrees)
+
+    p = points[index]
+    degrees = 0.0
+    for q in reversed(points[:index]):
+        if q[0] != p[0] or q[1] != p[1]:
+            # pose degrees are measured from +Y, counter-clockwise.
+            degrees = (math.degrees(math.atan2(p[1] - q[1], p[0] - q[0])) - 90.0 + 180.0) % 360.0 - 180.0
+            break
+    return (p[0], p[1], degrees)
@@ -0,0 +1,197 @@
+"""
+Merging strokes and removing duplicated edges.
+
+Many SVG files are made of shapes which share edges, or of paths which end exactly where another begins.
+Drawn as-is, shared edges are drawn twice, and every separate path costs the robot a pen-up, a drive to
+the next start, and a pen-down.
+
+This pass works in two steps, each using a grid hash so it stays close to linear in the number of points:
+
+1. walk the strokes in order, and drop any run of a stroke which lies within a tolerance of a stroke already kept,
+   running alongside it.
+2. join strokes whose ends are within the tolerance of each other, reversing them as needed.
+
+A point is anything indexable as p[0], p[1].
+"""
+
+import math
+
+
+# a stretch of a stroke only counts as a duplicate if it's at least this many tolerances long.
+# shorter stretches are where strokes cross or touch, and are kept.
+DUPLICATE_MIN_TOLERANCES = 3.0
+
+# and a point only retraces a stroke if they run within this many degrees of each other, in either direction.
+# strokes which cross at a steeper angle are kept, however close they come.
+DUPLICATE_MAX_ANGLE_DEG = 15.0
+
+
+def _length(points):
+    return sum(math.hypot(b[0] - a[0], b[1] - a[1]) for a, b in zip(points[:-1], points[1:]))
+
+
+def _dist_to_segment(px, py, ax, ay, bx, by):
+    dx, dy = bx - ax, by - ay
+    len2 = dx * dx + dy * dy
+    if len2 == 0.0:
+        return math.hypot(px - ax, py - ay)
+    t = max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / len2))
+    return math.hypot(px - ax - t * dx, py - ay - t * dy)
+
+
+class _SegmentGrid(object):
+    """
+    a grid hash of line segments, for asking "is this point near anything already drawn?"
+    """
+
+    def __init__(self, cell):
+        self.cell  = cell
+        self.cells = {}
+
+    def _key(self, x, y):
+        return int(math.floor(x / self.cell)), int(math.floor(y / self.cell))
+
+    def add_stroke(self, points):
+        for a, b in zip(points[:-1], points[1:]):
+            seg = (a[0], a[1], b[0], b[1])
+            (c0, r0), (c1, r1) = self._key(a[0], a[1]), self._key(b[0], b[1])
+            for c in range(min(c0, c1), max(c0, c1) + 1):
+                for r in range(min(r0, r1), max(r0, r1) + 1):
+                    self.cells.setdefault((c, r), []).append(seg)
+
+    def near(self, x, y, tolerance, dx, dy, max_sin):
+        """
+        is there a segment within tolerance of (x, y), running along the direction (dx, dy) or against it?
+        max_sin is the sine of the largest angle between them.
+        """
+        norm = math.hypot(dx, dy)
+        c0, r0 = self._key(x, y)
+        for c in (c0 - 1, c0, c0 + 1):
+            for r in (r0 - 1, r0, r0 + 1):
+                for seg in self.cells.get((c, r), ()):
+                    if _dist_to_segment(x, y, *seg) > tolerance:
+                        continue
+                    sx, sy = seg[2] - seg[0], seg[3] - seg[1]
+                    if abs(dx * sy - dy * sx) <= max_sin * norm * math.hypot(sx, sy):
+                        return True
+        return False
+
+
+def remove_duplicates(point_lists, tolerance):
+    """
+    drop the parts of each stroke which retrace a stroke earlier in the list, in either direction.
+    a stroke may be split into several pieces.
+    """
+    grid = _SegmentGrid(max(tolerance, 1e-6))
+    max_sin = math.sin(math.radians(DUPLICATE_MAX_ANGLE_DEG))
+    ret = []
+    for stroke in point_lists:
+        points = [(p[0], p[1]) for p in stroke]
+        covered = []
+        for k, (x, y) in enumerate(points):
+            # the stroke runs along an earlier one here if the segment either side of the point does.
+            c = False
+            if k > 0:
+                c = grid.near(x, y, tolerance, x - points[k - 1][0], y - points[k - 1][1], max_sin)
+            if not c and k < len(points) - 1:
+                c = grid.near(x, y, tolerance, points[k + 1][0] - x, points[k + 1][1] - y, max_sin)
+            covered.append(c)
+
+        # ignore short covered stretches, where this stroke only touches another, or crosses it at a shallow angle.
+        n = 0
+        while n < len(points):
+            if not covered[n]:
+                n += 1
+                continue
+            start = n
+            while n < len(points) and covered[n]:
+                n += 1
+            if _length(points[start:n]) < tolerance * DUPLICATE_MIN_TOLERANCES:
+                for k in range(start, n):
+                    covered[k] = False
+
+        # collect runs of uncovered points, keeping the covered point at either end so the piece
+        # still joins up with what's already drawn.
+        pieces = []
+        n = 0
+        while n < len(points):
+            if covered[n]:
+                n += 1
+                continue
+            start = n
+            while n < len(points) and not covered[n]:
+                n += 1
+            piece = points[max(start - 1, 0):min(n + 1, len(points))]
+            if len(piece) > 1:
+                pieces.append(piece)
+
+        # a stroke with no points near anything, or a single point, is kept as it is.
+        if not any(covered):
+            pieces = [points]
+        for piece in pieces:
+            grid.add_stroke(piece)
+            ret.append(piece)
+    return ret
+
+
+def join_strokes(point_lists, tolerance):
+    """
+    chain together strokes whose ends are within tolerance of each other.
+    """
+    strokes = [list(s) for s in point_lists if len(s) > 0]
+    cell = max(tolerance, 1e-6)
+    ends = {}   # grid cell -> list of (stroke index, is_start)
+
+    def key(p):
+        return int(math.floor(p[0] / cell)), int(math.floor(p[1] / cell))
+
+    for i, s in enumerate(strokes):
+        ends.setdefault(key(s[0]), []).append((i, True))
+        ends.setdefault(key(s[-1]), []).append((i, False))
+
+    used = [False] * len(strokes)
+
+    def take_near(p):
+        """
+        find an unused stroke with an end near p, mark it used, and return it oriented to start near p.
+        """
+        c0, r0 = key(p)
+        for c in (c0 - 1, c0, c0 + 1):
+            for r in (r0 - 1, r0, r0 + 1):
+                for i, is_start in ends.get((c, r), ()):
+                    if used[i]:
+                        continue
+                    q = strokes[i][0] if is_start else strokes[i][-1]
+                    if math.hypot(q[0] - p[0], q[1] - p[1]) <= tolerance:
+                        used[i] = True
+                        return strokes[i] if is_start else strokes[i][::-1]
+        return None
+
+    ret = []
+    for i, s in enumerate(strokes):
+        if used[i]:
+            continue
+        used[i] = True
+        chain = list(s)
+        for _ in range(2):
+            # extend forwards from the end, then flip and extend from the other end.
+            nxt = take_near(chain[-1])
+            while nxt is not None:
+                chain.extend(nxt[1:])
+                nxt = take_near(chain[-1])
+            chain.reverse()
+        ret.append(chain)
+    return ret
+
+
+def merge(point_lists, tolerance, verbose=True):
+    """
+    remove duplicated edges, then join strokes which meet.
+    """
+    deduped = remove_duplicates(point_lists, tolerance)
+    joined  = join_strokes(deduped, tolerance)
+    if verbose:
+        print("merged strokes: %d paths -> %d paths. drawing length %0.1fcm -> %0.1fcm" %
+              (len(point_lists), len(joined),
+               sum(_length(s) for s in point_lists), sum(_length(s) for s in joined)))
+    return joined
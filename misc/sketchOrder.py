@@ -0,0 +1,189 @@
+"""
+Stroke ordering for the sketcher.
+
+SVG files list their paths in whatever order the authoring tool saved them,
+which often sends the robot back and forth across the page with the pen up.
+This module picks an order and a drawing direction for each stroke so that
+the total pen-up ("dead") travel is shorter.
+
+The strategy is a greedy nearest-neighbour tour, improved by 2-opt passes.
+Reversing a run of strokes in 2-opt also flips the drawing direction of each
+stroke in the run, so direction is optimized together with order.
+
+A stroke is a list of points, and a point is anything indexable as p[0], p[1].
+"""
+
+import math
+import time
+
+
+# stop improving the tour after this long. the greedy tour is always available.
+TWO_OPT_MAX_SECONDS = 2.0
+
+
+def _dist(a, b):
+    return math.hypot(b[0] - a[0], b[1] - a[1])
+
+
+def _heading_deg(a, b):
+    return math.degrees(math.atan2(b[1] - a[1], b[0] - a[0]))
+
+
+def _turn_deg(h0, h1):
+    """
+    the absolute size of the smallest turn from heading h0 to heading h1.
+    """
+    d = (h1 - h0 + 180.0) % 360.0 - 180.0
+    return abs(d)
+
+
+def _first_heading(stroke):
+    for p in stroke[1:]:
+        if _dist(stroke[0], p) > 0:
+            return _heading_deg(stroke[0], p)
+    return None
+
+
+def _last_heading(stroke):
+    for p in reversed(stroke[:-1]):
+        if _dist(p, stroke[-1]) > 0:
+            return _heading_deg(p, stroke[-1])
+    return None
+
+
+def travel_distance(strokes, origin=(0.0, 0.0), return_to_origin=True):
+    """
+    the total pen-up distance in cm: from the origin to the first stroke,
+    between each pair of strokes, and optionally back to the origin.
+    """
+    if not strokes:
+        return 0.0
+    total = _dist(origin, strokes[0][0])
+    for n in range(1, len(strokes)):
+        total += _dist(strokes[n - 1][-1], strokes[n][0])
+    if return_to_origin:
+        total += _dist(strokes[-1][-1], origin)
+    return total
+
+
+def travel_time_s(strokes, drive_speed_cm_s, turn_speed_deg_s, origin=(0.0, 0.0), heading_deg=90.0,
+                  return_to_origin=True):
+    """
+    estimate the seconds spent on pen-up travel.
+    each move to the start of a stroke is modeled as: turn to face the start, drive there,
+    then turn to face along the stroke. the robot starts at the origin facing +Y.
+    """
+    t = 0.0
+    pos = origin
+    heading = heading_deg
+    targets = [(s[0], _first_heading(s), _last_heading(s), s[-1]) for s in strokes]
+    if return_to_origin:
+        targets.append((origin, None, None, origin))
+
+    for start, h_first, h_last, end in targets:
+        d = _dist(pos, start)
+        if d > 0:
+            h_travel = _heading_deg(pos, start)
+            t += _turn_deg(heading, h_travel) / turn_speed_deg_s
+            t += d / drive_speed_cm_s
+            heading = h_travel
+        if h_first is not None:
+            t += _turn_deg(heading, h_first) / turn_speed_deg_s
+        if h_last is not None:
+            heading = h_last
+        pos = end
+    return t
+
+
+def _greedy_tour(starts, ends, origin):
+    """
+    nearest-neighbour tour over the strokes, allowing either end of a stroke to be its start.
+    returns a list of (index, reversed).
+    """
+    remaining = set(range(len(starts)))
+    tour = []
+    px, py = origin
+    while remaining:
+        best = None
+        best_d2 = None
+        for i in remaining:
+            sx, sy = starts[i]
+            d2 = (sx - px) * (sx - px) + (sy - py) * (sy - py)
+            if best_d2 is None or d2 < best_d2:
+                best, best_d2, best_rev = i, d2, False
+            ex, ey = ends[i]
+            d2 = (ex - px) * (ex - px) + (ey - py) * (ey - py)
+            if d2 < best_d2:
+                best, best_d2, best_rev = i, d2, True
+        remaining.remove(best)
+        tour.append((best, best_rev))
+        px, py = starts[best] if best_rev else ends[best]
+    return tour
+
+
+def _two_opt(tour, starts, ends, origin, max_seconds):
+    """
+    improve the tour in place by reversing runs of strokes.
+    the tour is treated as a path from the origin back to the origin.
+    """
+
+    def head(k):
+        i, rev = tour[k]
+        return ends[i] if rev else starts[i]
+
+    def tail(k):
+        i, rev = tour[k]
+        return starts[i] if rev else ends[i]
+
+    n = len(tour)
+    deadline = time.time() + max_seconds
+    improved = True
+    while improved and time.time() < deadline:
+        improved = False
+        for i in range(n):
+            prev_end = origin if i == 0 else tail(i - 1)
+            h_i = head(i)
+            d_prev_i = _dist(prev_end, h_i)
+            for j in range(i, n):
+                next_start = origin if j == n - 1 else head(j + 1)
+                t_j = tail(j)
+                old = d_prev_i + _dist(t_j, next_start)
+                new = _dist(prev_end, t_j) + _dist(h_i, next_start)
+                if new < old - 1e-9:
+                    tour[i:j + 1] = [(idx, not rev) for idx, rev in reversed(tour[i:j + 1])]
+                    improved = True
+                    h_i = head(i)
+                    d_prev_i = _dist(prev_end, h_i)
+            if time.time() >= deadline:
+                break
+    return tour
+
+
+def order_strokes(strokes, origin=(0.0, 0.0), max_seconds=TWO_OPT_MAX_SECONDS):
+    """
+    return a new list of the strokes, reordered and possibly reversed to reduce pen-up travel.
+    empty strokes are dropped.
+    """
+    strokes = [s for s in strokes if len(s) > 0]
+    if len(strokes) < 2:
+        return list(strokes)
+
+    starts = [(s[0][0], s[0][1]) for s in strokes]
+    ends   = [(s[-1][0], s[-1][1]) for s in strokes]
+
+    tour = _greedy_tour(starts, ends, origin)
+    tour = _two_opt(tour, starts, ends, origin, max_seconds)
+
+    return [list(reversed(strokes[i])) if rev else strokes[i] for i, rev in tour]
+
+
+def report(before, after, drive_speed_cm_s, turn_speed_deg_s, origin=(0.0, 0.0)):
+    """
+    print the pen-up travel before and after ordering, and the estimated time saved.
+    """
+    d0 = travel_distance(before, origin)
+    d1 = travel_distance(after , origin)
+    t0 = travel_time_s(before, drive_speed_cm_s, turn_speed_deg_s, origin)
+    t1 = travel_time_s(after , drive_speed_cm_s, turn_speed_deg_s, origin)
+    print("pen-up travel: %0.1fcm -> %0.1fcm. estimated %0.1fs -> %0.1fs (%0.1fs saved)" %
+          (d0, d1, t0, t1, t0 - t1))
@@ -0,0 +1,276 @@
+"""
+Precompiled draw plans for the sketcher, so a drawing can start without reading its SVG.
+
+Every launch of sketcher.py parses, fits, resamples and orders its SVG again before the robot can start.
+This compiles a whole folder of SVGs at once, on a pool of processes, with the sketcher's settings,
+into one plan file per SVG. A plan file holds:
+
+  - the way-points of every stroke, in the order they are drawn, as one float64 array,
+  - where each stroke starts and ends in that array,
+  - the pen events: the point at which the pen goes down and comes up again, for each stroke,
+  - the estimated drawing time, from sketchSim.py,
+  - the settings it was compiled with, and a digest of the SVG, as JSON.
+
+  python misc/sketchPlan.py assets/svg_files --out plans --box 90 50
+  python misc/sketcher.py --plan plans/octocat.wwdp
+
+Compiling with several worker counts reports the throughput of each:
+  python misc/sketchPlan.py assets/svg_files --out plans --workers 1 2 4
+"""
+
+import argparse
+import glob
+import json
+import os
+import struct
+import sys
+import time
+from array import array
+
+import fileHelpers
+
+
+MAGIC = b'WWDP'
+
+# bump this if the file format or the meaning of what's in it changes.
+PLAN_VERSION = 1
+
+_HEADER = struct.Struct('<4sIIIId')     # magic, version, strokes, pen events, metadata length, estimated seconds
+
+PLAN_SUFFIX = ".wwdp"
+
+# the kinds of pen event.
+PEN_UP   = 0
+PEN_DOWN = 1
+
+
+def _little_endian(a):
+    # plan files are little-endian, whatever the machine.
+    if sys.byteorder != 'little':
+        a.byteswap()
+    return a
+
+
+def _cpu_count():
+    # os.cpu_count() is Python 3 only.
+    import multiprocessing
+
+    try:
+        return multiprocessing.cpu_count()
+    except NotImplementedError:
+        return 1
+
+
+class DrawPlan(object):
+
+    def __init__(self, point_lists, estimated_seconds=0.0, meta=None):
+        self.point_lists       = point_lists
+        self.estimated_seconds = estimated_seconds
+        self.meta              = meta or {}
+
+    def pen_events(self):
+        """
+        (point index, PEN_DOWN or PEN_UP), counting points across all the strokes in order.
+        """
+        events = []
+        offset = 0
+        for point_list in self.point_lists:
+            events.append((offset, PEN_DOWN))
+            offset += len(point_list)
+            events.append((offset - 1, PEN_UP))
+        return events
+
+    def save(self, path):
+        """
+        write the plan, via a temporary file so a half-written one never replaces a good one.
+        """
+        offsets = array('I', [0])
+        coords  = array('d')
+        for point_list in self.point_lists:
+            for p in point_list:
+                coords.append(p[0])
+                coords.append(p[1])
+            offsets.append(len(coords) // 2)
+        events = self.pen_events()
+        event_points = array('I', [e[0] for e in events])
+        event_kinds  = array('B', [e[1] for e in events])
+        meta_bytes = json.dumps(self.meta, sort_keys=True).encode('utf-8')
+
+        tmp = path + ".tmp"
+        with open(tmp, 'wb') as f:
+            f.write(_HEADER.pack(MAGIC, PLAN_VERSION, len(self.point_lists), len(events), len(meta_bytes),
+                                 self.estimated_seconds))
+            f.write(meta_bytes)
+            for a in (offsets, coords, event_points, event_kinds):
+                _little_endian(a).tofile(f)
+        fileHelpers.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        if len(data) < _HEADER.size:
+            raise ValueError("%s is not a draw plan" % (path))
+        magic, version, strokes, events, meta_length, seconds = _HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise ValueError("%s is not a draw plan" % (path))
+        if version != PLAN_VERSION:
+            raise ValueError("%s is a version %d draw plan, this reads version %d. compile it again" %
+                             (path, version, PLAN_VERSION))
+
+        view = memoryview(data)
+        pos = _HEADER.size
+        meta = json.loads(view[pos:pos + meta_length].tobytes().decode('utf-8'))
+        pos += meta_length
+
+        def take(code, count):
+            a = array(code)
+            size = a.itemsize * count
+            if pos + size > len(data):
+                raise ValueError("%s is truncated" % (path))
+            # frombytes() is Python 3's name for fromstring().
+            if hasattr(a, 'frombytes'):
+                a.frombytes(view[pos:pos + size])
+            else:
+                a.fromstring(view[pos:pos + size].tobytes())
+            return _little_endian(a), pos + size
+
+        offsets, pos = take('I', strokes + 1)
+        coords, pos  = take('d', offsets[-1] * 2)
+        # the pen events follow, but they're implied by the offsets, so aren't needed to draw.
+
+        point_lists = []
+        for n in range(strokes):
+            c = coords[offsets[n] * 2:offsets[n + 1] * 2]
+            point_lists.append(list(zip(c[0::2], c[1::2])))
+        return cls(point_lists, seconds, meta)
+
+
+def plan_path(svg_file, out_dir):
+    return os.path.join(out_dir, os.path.splitext(os.path.basename(svg_file))[0] + PLAN_SUFFIX)
+
+
+def settings():
+    """
+    the sketcher's current settings which change a plan.
+    """
+    import sketcher
+
+    return {
+        "box_cm"         : [sketcher.BOUNDING_BOX_WIDTH_CM, sketcher.BOUNDING_BOX_HEIGHT_CM],
+        "units_per_point": sketcher.UNITS_PER_POINT,
+        "tolerance_cm"   : sketcher.TOLERANCE_CM,
+        "fill_width_cm"  : sketcher.FILL_WIDTH_CM,
+        "merge_cm"       : sketcher.MERGE_CM,
+        "resampler"      : sketcher.RESAMPLE_ENGINE,
+    }
+
+
+def compile_file(job):
+    """
+    plan one SVG with the given settings and write its plan file. runs in a worker process.
+    returns (svg file, plan file, strokes, points, estimated seconds, seconds taken).
+    """
+    import sketchCache
+    import sketcher
+    import sketchSim
+
+    svg_file, out_dir, plan_settings = job
+    t = time.time()
+    sketcher.FILENAME = svg_file
+    sketcher.BOUNDING_BOX_WIDTH_CM, sketcher.BOUNDING_BOX_HEIGHT_CM = plan_settings["box_cm"]
+    sketcher.UNITS_PER_POINT = plan_settings["units_per_point"]
+    sketcher.TOLERANCE_CM    = plan_settings["tolerance_cm"]
+    sketcher.FILL_WIDTH_CM   = plan_settings["fill_width_cm"]
+    sketcher.MERGE_CM        = plan_settings["merge_cm"]
+    sketcher.RESAMPLE_ENGINE = plan_settings["resampler"]
+    sketcher.SKETCH_CACHE    = None
+    with fileHelpers.quiet():
+        point_lists = sketcher.plan_point_lists()
+    point_lists = [[(p[0], p[1]) for p in point_list] for point_list in point_lists]
+    estimated = sketchSim.simulate(point_lists).sim.seconds
+
+    meta = dict(plan_settings)
+    meta["source"] = os.path.basename(svg_file)
+    meta["source_sha1"] = sketchCache._file_digest(svg_file)
+    path = plan_path(svg_file, out_dir)
+    DrawPlan(point_lists, estimated, meta).save(path)
+    return svg_file, path, len(point_lists), sum(len(pl) for pl in point_lists), estimated, time.time() - t
+
+
+def compile_directory(svg_dir, out_dir, workers=None, plan_settings=None, verbose=True):
+    """
+    compile every SVG in svg_dir into out_dir, with workers processes. returns the seconds taken, and the file count.
+    """
+    if plan_settings is None:
+        plan_settings = settings()
+    if not os.path.isdir(out_dir):
+        os.makedirs(out_dir)
+    jobs = [(svg_file, out_dir, plan_settings) for svg_file in sorted(glob.glob(os.path.join(svg_dir, "*.svg")))]
+
+    t = time.time()
+    if workers == 1:
+        results = map(compile_file, jobs)
+        pool = None
+    else:
+        import multiprocessing
+
+        pool = multiprocessing.Pool(workers)
+        results = pool.imap_unordered(compile_file, jobs)
+    try:
+        for svg_file, path, strokes, points, estimated, taken in results:
+            if verbose:
+                print("%-24s -> %-28s %5d strokes %7d points  draws in %6.1fs  compiled in %6.3fs" %
+                      (os.path.basename(svg_file), path, strokes, points, estimated, taken))
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return time.time() - t, len(jobs)
+
+
+def main():
+    import sketcher
+
+    parser = argparse.ArgumentParser(description='Compile a folder of SVG files into sketcher draw plans.')
+    parser.add_argument('dir', metavar='folder', type=str, help='folder of svg files')
+    parser.add_argument('--out', metavar='folder', type=str, required=True, help='where to write the plan files')
+    parser.add_argument('--box', metavar='cm', type=float, nargs=2, help='horizontal and vertical centimeters')
+    parser.add_argument('--units-per-point', metavar='cm', type=float, help='way-point spacing')
+    parser.add_argument('--tolerance-cm', metavar='cm', type=float, help='thin out way-points to within this many cm')
+    parser.add_argument('--merge-cm', metavar='cm', type=float, help='skip repeated edges and join paths which meet')
+    parser.add_argument('--fill-width-cm', metavar='cm', type=float, help='draw filled shapes up to this wide as lines')
+    parser.add_argument('--workers', metavar='N', type=int, nargs='+', default=[_cpu_count()],
+                        help='worker processes. several numbers compare their throughput')
+    args = parser.parse_args()
+
+    if args.box is not None:
+        sketcher.BOUNDING_BOX_WIDTH_CM, sketcher.BOUNDING_BOX_HEIGHT_CM = args.box
+    if args.units_per_point is not None:
+        sketcher.UNITS_PER_POINT = args.units_per_point
+    if args.tolerance_cm is not None:
+        sketcher.TOLERANCE_CM = args.tolerance_cm
+    if args.merge_cm is not None:
+        sketcher.MERGE_CM = args.merge_cm
+    if args.fill_width_cm is not None:
+        sketcher.FILL_WIDTH_CM = args.fill_width_cm
+    plan_settings = settings()
+
+    # compile one file first, untimed, so loading the modules it needs isn't counted against the first worker count.
+    if not os.path.isdir(args.out):
+        os.makedirs(args.out)
+    svg_files = sorted(glob.glob(os.path.join(args.dir, "*.svg")))
+    if svg_files:
+        compile_file((svg_files[0], args.out, plan_settings))
+
+    throughput = []
+    for n, workers in enumerate(args.workers):
+        seconds, files = compile_directory(args.dir, args.out, max(1, workers), plan_settings, verbose=(n == 0))
+        throughput.append((workers, files, seconds))
+    print("%8s %8s %10s %10s" % ("workers", "files", "seconds", "files/sec"))
+    for workers, files, seconds in throughput:
+        print("%8d %8d %10.2f %10.2f" % (workers, files, seconds, files / max(seconds, 1e-9)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""
+Batched resampling of SVG paths into evenly-spaced robot way-points.
+
+WWSVG.convert_to_list_of_lists_of_robot_points() walks each path one point at a time in python.
+The "numpy" engine here instead converts every segment of a path to a cubic Bezier,
+evaluates all of them at once on a shared parameter grid, builds a cumulative arc-length table
+over the result, and interpolates the evenly spaced points in a single pass.
+
+If numpy is not installed, or the "wwsvg" engine is requested, the points come from
+WonderPy's WWSVG exactly as they always have.
+
+Run this file directly to benchmark both engines on every file in assets/svg_files:
+  python misc/sketchResample.py
+"""
+
+import argparse
+import glob
+import math
+import os.path
+import time
+
+
+ENGINE_NUMPY = 'numpy'
+ENGINE_WWSVG = 'wwsvg'
+
+
+def _numpy_installed():
+    """
+    whether numpy can be found, without importing it.
+    """
+    try:
+        from importlib.util import find_spec
+    except ImportError:     # Python 2
+        import imp
+        try:
+            imp.find_module('numpy')
+        except ImportError:
+            return False
+        return True
+    return find_spec('numpy') is not None
+
+
+# numpy is only imported once a path is resampled with it, see _numpy(). it takes longer to import
+# than the rest of the sketcher, and a drawing found in the sketch cache doesn't need it at all.
+HAVE_NUMPY = _numpy_installed()
+
+# the default engine used by the sketcher.
+DEFAULT_ENGINE = ENGINE_NUMPY if HAVE_NUMPY else ENGINE_WWSVG
+
+# each segment is evaluated at this many parameter steps for every sample-point of its rough length,
+# within these bounds. more steps gives a more accurate arc-length table.
+STEPS_PER_POINT = 4
+STEPS_MIN       = 8
+STEPS_MAX       = 1024
+
+SVG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "assets", "svg_files")
+
+_np = False
+
+
+def _numpy():
+    """
+    numpy, imported the first time it's needed. None if it isn't installed.
+    """
+    global _np
+    if _np is False:
+        try:
+            import numpy
+            _np = numpy
+        except ImportError:
+            _np = None
+    return _np
+
+
+def _cubic_control_points(seg):
+    """
+    the four control points of seg as a cubic Bezier, or None if seg is not a line or Bezier.
+    """
+    from svgpathtools import Line, QuadraticBezier, CubicBezier
+
+    if isinstance(seg, CubicBezier):
+        return (seg.start, seg.control1, seg.control2, seg.end)
+    if isinstance(seg, QuadraticBezier):
+        c = seg.control
+        return (seg.start, seg.start + (c - seg.start) * (2.0 / 3.0), seg.end + (c - seg.end) * (2.0 / 3.0), seg.end)
+    if isinstance(seg, Line):
+        d = seg.end - seg.start
+        return (seg.start, seg.start + d / 3.0, seg.start + d * (2.0 / 3.0), seg.end)
+    return None
+
+
+def _rough_length(seg):
+    cp = _cubic_control_points(seg)
+    if cp is None:
+        return abs(seg.end - seg.start) * 2.0
+    return abs(cp[1] - cp[0]) + abs(cp[2] - cp[1]) + abs(cp[3] - cp[2])
+
+
+class Fit(object):
+    """
+    the uniform scale and translation which fits SVG coordinates snugly in a bounding-box, centered.
+    SVG's +Y is down the page, so Y is flipped to become the robot's +Y (forward).
+    """
+
+    def __init__(self, svg_bbox, bbox):
+        sx0, sx1, sy0, sy1 = svg_bbox
+        x0, x1, y0, y1 = bbox
+        sw = max(sx1 - sx0, 1e-9)
+        sh = max(sy1 - sy0, 1e-9)
+        self.scale = min((x1 - x0) / sw, (y1 - y0) / sh)
+        self.svg_cx = (sx0 + sx1) * 0.5
+        self.svg_cy = (sy0 + sy1) * 0.5
+        self.cx = (x0 + x1) * 0.5
+        self.cy = (y0 + y1) * 0.5
+
+    def apply(self, xs, ys):
+        return ((xs - self.svg_cx) *  self.scale + self.cx,
+                (ys - self.svg_cy) * -self.scale + self.cy)
+
+
+def read_paths(filename):
+    """
+    read the SVG and return its continuous sub-paths.
+    """
+    from svgpathtools import svg2paths
+
+    paths, _ = svg2paths(filename)
+    ret = []
+    for path in paths:
+        for sub in path.continuous_subpaths():
+            if len(sub) > 0:
+                ret.append(sub)
+    return ret
+
+
+def paths_bbox(paths):
+    x0 = y0 = float('inf')
+    x1 = y1 = float('-inf')
+    for path in paths:
+        px0, px1, py0, py1 = path.bbox()
+        x0, x1 = min(x0, px0), max(x1, px1)
+        y0, y1 = min(y0, py0), max(y1, py1)
+    return x0, x1, y0, y1
+
+
+def sample_path(path, scale):
+    """
+    evaluate every segment of the path on a shared parameter grid.
+    returns a 1D complex array of points along the path, in SVG units.
+    scale converts SVG units to sample-points, and is used to pick the grid density.
+    """
+    np = _numpy()
+    longest = max(_rough_length(seg) for seg in path)
+    steps = int(min(STEPS_MAX, max(STEPS_MIN, math.ceil(longest * scale * STEPS_PER_POINT))))
+
+    t  = np.linspace(0.0, 1.0, steps + 1)
+    mt = 1.0 - t
+    basis = np.stack([mt * mt * mt, 3.0 * mt * mt * t, 3.0 * mt * t * t, t * t * t], axis=1)  # (steps + 1, 4)
+
+    controls = []
+    others   = []
+    for n, seg in enumerate(path):
+        cp = _cubic_control_points(seg)
+        if cp is None:
+            # arcs: no cubic form, so evaluate them directly.
+            others.append(n)
+            cp = (0j, 0j, 0j, 0j)
+        controls.append(cp)
+
+    rows = np.dot(np.array(controls, dtype=complex), basis.T)  # (segments, steps + 1)
+    for n in others:
+        rows[n] = [path[n].point(tt) for tt in t]
+
+    return np.concatenate([rows[0], rows[1:, 1:].ravel()])
+
+
+def resample_points(points, spacing):
+    """
+    given a 1D complex array of points along a path, return evenly spaced points along it
+    as two float arrays (x, y). the first and last points are always included.
+    """
+    np = _numpy()
+    seg_len = np.abs(np.diff(points))
+    cum = np.concatenate([[0.0], np.cumsum(seg_len)])
+    length = cum[-1]
+    num = max(1, int(round(length / spacing)))
+    targets = np.linspace(0.0, length, num + 1)
+    return np.interp(targets, cum, points.real), np.interp(targets, cum, points.imag)
+
+
+def _load_numpy(filename, bbox, units_per_point):
+    paths = read_paths(filename)
+    if not paths:
+        return []
+    fit = Fit(paths_bbox(paths), bbox)
+
+    point_lists = []
+    for path in paths:
+        # resample in SVG units, then transform.
+        xs, ys = resample_points(sample_path(path, fit.scale / units_per_point), units_per_point / fit.scale)
+        xs, ys = fit.apply(xs, ys)
+        point_lists.append(list(zip(xs.tolist(), ys.tolist())))
+    return point_lists
+
+
+def _load_wwsvg(filename, bbox, units_per_point):
+    from WonderPy.util import wwSVG
+
+    wwsvg = wwSVG.WWSVG()
+    wwsvg.read_file(filename)
+    wwsvg.fit_to_bbox(*bbox)
+    return wwsvg.convert_to_list_of_lists_of_robot_points(units_per_point).data
+
+
+def load_point_lists(filename, bbox, units_per_point, engine=DEFAULT_ENGINE):
+    """
+    read an SVG, fit it to bbox (x_min, x_max, y_min, y_max), and return its lists of robot points,
+    one point every units_per_point cm.
+    """
+    if engine == ENGINE_NUMPY and _numpy() is not None:
+        return _load_numpy(filename, bbox, units_per_point)
+    return _load_wwsvg(filename, bbox, units_per_point)
+
+
+def _max_deviation(point_lists_a, point_lists_b):
+    """
+    the largest distance from a point in a to the nearest point in b.
+    """
+    np = _numpy()
+    a = np.array([p for pl in point_lists_a for p in pl], dtype=float)
+    b = np.array([p for pl in point_lists_b for p in pl], dtype=float)
+    if len(a) == 0 or len(b) == 0:
+        return float('nan')
+    worst = 0.0
+    for chunk in np.array_split(a, max(1, len(a) // 512)):
+        d = np.sqrt(((chunk[:, None, :] - b[None, :, :]) ** 2).sum(axis=2)).min(axis=1)
+        worst = max(worst, float(d.max()))
+    return worst
+
+
+def benchmark(svg_dir=SVG_DIR, bbox=(-45.0, 45.0, -25.0, 25.0), units_per_point=0.4, repeats=3):
+    engines = [ENGINE_WWSVG] + ([ENGINE_NUMPY] if HAVE_NUMPY else [])
+    print("%-20s %-6s %8s %8s %10s" % ("file", "engine", "paths", "points", "ms"))
+    for filename in sorted(glob.glob(os.path.join(svg_dir, "*.svg"))):
+        results = {}
+        for engine in engines:
+            best = None
+            for _ in range(repeats):
+                t = time.time()
+                point_lists = load_point_lists(filename, bbox, units_per_point, engine)
+                elapsed = time.time() - t
+                best = elapsed if best is None else min(best, elapsed)
+            results[engine] = point_lists
+            print("%-20s %-6s %8d %8d %10.1f" % (os.path.basename(filename), engine, len(point_lists),
+                                                 sum(len(pl) for pl in point_lists), best * 1000.0))
+        if len(results) == 2:
+            print("%-20s max deviation between engines: %0.3fcm" %
+                  ("", _max_deviation(results[ENGINE_NUMPY], results[ENGINE_WWSVG])))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the SVG resampling engines.')
+    parser.add_argument('--dir', metavar='folder', type=str, default=SVG_DIR, help='folder of svg files')
+    parser.add_argument('--units-per-point', metavar='cm', type=float, default=0.4, help='sample spacing')
+    args = parser.parse_args()
+    benchmark(args.dir, units_per_point=args.units_per_point)
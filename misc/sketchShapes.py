@@ -0,0 +1,256 @@
+"""
+Parametric figures for the Sketch Kit, drawn as one continuous path.
+
+sketchStars.py draws a star with a blocking do_pose() for every edge and every turn, so the robot
+comes to a stop at each vertex and waits for each command to finish before it's sent the next.
+Here each figure is worked out up front as a list of way-points in the global frame, starting
+at the robot and heading the way it faces, and played through WWPath's continuous watermark,
+just as sketcher.py plays an SVG's paths.
+
+star(points, edge_cm)              - a star with an odd number of points, the same as sketchStars.py draws
+polygon(sides, edge_cm)            - a regular polygon, turning left
+spiral(turns, spacing_cm)          - an Archimedean spiral outwards from the robot
+rosette(petals, radius_cm)         - a rose curve, whose petals all meet at the robot
+
+Straight edges get a way-point just after each corner, so the robot turns there rather than along
+the edge, and then one at least every MAX_SPACING_CM. Curves are thinned to within CURVE_TOLERANCE_CM.
+
+Run this file to compare each figure's commands and drawing time with turning and driving one do_pose() at a time,
+in sketchSim.py's model of the robot:
+  python misc/sketchShapes.py
+"""
+
+import argparse
+import math
+
+from WonderPy.core.wwConstants import WWRobotConstants
+import fileHelpers
+import sketcher
+import sketchSimplify
+import sketchSpeed
+
+
+# the step after each corner, over which the robot turns. the same as the sketcher's way-point spacing.
+CORNER_CM = sketcher.UNITS_PER_POINT
+
+# the longest gap between way-points on a straight edge.
+MAX_SPACING_CM = sketchSimplify.MAX_SPACING_CM
+
+# curves are sampled this finely, and then thinned to within CURVE_TOLERANCE_CM.
+CURVE_SAMPLE_CM    = 0.1
+CURVE_TOLERANCE_CM = 0.05
+
+SHAPES = ('star', 'polygon', 'spiral', 'rosette')
+
+
+def _turtle(heading_deg, moves):
+    """
+    the corners of a path which starts at the origin facing heading_deg, and for each (distance, turn_deg)
+    drives the distance and then turns left by turn_deg.
+    """
+    x = y = 0.0
+    heading = heading_deg
+    corners = [(x, y)]
+    for distance, turn_deg in moves:
+        x += distance * math.cos(math.radians(heading))
+        y += distance * math.sin(math.radians(heading))
+        corners.append((x, y))
+        heading += turn_deg
+    return corners
+
+
+def edges(corners, corner_cm=CORNER_CM, max_spacing_cm=MAX_SPACING_CM):
+    """
+    way-points along straight edges between corners.
+    """
+    points = [corners[0]]
+    for a, b in zip(corners[:-1], corners[1:]):
+        length = math.hypot(b[0] - a[0], b[1] - a[1])
+        if length == 0.0:
+            continue
+        stops = [0.0]
+        if length > 2.0 * corner_cm:
+            stops.append(corner_cm)
+        steps = int(math.ceil((length - stops[-1]) / max_spacing_cm))
+        stops += [stops[-1] + (length - stops[-1]) * k / steps for k in range(1, steps + 1)]
+        for s in stops[1:]:
+            t = s / length
+            points.append((a[0] + (b[0] - a[0]) * t, a[1] + (b[1] - a[1]) * t))
+    return points
+
+
+def curve(f, t0, t1, length_cm, sample_cm=CURVE_SAMPLE_CM, tolerance_cm=CURVE_TOLERANCE_CM):
+    """
+    way-points along the curve f(t) for t from t0 to t1, where length_cm is roughly how long it is.
+    """
+    n = max(2, int(math.ceil(length_cm / sample_cm)))
+    points = [f(t0 + (t1 - t0) * k / n) for k in range(n + 1)]
+    return sketchSimplify.simplify(points, tolerance_cm)
+
+
+def _from_robot(points):
+    """
+    move and rotate points so the path starts at the origin and sets off straight ahead, along +Y.
+    """
+    x0, y0 = points[0]
+    points = [(x - x0, y - y0) for x, y in points]
+    for p in points[1:]:
+        if p[0] != 0.0 or p[1] != 0.0:
+            a = math.radians(90.0) - math.atan2(p[1], p[0])
+            c, s = math.cos(a), math.sin(a)
+            return [(x * c - y * s, x * s + y * c) for x, y in points]
+    return points
+
+
+def star_moves(points, edge_cm):
+    """
+    the turns and drives sketchStars.py's do_star() makes: (first turn, [(distance, turn), ..]).
+    """
+    if points % 2 == 0 or points < 3:
+        raise ValueError("a star needs an odd number of points, at least 3")
+    turn_deg = 180.0 * (1.0 - 1.0 / points)
+    half_internal = (180.0 - turn_deg) * 0.5
+    moves = [(edge_cm, turn_deg)] * points
+    # do_star's last turn also undoes the first, so the robot faces the way it started.
+    moves[-1] = (edge_cm, turn_deg + half_internal)
+    return -half_internal, moves
+
+
+def star(points, edge_cm):
+    first_turn, moves = star_moves(points, edge_cm)
+    return edges(_turtle(90.0 + first_turn, moves))
+
+
+def polygon(sides, edge_cm):
+    if sides < 3:
+        raise ValueError("a polygon needs at least 3 sides")
+    return edges(_turtle(90.0, [(edge_cm, 360.0 / sides)] * sides))
+
+
+def spiral(turns, spacing_cm, inner_radius_cm=0.0):
+    """
+    the radius grows by spacing_cm each turn, from inner_radius_cm.
+    """
+    def f(t):
+        r = inner_radius_cm + spacing_cm * t / (2.0 * math.pi)
+        return (r * math.cos(t), r * math.sin(t))
+    length = math.pi * turns * (2.0 * inner_radius_cm + spacing_cm * turns)
+    return _from_robot(curve(f, 0.0, 2.0 * math.pi * turns, length))
+
+
+def rosette(petals, radius_cm):
+    """
+    r = radius_cm * cos(k * t). an odd k draws k petals in half a turn, so even petal counts use k = petals / 2
+    over a whole turn.
+    """
+    if petals < 2:
+        raise ValueError("a rosette needs at least 2 petals")
+    k = float(petals) if petals % 2 else petals * 0.5
+    span = math.pi if petals % 2 else 2.0 * math.pi
+    start = math.pi / (2.0 * k)
+
+    def f(t):
+        r = radius_cm * math.cos(k * t)
+        return (r * math.cos(t), r * math.sin(t))
+    # each petal is a little longer than a circle's diameter, there and back.
+    length = petals * radius_cm * 2.5
+    return _from_robot(curve(f, start, start + span, length))
+
+
+def figure(shape, count, size_cm):
+    """
+    count is the star's points, the polygon's sides, the spiral's turns, or the rosette's petals.
+    size_cm is the edge length, or the spiral's spacing, or the rosette's radius.
+    """
+    if shape == 'star':
+        return star(count, size_cm)
+    if shape == 'polygon':
+        return polygon(count, size_cm)
+    if shape == 'spiral':
+        return spiral(count, size_cm)
+    if shape == 'rosette':
+        return rosette(count, size_cm)
+    raise ValueError("unknown shape: %s" % (shape))
+
+
+def draw(robot, points, path_class=sketchSpeed.ProfiledPath, max_speed_cm_s=None):
+    """
+    draw a figure from where the robot is. the robot's global pose should have been set to the origin first.
+    path_class is sketchSpeed.ProfiledPath, or a stand-in with the same interface such as sketchSim.SimPath.
+    if max_speed_cm_s is set, straight runs are driven up to that fast, as sketchSpeed.py does for the sketcher.
+    """
+    wp = path_class(points)
+    wp.speed_linear_cm_s   = sketcher.DRIVE_SPEED_CM_S
+    wp.speed_angular_deg_s = sketcher.TURN_SPEED_DEG_S
+    wp.do_go_to_start(robot)
+    robot.cmds.accessory.do_sketchkit_pen_down()
+    if max_speed_cm_s is not None:
+        speeds = sketchSpeed.profile(points, sketcher.DRIVE_SPEED_CM_S, sketcher.TURN_SPEED_DEG_S, max_speed_cm_s)
+        wp.step_speeds_cm_s = sketchSpeed.step_speeds(speeds)
+    wp.do_continuous_watermark(robot)
+    robot.cmds.accessory.do_sketchkit_pen_up()
+
+
+def do_stop_and_go(robot, points, speed_cm_s=20.0, turn_seconds=0.5):
+    """
+    draw a list of way-points the way sketchStars.py draws a star: a blocking do_pose() to turn to each
+    way-point, and another to drive to it. for comparison with draw().
+    """
+    mode = WWRobotConstants.WWPoseMode.WW_POSE_MODE_RELATIVE_COMMAND
+    heading = 90.0
+    robot.cmds.accessory.do_sketchkit_pen_down()
+    for a, b in zip(points[:-1], points[1:]):
+        distance = math.hypot(b[0] - a[0], b[1] - a[1])
+        if distance == 0.0:
+            continue
+        h = math.degrees(math.atan2(b[1] - a[1], b[0] - a[0]))
+        turn = (h - heading + 180.0) % 360.0 - 180.0
+        if abs(turn) > 1e-6:
+            robot.cmds.body.do_pose(0, 0, turn, turn_seconds, mode)
+        robot.cmds.body.do_pose(0, distance, 0, distance / speed_cm_s, mode)
+        heading = h
+    robot.cmds.accessory.do_sketchkit_pen_up()
+
+
+def compare(shape, count, size_cm, max_speed_cm_s=None):
+    """
+    simulate a figure drawn continuously and one do_pose() at a time.
+    returns ((commands, seconds) continuous, (commands, seconds) one at a time).
+    """
+    import sketchSim
+    import sketchStars
+
+    points = figure(shape, count, size_cm)
+    results = []
+    for continuous in (True, False):
+        robot = sketchSim.SimRobot()
+        with fileHelpers.quiet():
+            if continuous:
+                draw(robot, points, sketchSim.SimPath, max_speed_cm_s)
+            elif shape == 'star':
+                robot.cmds.accessory.do_sketchkit_pen_down()
+                sketchStars.MyClass().do_star(robot, count, size_cm)
+                robot.cmds.accessory.do_sketchkit_pen_up()
+            else:
+                do_stop_and_go(robot, points)
+        results.append((robot.sim.commands, robot.sim.seconds))
+    return results[0], results[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare drawing figures continuously with one do_pose() at a time.')
+    parser.add_argument('--max-speed-cm-s', metavar='cm/s', type=float, help='drive straight runs up to this fast')
+    args = parser.parse_args()
+
+    figures = [('star', 5, 50.0), ('star', 7, 40.0), ('polygon', 6, 20.0), ('spiral', 4, 5.0), ('rosette', 5, 20.0)]
+    print("%-14s %8s %12s %12s %12s %12s" %
+          ("", "points", "continuous", "seconds", "do_pose", "seconds"))
+    for shape, count, size_cm in figures:
+        (c_commands, c_seconds), (s_commands, s_seconds) = compare(shape, count, size_cm, args.max_speed_cm_s)
+        print("%-14s %8d %12d %12.1f %12d %12.1f" %
+              ("%s %d" % (shape, count), len(figure(shape, count, size_cm)), c_commands, c_seconds,
+               s_commands, s_seconds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,407 @@
+"""
+A headless stand-in for a robot with the Sketch Kit, for measuring the sketcher without hardware.
+
+SimRobot accepts the commands sketcher.py sends (do_pose, do_sketchkit_pen_up/down, and the staged
+light commands), and SimPath stands in for WWPath. Together they drive a simple kinematic model
+at the sketcher's DRIVE_SPEED_CM_S and TURN_SPEED_DEG_S, and report the estimated drawing time,
+the pen-up and pen-down distance, and the number of commands sent.
+The result can be rendered to SVG, and to PNG if PIL is installed.
+
+Simulate one file:
+  python misc/sketchSim.py --file assets/svg_files/octocat.svg --svg-out octocat_sim.svg
+
+Benchmark every file in assets/svg_files, and fail if anything got more than 25% slower than a baseline:
+  python misc/sketchSim.py --bench --json bench.json --baseline previous_bench.json
+"""
+
+import argparse
+import glob
+import json
+import math
+import os
+import sys
+import time
+
+from WonderPy.core.wwConstants import WWRobotConstants
+import fileHelpers
+import sketcher
+
+
+# the time taken to raise or lower the pen. this is a rough estimate.
+PEN_SECONDS = 0.3
+
+SVG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "assets", "svg_files")
+
+
+def _turn_deg(h0, h1):
+    return abs((h1 - h0 + 180.0) % 360.0 - 180.0)
+
+
+class Sim(object):
+    """
+    the kinematic state of the simulated robot.
+    headings are in the math convention: degrees counter-clockwise from +X.
+    the robot starts at the origin facing +Y, which is a pose heading of 0.
+    """
+
+    def __init__(self, linear_cm_s, angular_deg_s):
+        self.linear_cm_s   = linear_cm_s
+        self.angular_deg_s = angular_deg_s
+        self.x         = 0.0
+        self.y         = 0.0
+        self.heading   = 90.0
+        self.pen_down  = False
+        self.seconds   = 0.0
+        self.pen_up_cm   = 0.0
+        self.pen_down_cm = 0.0
+        self.commands  = 0
+        self.pen_lifts = 0
+        self.trails    = []     # list of (pen_down, [(x, y), ..])
+
+    def _trail_point(self):
+        if not self.trails or self.trails[-1][0] != self.pen_down:
+            self.trails.append((self.pen_down, [(self.x, self.y)]))
+        else:
+            self.trails[-1][1].append((self.x, self.y))
+
+    def set_pen(self, down):
+        self.commands += 1
+        self.seconds  += PEN_SECONDS
+        if down != self.pen_down:
+            self.pen_down = down
+            if not down:
+                self.pen_lifts += 1
+            self._trail_point()
+
+    def set_pose(self, x, y, pose_degrees):
+        self.x, self.y = float(x), float(y)
+        self.heading = 90.0 + pose_degrees
+        self.trails.append((self.pen_down, [(self.x, self.y)]))
+
+    def turn_to(self, heading, angular_deg_s=None):
+        self.seconds += _turn_deg(self.heading, heading) / (angular_deg_s or self.angular_deg_s)
+        self.heading = heading
+
+    def move_to(self, x, y, linear_cm_s=None, angular_deg_s=None, continuous=False, min_seconds=0.0):
+        """
+        drive in a straight line to x, y, turning to face it first.
+        if continuous, the turn and the drive overlap, as they do when following a path.
+        """
+        linear_cm_s   = linear_cm_s   or self.linear_cm_s
+        angular_deg_s = angular_deg_s or self.angular_deg_s
+        d = math.hypot(x - self.x, y - self.y)
+        turn_s = 0.0
+        if d > 0:
+            h = math.degrees(math.atan2(y - self.y, x - self.x))
+            turn_s = _turn_deg(self.heading, h) / angular_deg_s
+            self.heading = h
+        drive_s = d / linear_cm_s
+        self.seconds += max(min_seconds, max(turn_s, drive_s) if continuous else turn_s + drive_s)
+
+        if self.pen_down:
+            self.pen_down_cm += d
+        else:
+            self.pen_up_cm += d
+        self.x, self.y = float(x), float(y)
+        self._trail_point()
+
+    def stats(self):
+        return {
+            "drive_s"    : self.seconds,
+            "pen_up_cm"  : self.pen_up_cm,
+            "pen_down_cm": self.pen_down_cm,
+            "commands"   : self.commands,
+            "pen_lifts"  : self.pen_lifts,
+        }
+
+
+class _SimBody(object):
+
+    def __init__(self, sim):
+        self._sim = sim
+
+    def do_pose(self, x, y, degrees, time, mode, *args, **kwargs):
+        sim = self._sim
+        sim.commands += 1
+        if mode == WWRobotConstants.WWPoseMode.WW_POSE_MODE_SET_GLOBAL:
+            sim.set_pose(x, y, degrees)
+            return
+        if mode == WWRobotConstants.WWPoseMode.WW_POSE_MODE_GLOBAL:
+            tx, ty, th = x, y, 90.0 + degrees
+        else:
+            # relative to the robot: +Y is forward, +X is right.
+            h = math.radians(sim.heading - 90.0)
+            tx = sim.x + x * math.cos(h) - y * math.sin(h)
+            ty = sim.y + x * math.sin(h) + y * math.cos(h)
+            th = sim.heading + degrees
+        sim.move_to(tx, ty, min_seconds=time)
+        sim.turn_to(th)
+
+
+class _SimAccessory(object):
+
+    def __init__(self, sim):
+        self._sim = sim
+
+    def do_sketchkit_pen_up(self):
+        self._sim.set_pen(False)
+
+    def do_sketchkit_pen_down(self):
+        self._sim.set_pen(True)
+
+
+class _SimStaged(object):
+    """
+    accepts any stage_foo() command, and counts it.
+    """
+
+    def __init__(self, sim):
+        self._sim = sim
+
+    def __getattr__(self, name):
+        if not name.startswith('stage_'):
+            raise AttributeError(name)
+
+        def stage(*args, **kwargs):
+            self._sim.commands += 1
+        return stage
+
+
+class _SimCmds(object):
+
+    def __init__(self, sim):
+        self.body      = _SimBody(sim)
+        self.accessory = _SimAccessory(sim)
+        self.RGB       = _SimStaged(sim)
+        self.head      = _SimStaged(sim)
+        self.eyering   = _SimStaged(sim)
+
+
+class SimRobot(object):
+
+    def __init__(self, linear_cm_s=sketcher.DRIVE_SPEED_CM_S, angular_deg_s=sketcher.TURN_SPEED_DEG_S):
+        self.name = "sim"
+        self.sim  = Sim(linear_cm_s, angular_deg_s)
+        self.cmds = _SimCmds(self.sim)
+        self.commands = self.cmds
+
+    def has_ability(self, ability, warn=False):
+        return True
+
+    def block_until_button_main_press_and_release(self):
+        pass
+
+    def block_until_sensors(self):
+        pass
+
+
+class SimPath(object):
+    """
+    stands in for sketchSpeed.ProfiledPath: the same attributes and do_foo() methods, driving a SimRobot.
+    each way-point of the continuous path counts as one streamed command.
+    """
+
+    def __init__(self, points):
+        self._points = points
+        self.speed_linear_cm_s   = sketcher.DRIVE_SPEED_CM_S
+        self.speed_angular_deg_s = sketcher.TURN_SPEED_DEG_S
+        self.step_speeds_cm_s    = None
+
+    def do_go_to_start(self, robot):
+        sim = robot.sim
+        sim.commands += 1
+        p0 = self._points[0]
+        sim.move_to(p0[0], p0[1], self.speed_linear_cm_s, self.speed_angular_deg_s)
+        for p in self._points[1:]:
+            if p[0] != p0[0] or p[1] != p0[1]:
+                sim.turn_to(math.degrees(math.atan2(p[1] - p0[1], p[0] - p0[0])), self.speed_angular_deg_s)
+                break
+
+    def do_continuous_watermark(self, robot):
+        sim = robot.sim
+        for n, p in enumerate(self._points[1:]):
+            sim.commands += 1
+            speed = self.speed_linear_cm_s if self.step_speeds_cm_s is None else self.step_speeds_cm_s[n]
+            sim.move_to(p[0], p[1], speed, self.speed_angular_deg_s, continuous=True)
+
+
+def simulate(point_lists):
+    """
+    run sketcher's drawing loop against a SimRobot. returns the robot.
+    """
+    robot = SimRobot()
+    with fileHelpers.quiet():
+        sketcher.MyClass().draw_point_lists(robot, point_lists, path_class=SimPath)
+    return robot
+
+
+def _bounds(trails):
+    xs = [p[0] for _, pts in trails for p in pts]
+    ys = [p[1] for _, pts in trails for p in pts]
+    return min(xs), max(xs), min(ys), max(ys)
+
+
+def write_svg(robot, filename, margin_cm=5.0):
+    """
+    pen-down travel is drawn in black, pen-up travel in dashed red.
+    """
+    x0, x1, y0, y1 = _bounds(robot.sim.trails)
+    x0, x1, y0, y1 = x0 - margin_cm, x1 + margin_cm, y0 - margin_cm, y1 + margin_cm
+    with open(filename, 'w') as f:
+        f.write('<svg xmlns="http://www.w3.org/2000/svg" width="%0.1fcm" height="%0.1fcm" viewBox="%f %f %f %f">\n' %
+                (x1 - x0, y1 - y0, x0, -y1, x1 - x0, y1 - y0))
+        for pen_down, pts in robot.sim.trails:
+            if len(pts) < 2:
+                continue
+            style = 'stroke="black" stroke-width="0.3"' if pen_down else \
+                    'stroke="red" stroke-width="0.15" stroke-dasharray="1,1"'
+            # svg's +Y is down the page.
+            coords = " ".join("%0.2f,%0.2f" % (p[0], -p[1]) for p in pts)
+            f.write('  <polyline fill="none" %s points="%s"/>\n' % (style, coords))
+        f.write('</svg>\n')
+
+
+def write_png(robot, filename, px_per_cm=10, margin_cm=5.0):
+    try:
+        from PIL import Image, ImageDraw
+    except ImportError:
+        print("PIL is not installed, so %s was not written" % (filename))
+        return
+    x0, x1, y0, y1 = _bounds(robot.sim.trails)
+    x0, y1 = x0 - margin_cm, y1 + margin_cm
+    w = int((x1 - x0 + margin_cm * 2) * px_per_cm)
+    h = int((y1 - y0 + margin_cm * 2) * px_per_cm)
+    image = Image.new('RGB', (w, h), 'white')
+    draw = ImageDraw.Draw(image)
+    for pen_down, pts in robot.sim.trails:
+        if len(pts) < 2:
+            continue
+        xy = [((p[0] - x0) * px_per_cm, (y1 - p[1]) * px_per_cm) for p in pts]
+        draw.line(xy, fill='black' if pen_down else (255, 160, 160), width=3 if pen_down else 1)
+    image.save(filename)
+
+
+def run_file(filename):
+    """
+    plan and simulate one file with the sketcher's current settings.
+    returns a dict of results.
+    """
+    sketcher.FILENAME = filename
+    t = time.time()
+    with fileHelpers.quiet():
+        point_lists = sketcher.plan_point_lists()
+    plan_s = time.time() - t
+
+    robot = simulate(point_lists)
+    result = {
+        "file"  : os.path.basename(filename),
+        "paths" : len(point_lists),
+        "points": sum(len(pl) for pl in point_lists),
+        "plan_s": plan_s,
+    }
+    result.update(robot.sim.stats())
+    return result, robot
+
+
+def check_regressions(results, baseline, tolerance):
+    """
+    compare plan_s and drive_s against a previous run. returns a list of complaints.
+    """
+    previous = dict((r["file"], r) for r in baseline["results"])
+    complaints = []
+    for r in results:
+        old = previous.get(r["file"])
+        if old is None:
+            continue
+        for key in ("plan_s", "drive_s"):
+            if r[key] > old[key] * (1.0 + tolerance) and r[key] - old[key] > 0.01:
+                complaints.append("%s: %s went from %0.3f to %0.3f" % (r["file"], key, old[key], r[key]))
+    return complaints
+
+
+def bench(svg_dir, json_out, baseline_file, tolerance):
+    results = []
+    for filename in sorted(glob.glob(os.path.join(svg_dir, "*.svg"))):
+        result, _ = run_file(filename)
+        results.append(result)
+        print("%-20s plan %7.3fs  drive %7.1fs  pen-up %7.1fcm  pen-down %7.1fcm  commands %6d" %
+              (result["file"], result["plan_s"], result["drive_s"], result["pen_up_cm"], result["pen_down_cm"],
+               result["commands"]))
+
+    report = {
+        "settings": {
+            "box_cm"         : [sketcher.BOUNDING_BOX_WIDTH_CM, sketcher.BOUNDING_BOX_HEIGHT_CM],
+            "units_per_point": sketcher.UNITS_PER_POINT,
+            "tolerance_cm"   : sketcher.TOLERANCE_CM,
+            "fill_width_cm"  : sketcher.FILL_WIDTH_CM,
+            "merge_cm"       : sketcher.MERGE_CM,
+            "resampler"      : sketcher.RESAMPLE_ENGINE,
+            "max_speed_cm_s" : sketcher.MAX_DRIVE_SPEED_CM_S,
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if json_out:
+        with open(json_out, 'w') as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if baseline_file:
+        with open(baseline_file) as f:
+            complaints = check_regressions(results, json.load(f), tolerance)
+        for c in complaints:
+            print("REGRESSION %s" % (c))
+        if complaints:
+            return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulate the sketcher without a robot.')
+    parser.add_argument('--file', metavar='file.svg', type=str, help='an svg file to simulate')
+    parser.add_argument('--box', metavar='cm', type=float, nargs=2, help='horizontal and vertical centimeters')
+    parser.add_argument('--tolerance-cm', metavar='cm', type=float, help='thin out way-points to within this many cm')
+    parser.add_argument('--merge-cm', metavar='cm', type=float, help='skip repeated edges and join paths which meet')
+    parser.add_argument('--fill-width-cm', metavar='cm', type=float, help='draw filled shapes up to this wide as lines')
+    parser.add_argument('--max-speed-cm-s', metavar='cm/s', type=float, help='drive straight runs up to this fast')
+    parser.add_argument('--svg-out', metavar='out.svg', type=str, help='render the simulated drawing to svg')
+    parser.add_argument('--png-out', metavar='out.png', type=str, help='render the simulated drawing to png')
+    parser.add_argument('--bench', action='store_true', help='simulate every file in --dir and emit json')
+    parser.add_argument('--dir', metavar='folder', type=str, default=SVG_DIR, help='folder of svg files for --bench')
+    parser.add_argument('--json', metavar='out.json', type=str, help='where to write the --bench json')
+    parser.add_argument('--baseline', metavar='in.json', type=str, help='a previous --bench json to compare with')
+    parser.add_argument('--regression-tolerance', type=float, default=0.25,
+                        help='fraction by which plan or drive time may grow before failing. default 0.25')
+    args = parser.parse_args()
+
+    if args.box is not None:
+        sketcher.BOUNDING_BOX_WIDTH_CM, sketcher.BOUNDING_BOX_HEIGHT_CM = args.box
+    if args.tolerance_cm is not None:
+        sketcher.TOLERANCE_CM = args.tolerance_cm
+    if args.fill_width_cm is not None:
+        sketcher.FILL_WIDTH_CM = args.fill_width_cm
+    if args.merge_cm is not None:
+        sketcher.MERGE_CM = args.merge_cm
+    if args.max_speed_cm_s is not None:
+        sketcher.MAX_DRIVE_SPEED_CM_S = args.max_speed_cm_s
+    # measure the full planning cost every time.
+    sketcher.SKETCH_CACHE = None
+
+    if args.bench:
+        return bench(args.dir, args.json, args.baseline, args.regression_tolerance)
+
+    if args.file is None:
+        parser.error("one of --file or --bench is required")
+
+    result, robot = run_file(args.file)
+    print(json.dumps(result, indent=2, sort_keys=True))
+    if args.svg_out:
+        write_svg(robot, args.svg_out)
+    if args.png_out:
+        write_png(robot, args.png_out)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""
+Adaptive way-point decimation for the sketcher.
+
+The sketcher samples every path at a fixed spacing, so a long straight edge becomes hundreds of
+way-points which all have to be streamed to the robot.
+This thins each path with the Douglas-Peucker algorithm: a point is only kept if dropping it would
+move the drawn line by more than a tolerance. Straight runs collapse to their end-points while curves,
+where the chord deviation grows quickly, keep the points they need.
+A maximum spacing is then enforced so the robot still gets way-points at a regular cadence on long runs.
+
+A point is anything indexable as p[0], p[1].
+"""
+
+import math
+
+
+# the longest gap allowed between way-points after decimation.
+MAX_SPACING_CM = 10.0
+
+
+def _dist_to_segment(p, a, b):
+    ax, ay = a[0], a[1]
+    dx, dy = b[0] - ax, b[1] - ay
+    px, py = p[0] - ax, p[1] - ay
+    len2 = dx * dx + dy * dy
+    if len2 == 0.0:
+        return math.hypot(px, py)
+    t = max(0.0, min(1.0, (px * dx + py * dy) / len2))
+    return math.hypot(px - t * dx, py - t * dy)
+
+
+def douglas_peucker(points, tolerance):
+    """
+    return the indices of the points to keep, in order, so that no dropped point
+    is further than tolerance from the line between its kept neighbours.
+    """
+    n = len(points)
+    if n < 3:
+        return list(range(n))
+
+    keep = [False] * n
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        a, b = points[first], points[last]
+        worst_d = -1.0
+        worst_i = None
+        for i in range(first + 1, last):
+            d = _dist_to_segment(points[i], a, b)
+            if d > worst_d:
+                worst_d, worst_i = d, i
+        if worst_i is not None and worst_d > tolerance:
+            keep[worst_i] = True
+            stack.append((first, worst_i))
+            stack.append((worst_i, last))
+    return [i for i in range(n) if keep[i]]
+
+
+def simplify(points, tolerance, max_spacing=MAX_SPACING_CM):
+    """
+    return a new list of (x, y) way-points along points, decimated to within tolerance cm,
+    with no two consecutive way-points more than max_spacing cm apart.
+    """
+    if len(points) < 3:
+        return [(p[0], p[1]) for p in points]
+
+    kept = [points[i] for i in douglas_peucker(points, tolerance)]
+
+    ret = [(kept[0][0], kept[0][1])]
+    for a, b in zip(kept[:-1], kept[1:]):
+        d = math.hypot(b[0] - a[0], b[1] - a[1])
+        steps = int(math.ceil(d / max_spacing)) if max_spacing > 0 else 1
+        for k in range(1, steps):
+            t = float(k) / steps
+            ret.append((a[0] + (b[0] - a[0]) * t, a[1] + (b[1] - a[1]) * t))
+        ret.append((b[0], b[1]))
+    return ret
+
+
+def simplify_all(point_lists, tolerance, max_spacing=MAX_SPACING_CM, verbose=True):
+    """
+    simplify every path, optionally printing the way-point counts before and after.
+    """
+    ret = []
+    for n, points in enumerate(point_lists):
+        simple = simplify(points, tolerance, max_spacing)
+        if verbose:
+            print("path %d: %d -> %d points" % (n + 1, len(points), len(simple)))
+        ret.append(simple)
+    if verbose:
+        before = sum(len(p) for p in point_lists)
+        after  = sum(len(p) for p in ret)
+        print("all paths: %d -> %d points (tolerance %0.2fcm)" % (before, after, tolerance))
+    return ret
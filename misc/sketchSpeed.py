@@ -0,0 +1,191 @@
+"""
+Variable drive speed along the sketcher's paths: fast on straight runs, as today on corners.
+
+The sketcher drives every path at DRIVE_SPEED_CM_S, which is slow enough for the tightest corner,
+so long straight edges are driven far slower than the robot can manage.
+profile() works out a speed for each way-point instead:
+
+  - the turn at each way-point must take no more than TURN_SPEED_DEG_S, given how far the robot
+    drives while making it, which caps the speed in curves,
+  - a forward pass limits how quickly the speed can rise after each point, and a backward pass
+    how quickly it must fall before the next corner, both by ACCELERATION_CM_S2,
+  - it's never below the sketcher's DRIVE_SPEED_CM_S, so corners are drawn just as they are now,
+    nor above MAX_DRIVE_SPEED_CM_S.
+
+WWPath drives a whole path at one speed. ProfiledPath is a WWPath which gives each pose the duration
+of its own step instead, so a path is still streamed to the robot as a single do_continuous_watermark(),
+without stopping where the speed changes.
+
+Run this file to compare the estimated drawing time with the fixed speed for every file in assets/svg_files:
+  python misc/sketchSpeed.py
+"""
+
+import argparse
+import glob
+import math
+import os
+import time
+
+from WonderPy.util import wwPath
+
+import fileHelpers
+
+
+# the fastest the robot will be asked to drive while drawing.
+# this is a reasonably stable value. (ie, edit with care)
+MAX_DRIVE_SPEED_CM_S = 30
+
+# how quickly the speed may change between way-points.
+ACCELERATION_CM_S2   = 20
+
+SVG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "assets", "svg_files")
+
+
+def _turn_deg(h0, h1):
+    return abs((h1 - h0 + 180.0) % 360.0 - 180.0)
+
+
+def _segments(points):
+    """
+    the length and heading of each step between way-points.
+    """
+    lengths  = []
+    headings = []
+    for n in range(1, len(points)):
+        dx = points[n][0] - points[n - 1][0]
+        dy = points[n][1] - points[n - 1][1]
+        lengths.append(math.hypot(dx, dy))
+        headings.append(math.degrees(math.atan2(dy, dx)))
+    return lengths, headings
+
+
+def profile(points, min_cm_s, turn_deg_s, max_cm_s=MAX_DRIVE_SPEED_CM_S, acceleration=ACCELERATION_CM_S2):
+    """
+    the speed at each way-point, in cm/s. the path starts and ends at min_cm_s.
+    """
+    n = len(points)
+    if n < 2:
+        return [float(min_cm_s)] * n
+    lengths, headings = _segments(points)
+
+    # the turn at each way-point happens over the shorter of the steps either side of it.
+    caps = [float(min_cm_s)] + [float(max_cm_s)] * (n - 2) + [float(min_cm_s)]
+    for k in range(1, n - 1):
+        turn = _turn_deg(headings[k - 1], headings[k])
+        if turn > 0.0:
+            caps[k] = max(min_cm_s, min(max_cm_s, turn_deg_s * min(lengths[k - 1], lengths[k]) / turn))
+
+    speeds = caps
+    for k in range(1, n):
+        reachable = math.sqrt(speeds[k - 1] * speeds[k - 1] + 2.0 * acceleration * lengths[k - 1])
+        if reachable < speeds[k]:
+            speeds[k] = reachable
+    for k in range(n - 2, -1, -1):
+        reachable = math.sqrt(speeds[k + 1] * speeds[k + 1] + 2.0 * acceleration * lengths[k])
+        if reachable < speeds[k]:
+            speeds[k] = reachable
+    return speeds
+
+
+def step_speeds(speeds):
+    """
+    the speed to drive each step between way-points at: the slower of the speeds at its ends.
+    """
+    return [min(a, b) for a, b in zip(speeds[:-1], speeds[1:])]
+
+
+class ProfiledPath(wwPath.WWPath):
+    """
+    a WWPath whose steps can each have their own speed.
+    step_speeds_cm_s is the speed of each step, one fewer than the points, or None to drive them all
+    at speed_linear_cm_s, as WWPath does.
+    """
+
+    def __init__(self, points=None):
+        super(ProfiledPath, self).__init__(points)
+        self.step_speeds_cm_s = None
+
+    def generate_poses(self):
+        poses = super(ProfiledPath, self).generate_poses()
+        if self.step_speeds_cm_s is None:
+            return poses
+        # the first pose is reached from the start of the path, as in WWPath. each later one ends a step.
+        apt = poses[0].apt if poses else 0.0
+        for n in range(1, len(poses)):
+            prev, pose = poses[n - 1], poses[n]
+            turn = _turn_deg(prev.degrees, pose.degrees)
+            dist = math.hypot(pose.x_cm - prev.x_cm, pose.y_cm - prev.y_cm)
+            pose.duration = max(turn / self.speed_angular_deg_s, dist / self.step_speeds_cm_s[n - 1])
+            apt += pose.duration
+            pose.apt = apt
+        return poses
+
+
+def drawing_time_s(points, linear_cm_s, turn_deg_s):
+    """
+    estimate the seconds to follow a path, with the turns overlapping the driving as they do in WWPath.
+    linear_cm_s is one speed for the whole path, or the speed at each way-point.
+    """
+    lengths, headings = _segments(points)
+    t = 0.0
+    heading = headings[0] if headings else 0.0
+    for k, length in enumerate(lengths):
+        speed = linear_cm_s if not isinstance(linear_cm_s, (list, tuple)) else linear_cm_s[k]
+        turn = _turn_deg(heading, headings[k]) if length > 0.0 else 0.0
+        if length > 0.0:
+            heading = headings[k]
+        t += max(length / speed, turn / turn_deg_s)
+    return t
+
+
+def compare(point_lists, drive_cm_s, turn_deg_s, max_cm_s=MAX_DRIVE_SPEED_CM_S):
+    """
+    returns (seconds at the fixed speed, seconds with the profile) for drawing the paths.
+    """
+    fixed = varied = 0.0
+    for points in point_lists:
+        if len(points) < 2:
+            continue
+        speeds = profile(points, drive_cm_s, turn_deg_s, max_cm_s)
+        fixed  += drawing_time_s(points, drive_cm_s, turn_deg_s)
+        varied += drawing_time_s(points, step_speeds(speeds), turn_deg_s)
+    return fixed, varied
+
+
+def report(point_lists, drive_cm_s, turn_deg_s, max_cm_s=MAX_DRIVE_SPEED_CM_S):
+    """
+    print the estimated pen-down drawing time at the fixed speed and with the profile.
+    """
+    fixed, varied = compare(point_lists, drive_cm_s, turn_deg_s, max_cm_s)
+    print("pen-down drawing: estimated %0.1fs at %gcm/s, %0.1fs at up to %gcm/s (%0.1fs saved)" %
+          (fixed, drive_cm_s, varied, max_cm_s, fixed - varied))
+
+
+def bench(svg_dir, max_cm_s):
+    import sketcher
+
+    sketcher.SKETCH_CACHE = None
+    print("%-20s %8s %10s %10s %8s %10s" % ("", "paths", "fixed s", "profiled s", "saved", "profile ms"))
+    for filename in sorted(glob.glob(os.path.join(svg_dir, "*.svg"))):
+        sketcher.FILENAME = filename
+        with fileHelpers.quiet():
+            point_lists = sketcher.plan_point_lists()
+        t = time.time()
+        fixed, varied = compare(point_lists, sketcher.DRIVE_SPEED_CM_S, sketcher.TURN_SPEED_DEG_S, max_cm_s)
+        elapsed = time.time() - t
+        print("%-20s %8d %10.1f %10.1f %7.0f%% %10.1f" %
+              (os.path.basename(filename), len(point_lists), fixed, varied,
+               100.0 * (fixed - varied) / max(fixed, 1e-9), elapsed * 1000.0))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare drawing times at the fixed speed and with a speed profile.")
+    parser.add_argument('--dir', metavar='folder', type=str, default=SVG_DIR, help='folder of svg files')
+    parser.add_argument('--max-speed', metavar='cm/s', type=float, default=MAX_DRIVE_SPEED_CM_S,
+                        help='the fastest the robot may drive')
+    args = parser.parse_args()
+    bench(args.dir, args.max_speed)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,52 @@
+import argparse
 from threading import Thread
-import WonderPy.core.wwMain
 from WonderPy.core.wwConstants import WWRobotConstants
+import robotCache
+import sketchShapes
 
 STAR_NUM_POINTS     =  5
 STAR_EDGE_LENGTH_CM = 50
 
+# the figure to draw, one of sketchShapes.SHAPES. SHAPE_COUNT is its points, sides, turns or petals,
+# and SHAPE_SIZE_CM its edge length, spacing or radius. see sketchShapes.figure().
+SHAPE         = 'star'
+SHAPE_COUNT   = STAR_NUM_POINTS
+SHAPE_SIZE_CM = STAR_EDGE_LENGTH_CM
+
+# if set, the star is drawn the original way: a blocking do_pose() for each edge and each turn,
+# stopping at every vertex. otherwise the figure is drawn as one continuous path.
+STOP_AND_GO   = False
+
 
 class MyClass(object):
 
+    def start(self):
+        import WonderPy.core.wwBTLEMgr
+
+        parser = argparse.ArgumentParser(description='Options.')
+        WonderPy.core.wwBTLEMgr.WWBTLEManager.setup_argument_parser(parser)
+        robotCache.add_arguments(parser)
+        parser.add_argument('--shape', type=str, choices=sketchShapes.SHAPES, help='the figure to draw. default star')
+        parser.add_argument('--count', metavar='N', type=int,
+                                        help="the star's points, the polygon's sides, the spiral's turns or the rosette's petals")
+        parser.add_argument('--size-cm', metavar='cm', type=float,
+                                        help="the edge length, the spiral's spacing or the rosette's radius")
+        parser.add_argument('--stop-and-go', action='store_true',
+                                        help='draw a star one do_pose() at a time, stopping at every vertex')
+        args = parser.parse_args()
+
+        global SHAPE, SHAPE_COUNT, SHAPE_SIZE_CM, STOP_AND_GO
+        if args.shape is not None:
+            SHAPE = args.shape
+        if args.count is not None:
+            SHAPE_COUNT = args.count
+        if args.size_cm is not None:
+            SHAPE_SIZE_CM = args.size_cm
+        STOP_AND_GO = args.stop_and_go
+        if STOP_AND_GO and SHAPE != 'star':
+            raise Exception("--stop-and-go only draws stars")
+        robotCache.start(self, args)
+
     def on_connect(self, robot):
         """
         start threads which emit robot commands based on their own timing, rather than in response to sensor packets.
@@ -20,6 +59,9 @@ class MyClass(object):
 
     def async_1(self, robot):
 
+        # the figure is worked out once, and drawn each time the button is pressed.
+        points = None if STOP_AND_GO else sketchShapes.figure(SHAPE, SHAPE_COUNT, SHAPE_SIZE_CM)
+
         while True:
 
             print("Press the button!")
@@ -28,10 +70,13 @@ class MyClass(object):
             print("Resetting the pose global position to origin")
             robot.cmds.body.do_pose(0, 0, 0, 0, WWRobotConstants.WWPoseMode.WW_POSE_MODE_SET_GLOBAL)
 
+            if points is not None:
+                print("drawing a %s, %d way-points" % (SHAPE, len(points)))
+                sketchShapes.draw(robot, points)
+                continue
+
             robot.cmds.accessory.do_sketchkit_pen_down()
-            global STAR_NUM_POINTS
-            global STAR_EDGE_LENGTH_CM
-            self.do_star(robot, STAR_NUM_POINTS, STAR_EDGE_LENGTH_CM)
+            self.do_star(robot, SHAPE_COUNT, SHAPE_SIZE_CM)
             robot.cmds.accessory.do_sketchkit_pen_up()
 
     def do_star(self, robot, numPoints, edge_length):
@@ -49,7 +94,7 @@ class MyClass(object):
         # turn clockwise away from center by half of one full vertex angle
         robot.cmds.body.do_pose(0, 0, -half_internal, 0.5, WWRobotConstants.WWPoseMode.WW_POSE_MODE_RELATIVE_COMMAND)
 
-        for n in xrange(numPoints):
+        for n in range(numPoints):
             print("driving to vertex %d" % (n + 1))
             robot.cmds.body.do_pose(0, edge_length, 0, edge_length / speed,
                                     WWRobotConstants.WWPoseMode.WW_POSE_MODE_RELATIVE_COMMAND)
@@ -65,4 +110,4 @@ class MyClass(object):
 
 
 if __name__ == "__main__":
-    WonderPy.core.wwMain.start(MyClass())
+    MyClass().start()
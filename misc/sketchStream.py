@@ -0,0 +1,333 @@
+"""
+Streaming SVG loading for the sketcher: the robot starts drawing once the first path is ready.
+
+sketchResample.load_point_lists() reads the whole file, and resamples every path, before the sketcher
+waits for the button, and every path's way-points are held in memory until the drawing is done.
+Here the file is read twice with ElementTree.iterparse, freeing each element once it has been read:
+
+  1. a quick pass which only measures the bounding-box of the paths, since fitting them to the
+     robot's box needs that before any way-points can be placed,
+  2. a pass which yields one path at a time, resampled on a background thread while the robot draws
+     the path before it, with at most LOOKAHEAD_PATHS waiting.
+
+The way-points are the same as the numpy engine's, but the paths come in the order they are in the file,
+since choosing a better order, merging them, or finding centerlines needs every path at once.
+Memory use is that of the few paths in flight, however large the file.
+
+  point_lists = sketchStream.PointListStream(filename, bbox, units_per_point)
+  point_lists.start()                 # optional: start resampling now, eg while waiting for the button
+  for points in point_lists: ...
+
+Run this file to compare the time to the first path, and the peak memory, with loading the whole file:
+  python misc/sketchStream.py
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+import xml.etree.ElementTree as ElementTree
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+try:
+    import tracemalloc
+except ImportError:     # Python 2. the benchmark's memory column is left out.
+    tracemalloc = None
+
+import sketchResample
+import sketchSimplify
+
+
+# how many resampled paths may wait for the robot. more smooths out uneven paths, but holds more memory.
+LOOKAHEAD_PATHS = 2
+
+# the elements svgpathtools' svg2paths() reads, and so the ones drawn.
+SHAPES = ('path', 'polyline', 'polygon', 'line', 'ellipse', 'circle', 'rect')
+
+# time.perf_counter() is Python 3 only.
+_clock = getattr(time, 'perf_counter', time.time)
+
+
+def _local(tag):
+    # '{http://www.w3.org/2000/svg}path' -> 'path'
+    return tag.rsplit('}', 1)[-1]
+
+
+def _path_d(tag, attrib):
+    from svgpathtools import svg_to_paths
+
+    if tag == 'path':
+        return attrib.get('d', '')
+    if tag == 'polyline':
+        return svg_to_paths.polyline2pathd(attrib)
+    if tag == 'polygon':
+        return svg_to_paths.polygon2pathd(attrib, True)
+    if tag == 'line':
+        return 'M' + attrib['x1'] + ' ' + attrib['y1'] + 'L' + attrib['x2'] + ' ' + attrib['y2']
+    if tag in ('ellipse', 'circle'):
+        return svg_to_paths.ellipse2pathd(attrib)
+    return svg_to_paths.rect2pathd(attrib)
+
+
+def iter_path_strings(filename):
+    """
+    yield the path data of each shape in the file, in order. each element is freed once it's been read.
+    """
+    parents = []
+    for event, elem in ElementTree.iterparse(filename, events=('start', 'end')):
+        if event == 'start':
+            parents.append(elem)
+            continue
+        parents.pop()
+        tag = _local(elem.tag)
+        if tag in SHAPES:
+            d = _path_d(tag, elem.attrib)
+            if d:
+                yield d
+        # everything before it has been removed already, so this is the parent's first child.
+        if parents:
+            parents[-1].remove(elem)
+
+
+def iter_subpaths(filename):
+    """
+    yield the continuous sub-paths of the file, as sketchResample.read_paths() returns them.
+    """
+    from svgpathtools import parse_path
+
+    for d in iter_path_strings(filename):
+        for sub in parse_path(d).continuous_subpaths():
+            if len(sub) > 0:
+                yield sub
+
+
+def _axis_extremes(p0, p1, p2, p3):
+    """
+    the parameters in [0, 1] where each cubic, along one axis, turns around. 0 where there's no such place.
+    """
+    np = sketchResample._numpy()
+    a = -p0 + 3.0 * p1 - 3.0 * p2 + p3
+    b = 2.0 * (p0 - 2.0 * p1 + p2)
+    c = p1 - p0
+    disc = np.sqrt(np.maximum(b * b - 4.0 * a * c, 0.0))
+    flat = np.abs(a) < 1e-12
+    safe_a = np.where(flat, 1.0, a)
+    safe_b = np.where(np.abs(b) < 1e-12, 1.0, b)
+    roots = [np.where(flat, -c / safe_b, (-b + disc) / (2.0 * safe_a)),
+             np.where(flat, -c / safe_b, (-b - disc) / (2.0 * safe_a))]
+    return [np.where((t > 0.0) & (t < 1.0), t, 0.0) for t in roots]
+
+
+def path_bbox(path):
+    """
+    path.bbox(), working on all of a path's Beziers at once. arcs are left to svgpathtools.
+    """
+    np = sketchResample._numpy()
+    controls = []
+    x0 = y0 = float('inf')
+    x1 = y1 = float('-inf')
+    for seg in path:
+        cp = sketchResample._cubic_control_points(seg)
+        if cp is None:
+            sx0, sx1, sy0, sy1 = seg.bbox()
+            x0, x1, y0, y1 = min(x0, sx0), max(x1, sx1), min(y0, sy0), max(y1, sy1)
+        else:
+            controls.append(cp)
+    if controls:
+        cp = np.array(controls, dtype=complex)
+        ts = [np.zeros(len(cp)), np.ones(len(cp))]
+        ts += _axis_extremes(cp[:, 0].real, cp[:, 1].real, cp[:, 2].real, cp[:, 3].real)
+        ts += _axis_extremes(cp[:, 0].imag, cp[:, 1].imag, cp[:, 2].imag, cp[:, 3].imag)
+        t = np.stack(ts, axis=1)
+        mt = 1.0 - t
+        points = (cp[:, 0:1] * mt * mt * mt + cp[:, 1:2] * 3.0 * mt * mt * t +
+                  cp[:, 2:3] * 3.0 * mt * t * t + cp[:, 3:4] * t * t * t)
+        x0, x1 = min(x0, float(points.real.min())), max(x1, float(points.real.max()))
+        y0, y1 = min(y0, float(points.imag.min())), max(y1, float(points.imag.max()))
+    return x0, x1, y0, y1
+
+
+def scan(filename):
+    """
+    the bounding-box of the file's paths, in SVG units, and how many there are.
+    """
+    x0 = y0 = float('inf')
+    x1 = y1 = float('-inf')
+    count = 0
+    for path in iter_subpaths(filename):
+        px0, px1, py0, py1 = path_bbox(path)
+        x0, x1 = min(x0, px0), max(x1, px1)
+        y0, y1 = min(y0, py0), max(y1, py1)
+        count += 1
+    return (x0, x1, y0, y1), count
+
+
+def iter_point_lists(filename, fit, units_per_point, tolerance_cm=None):
+    """
+    yield each path's robot way-points in turn.
+    """
+    for path in iter_subpaths(filename):
+        xs, ys = sketchResample.resample_points(sketchResample.sample_path(path, fit.scale / units_per_point),
+                                                units_per_point / fit.scale)
+        xs, ys = fit.apply(xs, ys)
+        points = list(zip(xs.tolist(), ys.tolist()))
+        if tolerance_cm is not None:
+            points = sketchSimplify.simplify(points, tolerance_cm)
+        yield points
+
+
+class _Done(object):
+    pass
+
+
+class Prefetcher(object):
+    """
+    runs a generator on a background thread, keeping at most lookahead of its items ready.
+    an exception in the generator is raised again where the items are taken.
+    """
+
+    def __init__(self, items, lookahead=LOOKAHEAD_PATHS):
+        self._items  = items
+        self._queue  = queue.Queue(maxsize=max(1, lookahead))
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        try:
+            for item in self._items:
+                self._queue.put((item, None))
+        except Exception as e:
+            self._queue.put((_Done, e))
+            return
+        self._queue.put((_Done, None))
+
+    def __iter__(self):
+        while True:
+            item, error = self._queue.get()
+            if error is not None:
+                raise error
+            if item is _Done:
+                return
+            yield item
+
+
+class PointListStream(object):
+    """
+    the way-points of an SVG's paths, fitted to bbox (x_min, x_max, y_min, y_max), produced as they're needed.
+    it has a length, from a first quick pass through the file, but can only be iterated.
+    each iteration reads the file again.
+    """
+
+    def __init__(self, filename, bbox, units_per_point, tolerance_cm=None, lookahead=LOOKAHEAD_PATHS):
+        if not sketchResample.HAVE_NUMPY:
+            raise Exception("streaming needs numpy")
+        self.filename        = filename
+        self.units_per_point = units_per_point
+        self.tolerance_cm    = tolerance_cm
+        self.lookahead       = lookahead
+        svg_bbox, self.count = scan(filename)
+        self.fit             = sketchResample.Fit(svg_bbox, bbox) if self.count else None
+        self._started        = None
+
+    def __len__(self):
+        return self.count
+
+    def start(self):
+        """
+        start resampling the first paths, before they're asked for.
+        """
+        if self._started is None and self.count:
+            self._started = Prefetcher(iter_point_lists(self.filename, self.fit, self.units_per_point,
+                                                        self.tolerance_cm), self.lookahead)
+
+    def __iter__(self):
+        if not self.count:
+            return iter(())
+        self.start()
+        started, self._started = self._started, None
+        return iter(started)
+
+
+def write_synthetic_svg(filename, paths, seed=0, curves_per_path=20):
+    """
+    a file of random curvy paths, for measuring with.
+    """
+    rnd = random.Random(seed)
+    with open(filename, 'w') as f:
+        f.write('<svg xmlns="http://www.w3.org/2000/svg" width="1000" height="600" viewBox="0 0 1000 600">\n')
+        for _ in range(paths):
+            x, y = rnd.uniform(0, 1000), rnd.uniform(0, 600)
+            d = ["M%0.2f,%0.2f" % (x, y)]
+            for _ in range(curves_per_path):
+                d.append("c%0.2f,%0.2f %0.2f,%0.2f %0.2f,%0.2f" % tuple(rnd.uniform(-20, 20) for _ in range(6)))
+            f.write('  <path fill="none" stroke="black" d="%s"/>\n' % (" ".join(d)))
+        f.write('</svg>\n')
+
+
+def _measure(load):
+    """
+    run load(on_path), which calls on_path for each path as it's ready.
+    returns (seconds to the first path, seconds in all, peak bytes allocated).
+    the memory is traced on a second run, as tracing slows everything down. it's None without tracemalloc.
+    """
+    first = [None]
+
+    def on_path(points):
+        if first[0] is None:
+            first[0] = _clock() - t
+    t = _clock()
+    load(on_path)
+    total = _clock() - t
+
+    if tracemalloc is None:
+        return first[0] or 0.0, total, None
+    tracemalloc.start()
+    load(lambda points: None)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return first[0] or 0.0, total, peak
+
+
+def benchmark(sizes=(100, 400, 1600), bbox=(-45.0, 45.0, -25.0, 25.0), units_per_point=0.4):
+    def whole(filename):
+        def load(on_path):
+            for points in sketchResample.load_point_lists(filename, bbox, units_per_point, sketchResample.ENGINE_NUMPY):
+                on_path(points)
+        return load
+
+    def streamed(filename):
+        def load(on_path):
+            for points in PointListStream(filename, bbox, units_per_point):
+                on_path(points)
+        return load
+
+    print("%-8s %-10s %10s %10s %10s" % ("paths", "", "first s", "total s", "peak MB"))
+    directory = tempfile.mkdtemp()
+    # load svgpathtools and numpy's parts first, so they aren't counted against either.
+    warm_up = os.path.join(directory, "warm_up.svg")
+    write_synthetic_svg(warm_up, 2)
+    whole(warm_up)(lambda points: None)
+    streamed(warm_up)(lambda points: None)
+    os.remove(warm_up)
+    for size in sizes:
+        filename = os.path.join(directory, "synthetic_%d.svg" % (size))
+        write_synthetic_svg(filename, size)
+        for label, load in (("whole", whole(filename)), ("streamed", streamed(filename))):
+            first, total, peak = _measure(load)
+            peak_mb = "n/a" if peak is None else "%0.2f" % (peak / 1e6)
+            print("%-8d %-10s %10.3f %10.3f %10s" % (size, label, first, total, peak_mb))
+        os.remove(filename)
+    os.rmdir(directory)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compare streaming an SVG with loading it whole.')
+    parser.add_argument('--paths', metavar='N', type=int, nargs='+', default=[100, 400, 1600],
+                        help='how many paths in each synthetic file')
+    args = parser.parse_args()
+    benchmark(args.paths)
@@ -2,10 +2,17 @@ import sys
 import os.path
 import argparse
 from threading import Thread
-import WonderPy.core.wwMain
 from WonderPy.core.wwConstants import WWRobotConstants
-from WonderPy.util import wwSVG
-from WonderPy.util import wwPath
+import sketchCache
+import sketchFill
+import sketchFleet
+import sketchJob
+import sketchMerge
+import robotCache
+import sketchOrder
+import sketchResample
+import sketchSimplify
+import sketchSpeed
 
 
 # a few example SVG files.
@@ -22,6 +29,9 @@ SVG_FILES = [
 
 FILENAME = os.path.join(os.path.dirname(os.path.abspath(__file__)), SVG_FILES[0])
 
+# if set, a draw plan compiled by sketchPlan.py is drawn instead of FILENAME, and the SVG isn't read at all.
+PLAN_FILE = None
+
 # the SVG will be uniformly scaled and translated to fit snugly in this box.
 # this value may be edited freely.
 BOUNDING_BOX_WIDTH_CM  = 90
@@ -35,11 +45,155 @@ DRIVE_SPEED_CM_S       = 15
 # this is a reasonably stable value. (ie, edit with care)
 TURN_SPEED_DEG_S       = 20
 
+# if set, straight runs are driven faster, up to this many cm/s, while corners are still driven at DRIVE_SPEED_CM_S.
+# see sketchSpeed.py. None means every path is driven at DRIVE_SPEED_CM_S.
+MAX_DRIVE_SPEED_CM_S   = None
+
 # this is the number of centimeters per sample point.
 # bigger numbers mean fewer way-points.
 # this is a reasonably stable value. (ie, edit with care)
 UNITS_PER_POINT        =  0.4
 
+# if set, filled regions no wider than this many centimeters are drawn as a single line down their middle,
+# instead of by tracing their outlines. see "Choosing SVG files" in sketcher.md.
+FILL_WIDTH_CM          = None
+
+# if set, edges which are drawn more than once are only drawn once, and paths whose ends are
+# within this many centimeters of each other are joined into one.
+MERGE_CM               = None
+
+# if set, way-points are thinned so the drawn line moves by no more than this many centimeters.
+# straight runs need far fewer way-points than curves. None means keep every point.
+TOLERANCE_CM           = None
+
+# progress is saved to this file as the robot draws, so an interrupted drawing can be finished with --resume.
+JOB_FILE               = sketchJob.JOB_FILE
+
+# if set, progress is also saved after every this-many way-points within a path, not just after each path.
+# the robot briefly pauses at each of these checkpoints.
+CHECKPOINT_POINTS      = None
+
+# if set, the file is read and resampled one path at a time while the robot draws, in the order the paths
+# are in the file, so the robot starts sooner and large files don't fill memory. see sketchStream.py.
+# the paths are not reordered, merged or filled, and progress is not saved for --resume.
+STREAM                 = False
+
+# resume the interrupted drawing saved in JOB_FILE.
+# if RESUME_IN_PLACE, the robot has not been moved since it stopped. otherwise it's been put back at the origin.
+RESUME                 = False
+RESUME_IN_PLACE        = False
+
+# if set, (K, N): the drawing is split into N regions, one for each robot, plus the seams between them,
+# and only part K is drawn. part N + 1 is the seams. see sketchFleet.py.
+PART                   = None
+
+# how the SVG paths are turned into way-points. see sketchResample.py.
+RESAMPLE_ENGINE = sketchResample.DEFAULT_ENGINE
+
+# parsed and resampled geometry is cached in memory and on disk, keyed by the file contents and the settings above.
+SKETCH_CACHE = sketchCache.SketchCache()
+
+
+def bounding_box():
+    return (BOUNDING_BOX_WIDTH_CM  * -0.5, BOUNDING_BOX_WIDTH_CM  * 0.5,
+            BOUNDING_BOX_HEIGHT_CM * -0.5, BOUNDING_BOX_HEIGHT_CM * 0.5)
+
+
+def load_point_lists():
+    """
+    read FILENAME, fit it to the bounding box, and return its lists of robot points.
+    """
+    bbox = bounding_box()
+
+    def parse():
+        point_lists = sketchResample.load_point_lists(FILENAME, bbox, UNITS_PER_POINT, RESAMPLE_ENGINE)
+        print("loaded '%s'" % FILENAME)
+        return point_lists
+
+    if PLAN_FILE is not None:
+        return load_plan()
+    if SKETCH_CACHE is None:
+        return parse()
+    return SKETCH_CACHE.get_point_lists(FILENAME, bbox, UNITS_PER_POINT, parse, RESAMPLE_ENGINE)
+
+
+def load_plan():
+    """
+    read PLAN_FILE, which is already fitted, thinned and ordered, and return its lists of robot points.
+    """
+    import sketchPlan
+
+    plan = sketchPlan.DrawPlan.load(PLAN_FILE)
+    print("loaded plan '%s' for '%s': %d paths, estimated %0.1fs to draw" %
+          (PLAN_FILE, plan.meta.get("source"), len(plan.point_lists), plan.estimated_seconds))
+    return plan.point_lists
+
+
+def plan_point_lists():
+    """
+    load the drawing and prepare it for the robot: thin the way-points and choose the stroke order.
+    the drawing is loaded from FILENAME, or PLAN_FILE if that's set.
+    """
+    if PLAN_FILE is not None and PART is None:
+        return load_plan()
+    loaded_point_lists = load_point_lists()
+
+    if FILL_WIDTH_CM is not None:
+        loaded_point_lists = sketchFill.centerlines(loaded_point_lists, FILL_WIDTH_CM)
+
+    if MERGE_CM is not None:
+        loaded_point_lists = sketchMerge.merge(loaded_point_lists, MERGE_CM)
+
+    if PART is not None:
+        loaded_point_lists = part_point_lists(loaded_point_lists)
+
+    if TOLERANCE_CM is not None:
+        loaded_point_lists = sketchSimplify.simplify_all(loaded_point_lists, TOLERANCE_CM)
+
+    # choose the stroke order and direction which minimizes pen-up travel.
+    point_lists = sketchOrder.order_strokes(loaded_point_lists)
+    sketchOrder.report(loaded_point_lists, point_lists, DRIVE_SPEED_CM_S, TURN_SPEED_DEG_S)
+    if MAX_DRIVE_SPEED_CM_S is not None:
+        sketchSpeed.report(point_lists, DRIVE_SPEED_CM_S, TURN_SPEED_DEG_S, MAX_DRIVE_SPEED_CM_S)
+    return point_lists
+
+
+def part_point_lists(point_lists):
+    """
+    split the drawing between robots, print where to place each one, and return the point lists of part PART.
+    """
+    part, num_robots = PART
+    parts = sketchFleet.partition(point_lists, num_robots)
+    sketchFleet.report(parts)
+    offset, point_lists = parts[part - 1]
+    if offset is None:
+        print("part %d has nothing to draw." % (part))
+    return point_lists
+
+
+def stream_point_lists():
+    """
+    like plan_point_lists(), but each path is read and resampled as it's about to be drawn.
+    """
+    import sketchStream
+
+    point_lists = sketchStream.PointListStream(FILENAME, bounding_box(), UNITS_PER_POINT, TOLERANCE_CM)
+    print("streaming '%s', %d paths" % (FILENAME, len(point_lists)))
+    return point_lists
+
+
+def _chunks(points, size):
+    """
+    split a path into overlapping stretches of at most size + 1 points, for checkpointing between them.
+    yields (index of the last point of the stretch, stretch). size None means one stretch.
+    """
+    if size is None or len(points) < 2:
+        yield len(points) - 1, points
+        return
+    for k in range(0, len(points) - 1, size):
+        end = min(k + size, len(points) - 1)
+        yield end, points[k:end + 1]
+
 
 class MyClass(object):
 
@@ -47,32 +201,132 @@ class MyClass(object):
         parser = argparse.ArgumentParser(description='Options.')
         self.setup_argument_parser(parser)
         args = self.parse_args(parser)
-        WonderPy.core.wwMain.start(self, args)
+        robotCache.start(self, args)
 
     def setup_argument_parser(_, parser):
+        import WonderPy.core.wwBTLEMgr
+
         WonderPy.core.wwBTLEMgr.WWBTLEManager.setup_argument_parser(parser)
+        robotCache.add_arguments(parser)
         parser.add_argument('--file', metavar='file.svg', type=str,
                                                 help='an svg file for the robot to draw')
+        parser.add_argument('--plan', metavar='file.wwdp', type=str,
+                                                help='draw a plan compiled by sketchPlan.py, instead of an svg file')
         parser.add_argument('--box', metavar='cm', type=float, nargs=2,
                                                 help='horizontal and vertical centimeters. eg "90 60"')
+        parser.add_argument('--no-cache', action='store_true',
+                                                help='always re-read and resample the svg file')
+        parser.add_argument('--fill-width-cm', metavar='cm', type=float,
+                                                help='draw filled shapes up to this wide as single lines. eg "2"')
+        parser.add_argument('--merge-cm', metavar='cm', type=float,
+                                                help='skip repeated edges, and join paths which meet within this many cm. eg "0.3"')
+        parser.add_argument('--tolerance-cm', metavar='cm', type=float,
+                                                help='thin out way-points to within this many cm. eg "0.1"')
+        parser.add_argument('--max-speed-cm-s', metavar='cm/s', type=float,
+                                                help='drive straight runs up to this fast, and corners as usual. eg "30"')
+        parser.add_argument('--stream', action='store_true',
+                                                help='read and resample each path as the one before it is drawn, '
+                                                     'in file order. for large files')
+        parser.add_argument('--resume', action='store_true',
+                                                help='finish the last drawing, which was interrupted. '
+                                                     'put the robot back at the start point, facing forward')
+        parser.add_argument('--resume-in-place', action='store_true',
+                                                help='like --resume, but the robot has not been moved since it stopped')
+        parser.add_argument('--checkpoint-points', metavar='N', type=int,
+                                                help='also save progress every N way-points within a path')
+        parser.add_argument('--part', metavar=('K', 'N'), type=int, nargs=2,
+                                                help='split the drawing between N robots, and draw part K. '
+                                                     'part N + 1 is the seams between the others')
+        parser.add_argument('--resampler', type=str, choices=[sketchResample.ENGINE_NUMPY, sketchResample.ENGINE_WWSVG],
+                                                help='how to turn svg paths into way-points. default is numpy if available')
 
     def parse_args(self, parser):
         args = parser.parse_args()
 
-        if (args.file is not None):
-            global FILENAME
-            FILENAME = args.file
-        print("attempting to sketch SVG file: %s" % (FILENAME))
-        if not os.path.isfile(FILENAME):
-            raise Exception("file not found: %s" % (FILENAME))
+        if args.plan is not None:
+            global PLAN_FILE
+            PLAN_FILE = args.plan
+            print("attempting to sketch plan file: %s" % (PLAN_FILE))
+            if not os.path.isfile(PLAN_FILE):
+                raise Exception("file not found: %s" % (PLAN_FILE))
+            # the box, sampling, thinning and merging were fixed when the plan was compiled.
+            for name in ('box', 'fill_width_cm', 'merge_cm', 'tolerance_cm', 'stream'):
+                if getattr(args, name):
+                    print("--%s is ignored with --plan" % (name.replace('_', '-')))
+                    setattr(args, name, None)
+        else:
+            if (args.file is not None):
+                global FILENAME
+                FILENAME = args.file
+            print("attempting to sketch SVG file: %s" % (FILENAME))
+            if not os.path.isfile(FILENAME):
+                raise Exception("file not found: %s" % (FILENAME))
 
         if (args.box is not None):
             global BOUNDING_BOX_WIDTH_CM
             global BOUNDING_BOX_HEIGHT_CM
             BOUNDING_BOX_WIDTH_CM  = args.box[0]
             BOUNDING_BOX_HEIGHT_CM = args.box[1]
-        print("Bounding box: %0.1fcm wide x %0.1f cm tall (robot at center)" %
-              (BOUNDING_BOX_WIDTH_CM, BOUNDING_BOX_HEIGHT_CM))
+        if PLAN_FILE is None:
+            print("Bounding box: %0.1fcm wide x %0.1f cm tall (robot at center)" %
+                  (BOUNDING_BOX_WIDTH_CM, BOUNDING_BOX_HEIGHT_CM))
+
+        if args.fill_width_cm is not None:
+            global FILL_WIDTH_CM
+            FILL_WIDTH_CM = args.fill_width_cm
+
+        if args.merge_cm is not None:
+            global MERGE_CM
+            MERGE_CM = args.merge_cm
+
+        if args.tolerance_cm is not None:
+            global TOLERANCE_CM
+            TOLERANCE_CM = args.tolerance_cm
+
+        if args.max_speed_cm_s is not None:
+            global MAX_DRIVE_SPEED_CM_S
+            MAX_DRIVE_SPEED_CM_S = args.max_speed_cm_s
+
+        if args.stream:
+            global STREAM
+            STREAM = True
+            if args.fill_width_cm is not None or args.merge_cm is not None:
+                print("--fill-width-cm and --merge-cm need the whole file at once, so are ignored with --stream")
+
+        global RESUME
+        global RESUME_IN_PLACE
+        RESUME_IN_PLACE = args.resume_in_place
+        RESUME          = args.resume or args.resume_in_place
+
+        if args.checkpoint_points is not None:
+            global CHECKPOINT_POINTS
+            CHECKPOINT_POINTS = max(1, args.checkpoint_points)
+
+        if args.part is not None:
+            global PART
+            global JOB_FILE
+            part, num_robots = args.part
+            if num_robots < 1 or not 1 <= part <= num_robots + 1:
+                raise Exception("--part K N needs N of at least 1, and K from 1 to N + 1")
+            # every part's sketcher records its robot as the last one, so the last robot isn't this part's.
+            if args.reconnect_last:
+                raise Exception("--reconnect-last can't be used with --part. use --connect-name to choose each robot")
+            PART = (part, num_robots)
+            # each part's robot saves its own progress.
+            root, ext = os.path.splitext(JOB_FILE)
+            JOB_FILE = "%s-part%dof%d%s" % (root, part, num_robots, ext)
+            if STREAM:
+                print("--part needs the whole file at once, so --stream is ignored")
+                STREAM = False
+
+        if args.resampler is not None:
+            global RESAMPLE_ENGINE
+            RESAMPLE_ENGINE = args.resampler
+        print("resampling with: %s" % (RESAMPLE_ENGINE))
+
+        if args.no_cache:
+            global SKETCH_CACHE
+            SKETCH_CACHE = None
 
         return args
 
@@ -83,53 +337,110 @@ class MyClass(object):
 
         robot.cmds.accessory.do_sketchkit_pen_up()
 
-        while True:
-            wwsvg = wwSVG.WWSVG()
-            wwsvg.read_file(FILENAME)
-            print("loaded '%s'" % FILENAME)
+        resumed = None
+        if RESUME:
+            resumed = sketchJob.SketchJob.load(JOB_FILE)
+            if resumed is None:
+                print("no interrupted drawing to resume, starting from the beginning.")
 
-            wwsvg.fit_to_bbox(BOUNDING_BOX_WIDTH_CM * -0.5, BOUNDING_BOX_WIDTH_CM * 0.5,
-                              BOUNDING_BOX_HEIGHT_CM * -0.5, BOUNDING_BOX_HEIGHT_CM * 0.5)
+        while True:
+            start = (0, 0)
+            if resumed is not None:
+                point_lists = resumed.point_lists
+                start = (resumed.path_index, resumed.point_index)
+                print("resuming '%s' at path %d of %d, point %d." %
+                      (resumed.source, start[0] + 1, len(point_lists), start[1]))
+            elif STREAM:
+                # the first paths are resampled while waiting for the button.
+                point_lists = stream_point_lists()
+                point_lists.start()
+            else:
+                point_lists = plan_point_lists()
 
-            lolop = wwsvg.convert_to_list_of_lists_of_robot_points(UNITS_PER_POINT)
+            if PART is not None and len(point_lists) == 0:
+                # this robot stays off the drawing.
+                return
 
             print("waiting for button..")
             robot.block_until_button_main_press_and_release()
 
-            print("setting global pose to 0, 0, 0")
             self.stage_lights(robot, 0, 1, 0)
 
-            robot.cmds.body.do_pose(0, 0, 0, 0, WWRobotConstants.WWPoseMode.WW_POSE_MODE_SET_GLOBAL)
+            if resumed is not None and RESUME_IN_PLACE:
+                x, y, degrees = resumed.pose
+                print("setting global pose to %0.1f, %0.1f, %0.1f" % (x, y, degrees))
+                robot.cmds.body.do_pose(x, y, degrees, 0, WWRobotConstants.WWPoseMode.WW_POSE_MODE_SET_GLOBAL)
+            else:
+                print("setting global pose to 0, 0, 0")
+                robot.cmds.body.do_pose(0, 0, 0, 0, WWRobotConstants.WWPoseMode.WW_POSE_MODE_SET_GLOBAL)
+
+            job = resumed
+            if job is None and not STREAM:
+                job = sketchJob.SketchJob.create(JOB_FILE, point_lists, source=PLAN_FILE or FILENAME)
+            resumed = None
 
             self.stage_lights(robot, 1, 1, 0)
             robot.block_until_sensors()
             robot.block_until_sensors()
             robot.block_until_sensors()
 
-            self.stage_lights(robot, 0, 0, 0)
-            path_count = 0
-            for point_list in lolop.data:
-                path_count += 1
-                wp = wwPath.WWPath(point_list)
+            self.draw_point_lists(robot, point_lists, job=job, start=start)
+
+    def draw_point_lists(self, robot, point_lists, path_class=sketchSpeed.ProfiledPath, job=None, start=(0, 0)):
+        """
+        draw each path in turn, and then return to the origin.
+        path_class is sketchSpeed.ProfiledPath, or a stand-in with the same interface such as sketchSim.SimPath.
+        if job is given, progress is checkpointed to it as the drawing goes.
+        start is the (path index, point index) to start drawing from, when resuming a job.
+        point_lists may be a sketchStream.PointListStream, which can only be iterated.
+        """
+        self.stage_lights(robot, 0, 0, 0)
+        first_path, first_point = start
+        for path_index, point_list in enumerate(point_lists):
+            if path_index < first_path:
+                continue
+            path_count = path_index + 1
+            offset = first_point if path_index == first_path else 0
+            if offset > 0 and offset >= len(point_list) - 1:
+                continue
+            remaining = point_list[offset:]
+
+            wp = path_class(remaining)
+            wp.speed_linear_cm_s   = DRIVE_SPEED_CM_S
+            wp.speed_angular_deg_s = TURN_SPEED_DEG_S
+            sys.stdout.flush()
+            sys.stdout.write("going to start of path %d of %d.\n" % (path_count, len(point_lists)))
+            wp.do_go_to_start(robot)
+            sys.stdout.write("starting path %d of %d. %d points.." % (path_count, len(point_lists), len(remaining)))
+            self.stage_lights(robot, 0, 0, 1)
+            robot.cmds.accessory.do_sketchkit_pen_down()
+            # hm, twice.
+            robot.cmds.accessory.do_sketchkit_pen_down()
+            self.stage_lights(robot, 0, 1, 1)
+            speeds = None
+            if MAX_DRIVE_SPEED_CM_S is not None:
+                speeds = sketchSpeed.profile(remaining, DRIVE_SPEED_CM_S, TURN_SPEED_DEG_S, MAX_DRIVE_SPEED_CM_S)
+            for end_index, chunk in _chunks(remaining, CHECKPOINT_POINTS):
+                first_index = end_index - (len(chunk) - 1)
+                wp = path_class(chunk)
                 wp.speed_linear_cm_s   = DRIVE_SPEED_CM_S
                 wp.speed_angular_deg_s = TURN_SPEED_DEG_S
-                sys.stdout.flush()
-                sys.stdout.write("going to start of path %d of %d.\n" % (path_count, len(lolop.data)))
-                wp.do_go_to_start(robot)
-                sys.stdout.write("starting path %d of %d. %d points.." % (path_count, len(lolop.data), len(point_list)))
-                self.stage_lights(robot, 0, 0, 1)
-                robot.cmds.accessory.do_sketchkit_pen_down()
-                # hm, twice.
-                robot.cmds.accessory.do_sketchkit_pen_down()
-                self.stage_lights(robot, 0, 1, 1)
+                if speeds is not None:
+                    wp.step_speeds_cm_s = sketchSpeed.step_speeds(speeds[first_index:end_index + 1])
                 wp.do_continuous_watermark(robot)
-                self.stage_lights(robot, 1, 1, 0)
-                robot.cmds.accessory.do_sketchkit_pen_up()
-                self.stage_lights(robot, 1, 0, 0)
-                sys.stdout.write("done\n")
+                if job is not None:
+                    job.save(path_index, offset + end_index, sketchJob.pose_at(robot, remaining, end_index))
+            self.stage_lights(robot, 1, 1, 0)
+            robot.cmds.accessory.do_sketchkit_pen_up()
+            self.stage_lights(robot, 1, 0, 0)
+            if job is not None:
+                job.save(path_index + 1, 0, sketchJob.pose_at(robot, remaining, len(remaining) - 1))
+            sys.stdout.write("done\n")
 
-            robot.cmds.body.do_pose(0, 0, 180, 5, WWRobotConstants.WWPoseMode.WW_POSE_MODE_GLOBAL)
-            self.stage_lights(robot, 0, 0, 0)
+        robot.cmds.body.do_pose(0, 0, 180, 5, WWRobotConstants.WWPoseMode.WW_POSE_MODE_GLOBAL)
+        self.stage_lights(robot, 0, 0, 0)
+        if job is not None:
+            job.finish()
 
     def stage_lights(self, robot, r, g, b):
         robot.cmds.RGB.stage_ear_left (r, g, b)
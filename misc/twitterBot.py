@@ -1,8 +1,17 @@
-import WonderPy.core.wwMain
 from WonderPy.core.wwConstants import WWRobotConstants
-from threading import Thread
-import twitter
-from queue import *
+from threading import Thread, Event
+import argparse
+import time
+import zlib
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+import robotCache
+from twitterGrammar import Direction, ActionType
+import twitterGrammar
+import twitterPlanner
+import twitterLog
 
 '''
 This example requires you to set up a Twitter Application (https://apps.twitter.com/) 
@@ -14,27 +23,25 @@ we are listening to the Twitter account @twitterBot:
 @twitterBot drive forward 40
 @twitterBot drive left 50
 @twitterBot turn right 90
+@twitterBot drive forward 40 then turn left 90
+See twitterGrammar.py for the command grammar.
+
+Tweets flow through a pipeline of threads:
+  twitter stream -> parse -> bounded action queue -> planner -> robot
+                          -> reply queue -> batched, rate-limited replies
+Whatever is waiting in the action queue when the robot is free is planned together, so consecutive turns
+or drives become one longer motion and opposing ones cancel out.
+The action queue is bounded, so when the robot falls behind the stream reader waits rather than
+buffering without limit. Replies are posted by their own worker, so a slow Twitter API call never
+holds up the robot or the stream reader.
+Queued actions are also written to an on-disk log, see ACTION_LOG_DIR and twitterLog.py.
+WonderPy connects each program to a single robot. To serve tweets with several robots, run a twitterBot
+for each one, with --robot K N and --connect-name for its own robot. Each reads the whole stream, but only
+acts on and replies to its share of the tweets, see DISPATCH, and keeps its own action log. If a robot fails,
+its actions wait in its log until its twitterBot is started again.
+See twitterFake.py for running the pipeline against a local stand-in for Twitter.
 '''
 
-class Direction(object):
-    LEFT = 0
-    RIGHT = 1
-    FORWARD = 2
-    BACK = 3
-
-
-class ActionType(object):
-    DRIVE = 0
-    ROTATE = 1
-
-
-DRIVE_ACTION_WORDS = ['GO', 'DRIVE', 'MOVE']
-ROTATE_ACTION_WORDS = ['TURN', 'ROTATE', 'SPIN']
-FORWARD_DIRECTION_WORDS = ['FORWARD']
-BACK_DIRECTION_WORDS = ['BACK']
-LEFT_DIRECTION_WORDS = ['LEFT']
-RIGHT_DIRECTION_WORDS = ['RIGHT']
-
 ROTATION_MAX = 180
 ROTATION_MIN = -180
 DRIVE_MAX = 100
@@ -51,29 +58,111 @@ TWITTER_ACCESS_TOKEN_SECRET = ""
 TWITTER_USERS = [""]
 TWITTER_LANG = ["en"]
 
+# the most actions waiting for the robot. when full, reading from the stream pauses.
+ACTION_QUEUE_SIZE = 20
+
+# the most replies waiting to be posted. when full, new replies are dropped.
+REPLY_QUEUE_SIZE = 100
+
+# replies are gathered for up to this long, and replies to the same tweet are combined into one.
+REPLY_BATCH_SECONDS = 1.0
+
+# the most replies posted per minute, to stay inside Twitter's rate limits.
+REPLIES_PER_MINUTE = 30
 
-def is_numeric(s):
+# queued actions are also kept in an on-disk log here, so a restart carries on where it left off and a tweet
+# delivered twice is only acted on once. see twitterLog.py. None to keep them in memory only.
+ACTION_LOG_DIR = twitterLog.LOG_DIR
+
+# merge the actions waiting in the queue into fewer, longer motions before performing them.
+COALESCE_ACTIONS = True
+
+# how tweets are shared between robots, when there's a twitterBot for each, see --robot:
+#   DISPATCH_TWEET shares them out tweet by tweet.
+#   DISPATCH_AUTHOR sends everything from one Twitter user to the same robot.
+DISPATCH_TWEET = "tweet"
+DISPATCH_AUTHOR = "author"
+DISPATCH = DISPATCH_TWEET
+
+# how often to print the queue depths and latencies. 0 for never.
+METRICS_SECONDS = 30
+
+
+def robot_for(tweet_id, author, num_robots):
     '''
-    Determines if a string is numeric (including negative and decimal numbers)
-    :param s: string to check
-    :return: Bool
+    Which of num_robots serves a tweet, from 1 to num_robots. Every twitterBot works it out the same way
     '''
-    try:
-        float(s)
-        return True
-    except ValueError:
-        return False
+    key = author if DISPATCH == DISPATCH_AUTHOR and author else str(tweet_id)
+    return (zlib.crc32(key.encode('utf-8')) & 0xffffffff) % num_robots + 1
 
 
-class TwitterBot(object):
+def _twitter():
+    '''
+    python-twitter, imported when it's first needed rather than at start-up, as it's slow to import
+    and twitterFake.py runs the pipeline without it.
+    '''
+    import twitter
+    return twitter
+
+
+class PipelineMetrics(object):
+    """
+    queue depths and end-to-end latency, from a tweet arriving to its action finishing.
+    """
+
     def __init__(self):
-        self._action_queue = Queue()
-        self._twitter_api = None
+        self.received   = 0
+        self.performed  = 0
+        self.motions    = 0
+        self.replies_posted  = 0
+        self.replies_dropped = 0
+        self.action_queue_depth = 0
+        self.reply_queue_depth  = 0
+        self.max_action_queue_depth = 0
+        self._latencies = []
+
+    def record_latency(self, seconds):
+        self.performed += 1
+        self._latencies.append(seconds)
+        # keep a recent window.
+        if len(self._latencies) > 1000:
+            del self._latencies[:500]
+
+    def latency_percentile(self, fraction):
+        if not self._latencies:
+            return 0.0
+        values = sorted(self._latencies)
+        return values[min(len(values) - 1, int(fraction * len(values)))]
+
+    def summary(self):
+        return ("received %d, performed %d in %d motions, action queue %d (max %d), reply queue %d, "
+                "replies posted %d dropped %d, latency p50 %0.2fs p99 %0.2fs" %
+                (self.received, self.performed, self.motions, self.action_queue_depth, self.max_action_queue_depth,
+                 self.reply_queue_depth, self.replies_posted, self.replies_dropped,
+                 self.latency_percentile(0.5), self.latency_percentile(0.99)))
+
+
+class TwitterBot(object):
+    def __init__(self, twitter_api=None, share=None):
+        '''
+        :param twitter_api: A python-twitter Api, or a stand-in. None to create one from the keys above
+        :param share: (K, N) to serve robot K's share of the tweets, when N robots each have a twitterBot
+        '''
+        self._twitter_api = twitter_api
+        self._share = share
+        # python-twitter's TwitterError, once the api has been created. none with a stand-in api.
+        self._twitter_error = ()
         self._robot = None
+        self._action_queue = queue.Queue(maxsize=ACTION_QUEUE_SIZE)
+        self._reply_queue = queue.Queue(maxsize=REPLY_QUEUE_SIZE)
+        self._log = None
+        self._async_thread1 = None
+        self._stopping = Event()
+        self.metrics = PipelineMetrics()
 
     def on_connect(self, robot):
         '''
-        Kick off async threads
+        Kick off the pipeline on its own thread
         :param robot: The robot that was connected to
         :return: None
         '''
@@ -84,34 +173,225 @@ class TwitterBot(object):
             print("%s cannot drive! try a different example." % (robot.name))
             return
 
+        if self._async_thread1 is not None:
+            print("already using %s, ignoring %s" % (self._robot.name, robot.name))
+            return
+
         self._robot = robot
-        print("starting async threads for %s" % (self._robot.name))
-        self._async_thread1 = Thread(target=self.action_listener_async)
+        print("starting pipeline for %s" % (self._robot.name))
+        self._async_thread1 = Thread(target=self.run_pipeline)
         self._async_thread1.start()
-        self._async_thread2 = Thread(target=self.twitter_async)
-        self._async_thread2.start()
+
+    def start_thread(self, target, *args):
+        thread = Thread(target=target, args=args)
+        thread.start()
+        return thread
+
+    def run_pipeline(self):
+        '''
+        Reads the twitter stream on this thread, with the action worker, the reply worker and the helpers
+        on their own, until the stream ends
+        :return: None
+        '''
+        action_worker = self.start_thread(self.action_listener_async)
+        reply_worker = self.start_thread(self.reply_sender_async)
+        helpers = [self.start_thread(self.metrics_async)]
+
+        try:
+            if ACTION_LOG_DIR is not None:
+                log_dir = ACTION_LOG_DIR
+                if self._share is not None:
+                    # each robot's twitterBot keeps its own log.
+                    log_dir = "%s-robot%dof%d" % (ACTION_LOG_DIR, self._share[0], self._share[1])
+                self._log = twitterLog.ActionLog(log_dir)
+                helpers.append(self.start_thread(self.log_sync_async))
+                pending = self._log.pending()
+                if pending:
+                    print("replaying %d actions left from last time" % (len(pending)))
+                for key, action in pending:
+                    action["received"] = time.time()
+                    self.metrics.received += 1
+                    self._action_queue.put(action)
+
+            self.twitter_async()
+        finally:
+            # the stream has ended: let the workers finish what's queued.
+            self._action_queue.put(None)
+            action_worker.join()
+            # the reply worker posts what's already queued, then stops. if the queue is full
+            # it stops once the queue is empty instead.
+            self._stopping.set()
+            try:
+                self._reply_queue.put_nowait(None)
+            except queue.Full:
+                pass
+            reply_worker.join()
+            for helper in helpers:
+                helper.join()
+            if self._log is not None:
+                self._log.close()
+            self.update_queue_depths()
+            print("%s: %s" % (self._robot.name, self.metrics.summary()))
+
+    def enqueue_action(self, action):
+        '''
+        Called from the stream reader. Blocks while the action queue is full
+        :param action: The action to queue
+        :return: None
+        '''
+        action["received"] = time.time()
+        if self._log is not None and not self._log.append(action["key"], action):
+            return
+        self.metrics.received += 1
+        self._action_queue.put(action)
+
+    def queue_reply(self, status, tweet_id):
+        '''
+        Queue a reply to a tweet. Safe to call from any thread, and never blocks
+        :param status: The text of the reply
+        :param tweet_id: The id of the tweet to reply to
+        :return: None
+        '''
+        try:
+            self._reply_queue.put_nowait((status, tweet_id))
+        except queue.Full:
+            self.metrics.replies_dropped += 1
 
     def action_listener_async(self):
         '''
-        Performs actions placed on the action queue
+        Performs actions placed on the action queue. Any backlog is planned together, see twitterPlanner.py.
+        If the robot fails, the actions still to come are taken off the queue but not performed
         :return: None
         '''
         print("listening")
-        while True:
-            action = self._action_queue.get(block=True)
-
+        failed = False
+        finished = False
+        while not finished:
+            action = self._action_queue.get()
+            if action is None:
+                break
+
+            actions = [action]
+            while COALESCE_ACTIONS:
+                try:
+                    action = self._action_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if action is None:
+                    finished = True
+                    break
+                actions.append(action)
+
+            if failed:
+                # they stay in the action log, so they're performed when the bot is next started.
+                continue
+            try:
+                self.perform_actions(actions)
+            except Exception as e:
+                failed = True
+                print("%s failed (%s), so no more actions will be performed" % (self._robot.name, e))
+                if self._log is not None:
+                    print("the actions not yet performed are kept in the action log for next time")
+
+    def perform_actions(self, actions):
+        '''
+        Plans actions as a few motions, and performs them
+        :param actions: The actions, in the order they were received
+        :return: None
+        '''
+        for action in actions:
             # Reply to the user telling them their action is about to be performed
-            self._twitter_api.PostUpdate(status="Performing action: " + action["readable"],
-                                         in_reply_to_status_id=action["id"],
-                                         auto_populate_reply_metadata=True)
+            self.queue_reply("Performing action: " + action["readable"], action["id"])
+            print("Performing action: " + action["readable"])
 
+        motions = twitterPlanner.plan(actions, (DRIVE_MIN, DRIVE_MAX), (ROTATION_MIN, ROTATION_MAX))
+        if len(actions) > 1:
+            print("planned %d actions as %d motions" % (len(actions), sum(1 for m in motions if m.value)))
+
+        # an action is done when the last motion it's part of is.
+        last_motion = {}
+        for n, motion in enumerate(motions):
+            for action in motion.actions:
+                last_motion[id(action)] = n
+
+        for n, motion in enumerate(motions):
+            if motion.value:
+                # the robot commands block until the robot is done.
+                self.perform_motion(self._robot, motion)
+                self.metrics.motions += 1
+            for action in motion.actions:
+                if last_motion[id(action)] == n:
+                    if self._log is not None:
+                        self._log.complete(action["key"])
+                    self.metrics.record_latency(time.time() - action["received"])
+
+    def log_sync_async(self):
+        while not self._stopping.wait(twitterLog.FSYNC_SECONDS):
+            self._log.sync()
+
+    def reply_sender_async(self):
+        '''
+        Posts queued replies in batches, combining replies to the same tweet, without exceeding REPLIES_PER_MINUTE.
+        A reply which can't be posted, for whatever reason, is logged and dropped
+        :return: None
+        '''
+        min_interval = 60.0 / REPLIES_PER_MINUTE
+        last_post = 0.0
+        done = False
+        while not done:
+            try:
+                item = self._reply_queue.get(timeout=REPLY_BATCH_SECONDS)
+            except queue.Empty:
+                if self._stopping.is_set():
+                    break
+                continue
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.time() + REPLY_BATCH_SECONDS
+            while True:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._reply_queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    done = True
+                    break
+                batch.append(item)
+
+            combined = {}
+            for status, tweet_id in batch:
+                combined.setdefault(tweet_id, []).append(status)
+
+            for tweet_id, statuses in combined.items():
+                wait = last_post + min_interval - time.time()
+                if wait > 0:
+                    time.sleep(wait)
+                last_post = time.time()
+                try:
+                    self.post_reply("; ".join(statuses), tweet_id)
+                    self.metrics.replies_posted += 1
+                except Exception as e:
+                    print("could not reply to %s: %s" % (tweet_id, e))
+
+    def post_reply(self, status, tweet_id):
+        self._twitter_api.PostUpdate(status=status,
+                                     in_reply_to_status_id=tweet_id,
+                                     auto_populate_reply_metadata=True)
 
-            print("Performing action: " + action["readable"])
+    def metrics_async(self):
+        while METRICS_SECONDS > 0 and not self._stopping.wait(METRICS_SECONDS):
+            self.update_queue_depths()
+            print("%s: %s" % (self._robot.name, self.metrics.summary()))
 
-            if action["type"] == ActionType.DRIVE:
-                self.perform_drive(action["direction"], action["value"])
-            elif action["type"] == ActionType.ROTATE:
-                self.perform_rotate(action["direction"], action["value"])
+    def update_queue_depths(self):
+        self.metrics.action_queue_depth = self._action_queue.qsize()
+        self.metrics.reply_queue_depth = self._reply_queue.qsize()
+        self.metrics.max_action_queue_depth = max(self.metrics.max_action_queue_depth,
+                                                  self.metrics.action_queue_depth)
 
     def twitter_async(self):
         '''
@@ -122,76 +402,56 @@ class TwitterBot(object):
 
         try:
             # Setup the twitter api
-            self._twitter_api = twitter.Api(consumer_key=TWITTER_CONSUMER_KEY,
-                                            consumer_secret=TWITTER_CONSUMER_SECRET,
-                                            access_token_key=TWITTER_ACCESS_TOKEN_KEY,
-                                            access_token_secret=TWITTER_ACCESS_TOKEN_SECRET)
+            if self._twitter_api is None:
+                twitter = _twitter()
+                self._twitter_error = twitter.TwitterError
+                self._twitter_api = twitter.Api(consumer_key=TWITTER_CONSUMER_KEY,
+                                                consumer_secret=TWITTER_CONSUMER_SECRET,
+                                                access_token_key=TWITTER_ACCESS_TOKEN_KEY,
+                                                access_token_secret=TWITTER_ACCESS_TOKEN_SECRET)
 
             print("twitter setup successfully")
 
             for line in self._twitter_api.GetStreamFilter(track=TWITTER_USERS, languages=TWITTER_LANG):
-                self.parse_message(line["text"], line["id"])
-        except twitter.TwitterError:
+                self.parse_message(line["text"], line["id"], line.get("user", {}).get("screen_name"))
+                self.update_queue_depths()
+        except self._twitter_error:
             print("Unauthorized Twitter credentials. Verify Twitter keys and tokens are correct")
 
-    def parse_message(self, message, tweet_id):
+    def parse_message(self, message, tweet_id, author=None):
         '''
         Parses a message and turns it into actions and adds them to the action queue
-        Each action must follow the order <action type> <direction> <value>
+        Each action must follow the order <action type> <direction> <value>, and a message may chain several
         :param message: The message to parse
         :param tweet_id: The id of the tweet that send this message. Used to send response tweets
+        :param author: The screen name of the user who sent it. Used to choose a robot, see DISPATCH
         :return: None
         '''
-        message = message.upper()
-        action = None
-        direction = None
-        value = None
-        readable_action = ""
-
-        for word in message.split():
-            if action == None:
-                if word in DRIVE_ACTION_WORDS:
-                    action = ActionType.DRIVE
-                    readable_action += word.lower() + " "
-                elif word in ROTATE_ACTION_WORDS:
-                    action = ActionType.ROTATE
-                    readable_action += word.lower() + " "
-            elif direction == None:
-                if word in BACK_DIRECTION_WORDS:
-                    direction = Direction.BACK
-                    readable_action += word.lower() + " "
-                elif word in FORWARD_DIRECTION_WORDS:
-                    direction = Direction.FORWARD
-                    readable_action += word.lower() + " "
-                elif word in LEFT_DIRECTION_WORDS:
-                    direction = Direction.LEFT
-                    readable_action += word.lower() + " "
-                elif word in RIGHT_DIRECTION_WORDS:
-                    direction = Direction.RIGHT
-                    readable_action += word.lower() + " "
-            elif value == None and is_numeric(word):
-                value = float(word)
-                readable_action += word + " "
-
-            # We have found an action, direction, and value
-            if action != None and direction != None and value != None:
-                if self.are_params_valid(action, direction, value):
-                    self._action_queue.put({"type": action, "direction": direction, "value": value, "id": tweet_id,
-                                            "readable": readable_action})
-                    print("Added: {0}, {1}, {2}".format(action, direction, value))
-                else:
-                    # Command given is not valid
-                    # Send a reply informing the user
-                    self._twitter_api.PostUpdate(status="Invalid action: " + readable_action,
-                                                 in_reply_to_status_id=tweet_id,
-                                                 auto_populate_reply_metadata=True)
-                    print("Invalid command: {0}".format(readable_action))
-                return
-        # The entire message has been parsed and no message was found
-        # Inform the sender that their message did not contain a valid action
-        self._twitter_api.PostUpdate(status="No valid action received, must specify an action, direction, and value",
-                                     in_reply_to_status_id=tweet_id,
-                                     auto_populate_reply_metadata=True)
+        if self._share is not None and robot_for(tweet_id, author, self._share[1]) != self._share[0]:
+            # another robot's twitterBot serves this one.
+            return
+        if self._log is not None and self._log.seen(tweet_id):
+            print("ignoring tweet %s, it has already been handled" % (tweet_id))
+            return
+
+        commands = twitterGrammar.parse(message)
+        for n, command in enumerate(commands):
+            action, direction, value = command["type"], command["direction"], command["value"]
+            if self.are_params_valid(action, direction, value):
+                command["id"] = tweet_id
+                command["author"] = author
+                command["key"] = twitterLog.action_key(tweet_id, n)
+                self.enqueue_action(command)
+                print("Added: {0}, {1}, {2}".format(action, direction, value))
+            else:
+                # Command given is not valid
+                # Send a reply informing the user
+                self.queue_reply("Invalid action: " + command["readable"], tweet_id)
+                print("Invalid command: {0}".format(command["readable"]))
+        if not commands:
+            # The entire message has been parsed and no action was found
+            # Inform the sender that their message did not contain a valid action
+            self.queue_reply("No valid action received, must specify an action, direction, and value", tweet_id)
 
     def are_params_valid(self, action, direction, value):
         '''
@@ -209,39 +469,46 @@ class TwitterBot(object):
                        value >= ROTATION_MIN and value <= ROTATION_MAX
         return False
 
-    def perform_drive(self, direction, distance):
+    def perform_motion(self, robot, motion):
         '''
-        Performs a drive action
-        :param direction: Direction to drive
-        :param distance: Distance to drive
-        :return: None
-        '''
-
-        if direction == Direction.FORWARD:
-            self._robot.commands.body.do_forward(distance, abs(distance))
-        elif direction == Direction.BACK:
-            self._robot.commands.body.do_forward(-distance, abs(distance))
-        elif direction == Direction.LEFT:
-            # rotate left and drive forward
-            self.perform_rotate(Direction.LEFT, 90)
-            self._robot.commands.body.do_forward(distance, abs(distance))
-        elif direction == Direction.RIGHT:
-            # rotate right and drive forward
-            self.perform_rotate(Direction.RIGHT, 90)
-            self._robot.cmds.body.do_forward(distance, abs(distance))
-
-    def perform_rotate(self, direction, degs):
-        '''
-        Performs a rotation action
-        :param direction: direction to rotate
-        :param degs: degrees to rotate
+        Performs a planned motion
+        :param robot: The robot to move
+        :param motion: A twitterPlanner.Motion
         :return: None
         '''
-        if direction == Direction.LEFT:
-            self._robot.commands.body.do_turn(degs, abs(degs))
-        elif direction == Direction.RIGHT:
-            self._robot.commands.body.do_turn(-degs, abs(degs))
+        if motion.type == twitterPlanner.MotionType.FORWARD:
+            robot.commands.body.do_forward(motion.value, abs(motion.value))
+        elif motion.type == twitterPlanner.MotionType.TURN:
+            robot.commands.body.do_turn(motion.value, abs(motion.value))
+
+
+def main():
+    import WonderPy.core.wwBTLEMgr
+    global DISPATCH
+
+    parser = argparse.ArgumentParser(description='Perform the actions tweeted to TWITTER_USERS.')
+    WonderPy.core.wwBTLEMgr.WWBTLEManager.setup_argument_parser(parser)
+    robotCache.add_arguments(parser)
+    parser.add_argument('--robot', metavar=('K', 'N'), type=int, nargs=2,
+                        help="share the tweets between N robots, each with its own twitterBot, "
+                             "and serve robot K's share")
+    parser.add_argument('--dispatch', choices=[DISPATCH_TWEET, DISPATCH_AUTHOR],
+                        help='how the tweets are shared between robots')
+    args = parser.parse_args()
+
+    share = None
+    if args.robot is not None:
+        k, n = args.robot
+        if n < 1 or not 1 <= k <= n:
+            raise Exception("--robot K N needs N of at least 1, and K from 1 to N")
+        # every robot's twitterBot records its robot as the last one, so the last robot isn't this one's.
+        if args.reconnect_last:
+            raise Exception("--reconnect-last can't be used with --robot. use --connect-name to choose each robot")
+        share = (k, n)
+    if args.dispatch is not None:
+        DISPATCH = args.dispatch
+    robotCache.start(TwitterBot(share=share), args)
 
 
 if __name__ == "__main__":
-    WonderPy.core.wwMain.start(TwitterBot())
+    main()
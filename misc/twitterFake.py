@@ -0,0 +1,141 @@
+"""
+Local stand-ins for Twitter and for the robot, for running twitterBot.py's pipeline without either.
+
+FakeTwitterApi streams a list of synthetic tweets and records the replies posted to it,
+taking a configurable time for each. FakeRobot sleeps for roughly as long as the real robot would take
+to drive or turn, scaled down so a long backlog runs quickly.
+
+  python misc/twitterFake.py --tweets 200 --post-seconds 0.5
+"""
+
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+
+import twitterBot
+
+
+SAMPLE_MESSAGES = [
+    "@twitterBot drive forward 40",
+    "@twitterBot drive back 20",
+    "@twitterBot drive left 50",
+    "@twitterBot turn right 90",
+    "@twitterBot spin left 45",
+    "@twitterBot go right 30",
+    "@twitterBot hello there",
+    "@twitterBot move forward 500",
+    "@twitterBot drive forward 20 then turn left 90",
+]
+
+
+class FakeTwitterApi(object):
+
+    def __init__(self, messages, stream_seconds=0.0, post_seconds=0.0):
+        self.messages       = messages
+        self.stream_seconds = stream_seconds
+        self.post_seconds   = post_seconds
+        self.posted         = []
+
+    def GetStreamFilter(self, track=None, languages=None):
+        for n, (user, text) in enumerate(self.messages):
+            if self.stream_seconds:
+                time.sleep(self.stream_seconds)
+            yield {"id": 1000 + n, "text": text, "user": {"screen_name": user}}
+
+    def PostUpdate(self, status, in_reply_to_status_id=None, auto_populate_reply_metadata=False):
+        if self.post_seconds:
+            time.sleep(self.post_seconds)
+        self.posted.append((in_reply_to_status_id, status))
+
+
+class _FakeBody(object):
+
+    def __init__(self, robot):
+        self._robot = robot
+
+    def do_forward(self, distance, speed):
+        self._robot.check_connected()
+        self._robot.log.append(("forward", distance))
+        time.sleep(abs(distance) / max(abs(speed), 1e-6) * self._robot.time_scale)
+
+    def do_turn(self, degrees, speed):
+        self._robot.check_connected()
+        self._robot.log.append(("turn", degrees))
+        time.sleep(abs(degrees) / max(abs(speed), 1e-6) * self._robot.time_scale)
+
+
+class _FakeCmds(object):
+
+    def __init__(self, robot):
+        self.body = _FakeBody(robot)
+
+
+class FakeRobot(object):
+
+    def __init__(self, name="fake", time_scale=0.01, disconnect_after=None):
+        self.name       = name
+        self.time_scale = time_scale
+        self.log        = []
+        self.cmds       = _FakeCmds(self)
+        self.commands   = self.cmds
+        self.disconnect_after = disconnect_after
+
+    def has_ability(self, ability, warn=False):
+        return True
+
+    def check_connected(self):
+        if self.disconnect_after is not None and len(self.log) >= self.disconnect_after:
+            raise RuntimeError("%s is out of range" % (self.name))
+
+
+def synthetic_messages(count, users=("alice", "bob", "carol"), seed=0):
+    rnd = random.Random(seed)
+    return [(rnd.choice(users), rnd.choice(SAMPLE_MESSAGES)) for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the twitterBot pipeline against fake Twitter and a fake robot.')
+    parser.add_argument('--tweets', type=int, default=100, help='how many tweets to stream')
+    parser.add_argument('--stream-seconds', type=float, default=0.0, help='delay between streamed tweets')
+    parser.add_argument('--post-seconds', type=float, default=0.2, help='how long each reply takes to post')
+    parser.add_argument('--replies-per-minute', type=float, default=600, help='reply rate limit')
+    parser.add_argument('--time-scale', type=float, default=0.01, help='fraction of real time the robot takes')
+    parser.add_argument('--robots', type=int, default=1,
+                        help='how many robots, each with its own twitterBot as with --robot K N')
+    parser.add_argument('--dispatch', choices=[twitterBot.DISPATCH_TWEET, twitterBot.DISPATCH_AUTHOR],
+                        default=twitterBot.DISPATCH, help='how tweets are shared between robots')
+    parser.add_argument('--disconnect-after', type=int, default=None,
+                        help='the first robot fails after this many commands. the actions it has left '
+                             'stay in its action log')
+    parser.add_argument('--action-log', default=None,
+                        help='directory for the action log. by default a temporary one is used and removed afterwards')
+    args = parser.parse_args()
+
+    twitterBot.METRICS_SECONDS = 0
+    twitterBot.REPLIES_PER_MINUTE = args.replies_per_minute
+    twitterBot.DISPATCH = args.dispatch
+    # each robot's log goes next to ACTION_LOG_DIR, so they're all in the temporary directory.
+    log_root = args.action_log or tempfile.mkdtemp(prefix="twitter_log_")
+    twitterBot.ACTION_LOG_DIR = args.action_log or os.path.join(log_root, "actions")
+    api = FakeTwitterApi(synthetic_messages(args.tweets), args.stream_seconds, args.post_seconds)
+    robots = [FakeRobot("fake%d" % (n + 1), args.time_scale, args.disconnect_after if n == 0 else None)
+              for n in range(args.robots)]
+    # as if each robot's twitterBot were run in its own process.
+    bots = [twitterBot.TwitterBot(twitter_api=api, share=(n + 1, args.robots) if args.robots > 1 else None)
+            for n in range(args.robots)]
+    for bot, robot in zip(bots, robots):
+        bot.on_connect(robot)
+    for bot in bots:
+        bot._async_thread1.join()
+    if args.action_log is None:
+        shutil.rmtree(log_root)
+    print("robot commands: %s, replies posted: %d" %
+          (", ".join("%s %d" % (robot.name, len(robot.log)) for robot in robots), len(api.posted)))
+    print("left in the action logs: %s" %
+          (", ".join("%s %d" % (robot.name, len(bot._log)) for bot, robot in zip(bots, robots))))
+
+if __name__ == "__main__":
+    main()
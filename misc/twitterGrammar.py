@@ -0,0 +1,160 @@
+"""
+The command grammar for twitterBot.py.
+
+A command is <action> <direction> <value>, eg "drive forward 40". Other words may appear between the parts
+and are ignored, and a message may chain several commands, eg "drive forward 40 then turn left 90".
+
+The message is upper-cased once and all of its commands are found by a single compiled regular expression,
+so there are no per-word list scans, and numbers are recognized by the expression rather than by trying float()
+and catching errors. The words found are mapped to their meaning with a precomputed table.
+
+Run this file directly to compare its speed against the original one-command parser.
+"""
+
+import random
+import re
+import time
+
+
+class Direction(object):
+    LEFT = 0
+    RIGHT = 1
+    FORWARD = 2
+    BACK = 3
+
+
+class ActionType(object):
+    DRIVE = 0
+    ROTATE = 1
+
+
+DRIVE_ACTION_WORDS = ['GO', 'DRIVE', 'MOVE']
+ROTATE_ACTION_WORDS = ['TURN', 'ROTATE', 'SPIN']
+FORWARD_DIRECTION_WORDS = ['FORWARD']
+BACK_DIRECTION_WORDS = ['BACK']
+LEFT_DIRECTION_WORDS = ['LEFT']
+RIGHT_DIRECTION_WORDS = ['RIGHT']
+
+def _build_roles():
+    roles = {}
+    for words, role in ((DRIVE_ACTION_WORDS     , ActionType.DRIVE),
+                        (ROTATE_ACTION_WORDS    , ActionType.ROTATE),
+                        (FORWARD_DIRECTION_WORDS, Direction.FORWARD),
+                        (BACK_DIRECTION_WORDS   , Direction.BACK),
+                        (LEFT_DIRECTION_WORDS   , Direction.LEFT),
+                        (RIGHT_DIRECTION_WORDS  , Direction.RIGHT)):
+        for word in words:
+            roles[word] = role
+    return roles
+
+
+def _build_command_re():
+    def words(*lists):
+        return "|".join(re.escape(w) for ws in lists for w in ws)
+
+    # each part must be a whole whitespace-separated word, as it was when messages were split().
+    # the lazy gaps mean each part is the first suitable word after the one before.
+    return re.compile(r"(?<!\S)(%s)(?!\S).*?(?<!\S)(%s)(?!\S).*?(?<!\S)([-+]?(?:\d+\.?\d*|\.\d+))(?!\S)" %
+                      (words(DRIVE_ACTION_WORDS, ROTATE_ACTION_WORDS),
+                       words(FORWARD_DIRECTION_WORDS, BACK_DIRECTION_WORDS, LEFT_DIRECTION_WORDS, RIGHT_DIRECTION_WORDS)),
+                      re.DOTALL)
+
+
+_ROLES = _build_roles()
+_COMMAND = _build_command_re()
+
+
+def parse(message):
+    '''
+    Parses a message into its commands
+    :param message: The message to parse
+    :return: A list of dicts with "type", "direction", "value" and "readable", in the order they appear
+    '''
+    return [{"type": _ROLES[action], "direction": _ROLES[direction], "value": float(value),
+             "readable": "%s %s %s " % (action.lower(), direction.lower(), value)}
+            for action, direction, value in _COMMAND.findall(message.upper())]
+
+
+def parse_many(messages):
+    '''
+    Parses a batch of messages
+    :param messages: The messages to parse
+    :return: A list with the list of commands for each message
+    '''
+    return [parse(message) for message in messages]
+
+
+def _legacy_parse(message):
+    '''
+    The original parser from twitterBot.py, kept for comparison. Finds at most one command
+    '''
+    def is_numeric(s):
+        try:
+            float(s)
+            return True
+        except ValueError:
+            return False
+
+    message = message.upper()
+    action = None
+    direction = None
+    value = None
+    readable_action = ""
+    for word in message.split():
+        if action == None:
+            if word in DRIVE_ACTION_WORDS:
+                action = ActionType.DRIVE
+                readable_action += word.lower() + " "
+            elif word in ROTATE_ACTION_WORDS:
+                action = ActionType.ROTATE
+                readable_action += word.lower() + " "
+        elif direction == None:
+            if word in BACK_DIRECTION_WORDS:
+                direction = Direction.BACK
+                readable_action += word.lower() + " "
+            elif word in FORWARD_DIRECTION_WORDS:
+                direction = Direction.FORWARD
+                readable_action += word.lower() + " "
+            elif word in LEFT_DIRECTION_WORDS:
+                direction = Direction.LEFT
+                readable_action += word.lower() + " "
+            elif word in RIGHT_DIRECTION_WORDS:
+                direction = Direction.RIGHT
+                readable_action += word.lower() + " "
+        elif value == None and is_numeric(word):
+            value = float(word)
+            readable_action += word + " "
+        if action != None and direction != None and value != None:
+            return [{"type": action, "direction": direction, "value": value, "readable": readable_action}]
+    return []
+
+
+def synthetic_corpus(count, seed=0):
+    rnd = random.Random(seed)
+    filler = ["@twitterBot", "please", "hey", "robot", "now", "#dash", "quickly", "and", "then", "lol"]
+    actions = DRIVE_ACTION_WORDS + ROTATE_ACTION_WORDS
+    directions = FORWARD_DIRECTION_WORDS + BACK_DIRECTION_WORDS + LEFT_DIRECTION_WORDS + RIGHT_DIRECTION_WORDS
+    corpus = []
+    for _ in range(count):
+        words = [rnd.choice(filler) for _ in range(rnd.randint(1, 6))]
+        words += [rnd.choice(actions).lower(), rnd.choice(directions).lower(), str(rnd.randint(-120, 120))]
+        words += [rnd.choice(filler) for _ in range(rnd.randint(0, 8))]
+        corpus.append(" ".join(words))
+    return corpus
+
+
+def benchmark(count=100000):
+    corpus = synthetic_corpus(count)
+    for name, fn in (("original", lambda: [_legacy_parse(m) for m in corpus]),
+                     ("compiled", lambda: parse_many(corpus))):
+        t = time.time()
+        fn()
+        elapsed = time.time() - t
+        print("%-8s parser: %9.0f messages/sec" % (name, count / elapsed))
+
+    mismatches = sum(1 for m in corpus if _legacy_parse(m) != parse(m)[:1])
+    print("messages where the first command differs: %d of %d" % (mismatches, count))
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,325 @@
+"""
+An on-disk log of twitterBot's actions, so a restart picks up the actions which were still queued,
+and a tweet delivered twice (which the stream can do after reconnecting) is only acted on once.
+
+The log is a directory of append-only segment files. Each record is a small header (length and crc32)
+followed by either "A", the action's key and the action as JSON, or "D" and the key of an action which is done. Writes are buffered and
+fsync'ed in batches, so appending costs little more than a buffered write. When a segment grows past
+SEGMENT_BYTES a new one is started, and if most of what has been logged is done, the log is compacted
+into a single segment holding only the unfinished actions and the most recent done keys.
+
+On opening, the segments are replayed in order to rebuild the index. Replaying only reads keys: the JSON
+of the actions still pending is decoded when they are asked for. A torn record at the end of the last segment,
+from a crash mid-write, is cut off.
+
+Run this file directly to benchmark appending and recovering a 1,000,000 entry log.
+"""
+
+import collections
+import json
+import os
+import shutil
+import struct
+import tempfile
+import time
+import zlib
+from threading import Lock
+
+import fileHelpers
+
+
+LOG_DIR = os.path.join(os.path.expanduser("~"), ".wonderpy", "twitter_log")
+
+# start a new segment file once the current one is this big.
+SEGMENT_BYTES = 16 * 1024 * 1024
+
+# fsync after this many records, or this many seconds, whichever comes first.
+FSYNC_BATCH = 256
+FSYNC_SECONDS = 0.5
+
+# after compacting, remember this many done keys so late duplicates are still ignored.
+DEDUP_KEEP = 10000
+
+_HEADER = struct.Struct('<II')
+_ADD = b'A'[0]
+_DONE = b'D'[0]
+_encode = json.JSONEncoder(separators=(',', ':')).encode
+_decode = json.JSONDecoder().decode
+
+_SEGMENT_SUFFIX = ".log"
+
+try:
+    # Python 2's zlib.crc32 doesn't take a memoryview. a buffer's slices are copies, but it takes those.
+    _view = buffer
+except NameError:
+    _view = memoryview
+
+
+def _crc32(data):
+    # zlib.crc32 is signed on Python 2.
+    return zlib.crc32(data) & 0xffffffff
+
+
+def action_key(tweet_id, n):
+    '''
+    The key for the n'th action in a tweet
+    :param tweet_id: The id of the tweet
+    :param n: Which of the tweet's actions
+    :return: The key
+    '''
+    return "%s/%d" % (tweet_id, n)
+
+
+def _segment_name(number):
+    return "segment-%08d%s" % (number, _SEGMENT_SUFFIX)
+
+
+class ActionLog(object):
+
+    def __init__(self, directory=LOG_DIR, segment_bytes=SEGMENT_BYTES, fsync_batch=FSYNC_BATCH,
+                 fsync_seconds=FSYNC_SECONDS):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.fsync_batch = fsync_batch
+        self.fsync_seconds = fsync_seconds
+        self._lock = Lock()
+        # OrderedDicts, as plain dicts don't keep their order before Python 3.7.
+        self._pending = collections.OrderedDict()   # key -> action, or its undecoded JSON, in the order they were added
+        self._done = collections.OrderedDict()      # key -> None, in the order they were done
+        self._tweets = set()
+        self._file = None
+        self._segment = 0
+        self._unsynced = 0
+        self._last_sync = time.time()
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.replay()
+
+    def _segments(self):
+        names = [n for n in os.listdir(self.directory) if n.startswith("segment-") and n.endswith(_SEGMENT_SUFFIX)]
+        return sorted(int(n[len("segment-"):-len(_SEGMENT_SUFFIX)]) for n in names)
+
+    def _path(self, number):
+        return os.path.join(self.directory, _segment_name(number))
+
+    def replay(self):
+        '''
+        Rebuilds the index from the segments on disk, and opens the last one for appending
+        :return: None
+        '''
+        segments = self._segments()
+        for number in segments:
+            path = self._path(number)
+            with open(path, 'rb') as f:
+                data = f.read()
+            end = self._apply(data)
+            if end < len(data):
+                print("action log: ignoring %d damaged bytes at the end of %s" % (len(data) - end, path))
+                if number == segments[-1]:
+                    with open(path, 'r+b') as f:
+                        f.truncate(end)
+        self._segment = segments[-1] if segments else 1
+        self._file = open(self._path(self._segment), 'ab')
+
+    def _apply(self, data):
+        '''
+        Applies the records in data to the index
+        :return: How much of data held complete records
+        '''
+        pos = 0
+        view = _view(data)
+        while pos + _HEADER.size <= len(data):
+            length, crc = _HEADER.unpack_from(data, pos)
+            start = pos + _HEADER.size
+            payload = view[start:start + length]
+            if len(payload) < length or _crc32(payload) != crc:
+                break
+            if payload[0] == _ADD:
+                split = data.index(b'\n', start)
+                key = bytes(view[start + 1:split]).decode('utf-8')
+                if key not in self._pending and key not in self._done:
+                    self._pending[key] = data[split + 1:start + length]
+                    self._tweets.add(key.split("/")[0])
+            else:
+                key = bytes(payload[1:]).decode('utf-8')
+                self._pending.pop(key, None)
+                self._done[key] = None
+                self._tweets.add(key.split("/")[0])
+            pos = start + length
+        return pos
+
+    def _write(self, key, action=None):
+        if action is None:
+            payload = b'D' + key.encode('utf-8')
+        else:
+            if not isinstance(action, bytes):
+                action = _encode(action).encode('utf-8')
+            payload = b'A' + key.encode('utf-8') + b'\n' + action
+        self._file.write(_HEADER.pack(len(payload), _crc32(payload)) + payload)
+        self._unsynced += 1
+
+    def _sync_locked(self):
+        if self._unsynced:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+        self._last_sync = time.time()
+
+    def _maybe_rotate_locked(self):
+        if self._file.tell() < self.segment_bytes:
+            return
+        self._sync_locked()
+        self._file.close()
+        if len(self._done) > len(self._pending):
+            self._compact_locked()
+        else:
+            self._segment += 1
+            self._file = open(self._path(self._segment), 'ab')
+
+    def seen(self, tweet_id):
+        '''
+        True if actions from this tweet have been logged before
+        :param tweet_id: The id of the tweet
+        :return: Bool
+        '''
+        return str(tweet_id) in self._tweets
+
+    def append(self, key, action):
+        '''
+        Logs an action. Adding a key which is already in the log, pending or done, does nothing
+        :param key: The action's key, see action_key
+        :param action: The action, which must be JSON serializable
+        :return: True if the action was added, False if it was a duplicate
+        '''
+        with self._lock:
+            if key in self._pending or key in self._done:
+                return False
+            self._write(key, action)
+            self._pending[key] = action
+            self._tweets.add(key.split("/")[0])
+            if self._unsynced >= self.fsync_batch or time.time() - self._last_sync >= self.fsync_seconds:
+                self._sync_locked()
+            self._maybe_rotate_locked()
+            return True
+
+    def complete(self, key):
+        '''
+        Marks an action done. It is written at the next sync
+        :param key: The action's key
+        :return: None
+        '''
+        with self._lock:
+            if key not in self._pending:
+                return
+            self._write(key)
+            del self._pending[key]
+            self._done[key] = None
+            self._maybe_rotate_locked()
+
+    def pending(self):
+        '''
+        The actions not yet done, in the order they were added
+        :return: A list of (key, action)
+        '''
+        with self._lock:
+            for key, action in self._pending.items():
+                if isinstance(action, bytes):
+                    self._pending[key] = _decode(action.decode('utf-8'))
+            return list(self._pending.items())
+
+    def sync(self):
+        '''
+        Writes anything buffered to disk
+        :return: None
+        '''
+        with self._lock:
+            self._sync_locked()
+
+    def compact(self):
+        '''
+        Rewrites the log as one segment holding the pending actions and the most recent done keys
+        :return: None
+        '''
+        with self._lock:
+            self._sync_locked()
+            self._file.close()
+            self._compact_locked()
+
+    def _compact_locked(self):
+        old = self._segments()
+        done = list(self._done)[-DEDUP_KEEP:]
+        self._done = collections.OrderedDict.fromkeys(done)
+        self._tweets = set(key.split("/")[0] for key in done)
+        self._tweets.update(key.split("/")[0] for key in self._pending)
+
+        # write the new segment under a temporary name, so a crash part way through leaves the old ones intact.
+        self._segment = (old[-1] if old else 0) + 1
+        tmp = self._path(self._segment) + ".tmp"
+        self._file = open(tmp, 'wb')
+        for key in done:
+            self._write(key)
+        for key, action in self._pending.items():
+            self._write(key, action)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        fileHelpers.replace(tmp, self._path(self._segment))
+        for number in old:
+            os.remove(self._path(number))
+
+        self._file = open(self._path(self._segment), 'ab')
+        self._unsynced = 0
+
+    def close(self):
+        with self._lock:
+            self._sync_locked()
+            self._file.close()
+
+    def __len__(self):
+        return len(self._pending)
+
+
+def benchmark(count=1000000):
+    directory = tempfile.mkdtemp(prefix="twitter_log_")
+    try:
+        log = ActionLog(directory)
+        action = {"type": 0, "direction": 2, "value": 40.0, "readable": "drive forward 40 ", "author": "someone"}
+        t = time.time()
+        for n in range(count):
+            action["id"] = n
+            log.append(action_key(n, 0), dict(action))
+        log.sync()
+        elapsed = time.time() - t
+        print("append:   %d entries in %0.2fs, %0.0f entries/sec, %d segments, %0.1fMB" %
+              (count, elapsed, count / elapsed, len(log._segments()),
+               sum(os.path.getsize(log._path(n)) for n in log._segments()) / 1e6))
+
+        t = time.time()
+        duplicates = sum(1 for n in range(0, count, 100) if not log.append(action_key(n, 0), {"id": n}))
+        print("dedup:    %d of %d repeated entries ignored in %0.3fs" % (duplicates, count // 100, time.time() - t))
+
+        for n in range(count // 2):
+            log.complete(action_key(n, 0))
+        log.close()
+
+        t = time.time()
+        log = ActionLog(directory)
+        print("recover:  %d pending entries in %0.2fs" % (len(log), time.time() - t))
+
+        t = time.time()
+        log.compact()
+        print("compact:  %0.2fs, %0.1fMB left" % (time.time() - t,
+              sum(os.path.getsize(log._path(n)) for n in log._segments()) / 1e6))
+        log.close()
+
+        t = time.time()
+        log = ActionLog(directory)
+        print("recover:  %d pending entries in %0.2fs after compacting" % (len(log), time.time() - t))
+        log.close()
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,106 @@
+"""
+Plans the robot motions for a backlog of twitterBot actions.
+
+Each action becomes one or two motions: a turn, a drive forward, or a turn then a drive forward
+for "drive left" and "drive right". Adjacent motions of the same kind are then merged, so
+"turn left 90, turn right 45" is one 45 degree turn, and "drive forward 40, drive back 40" cancels out
+and the robot doesn't move at all. A merged motion larger than the limits is split back into
+motions which are inside them.
+
+  motions = plan(actions, (DRIVE_MIN, DRIVE_MAX), (ROTATION_MIN, ROTATION_MAX))
+"""
+
+from twitterGrammar import Direction, ActionType
+
+
+class MotionType(object):
+    FORWARD = 0
+    TURN = 1
+
+
+class Motion(object):
+    '''
+    A single robot command, with the actions it performs part of
+    '''
+
+    def __init__(self, type, value, actions):
+        self.type = type
+        self.value = value
+        self.actions = actions
+
+    def __repr__(self):
+        return "Motion(%s, %0.1f, %d actions)" % ("forward" if self.type == MotionType.FORWARD else "turn",
+                                                   self.value, len(self.actions))
+
+
+def action_motions(action):
+    '''
+    The motions for one action. Turns are in degrees counter-clockwise, drives in cm forward
+    :param action: The action, as produced by twitterGrammar.parse
+    :return: A list of (motion type, value)
+    '''
+    value = action["value"]
+    direction = action["direction"]
+    if action["type"] == ActionType.ROTATE:
+        return [(MotionType.TURN, value if direction == Direction.LEFT else -value)]
+    if direction == Direction.FORWARD:
+        return [(MotionType.FORWARD, value)]
+    if direction == Direction.BACK:
+        return [(MotionType.FORWARD, -value)]
+    if direction == Direction.LEFT:
+        return [(MotionType.TURN, 90.0), (MotionType.FORWARD, value)]
+    return [(MotionType.TURN, -90.0), (MotionType.FORWARD, value)]
+
+
+def _split(value, low, high):
+    '''
+    Splits a value into as few equal parts as fit inside [low, high]
+    '''
+    limit = high if value > 0 else -low
+    if limit <= 0:
+        return [value]
+    count = int(-(-abs(value) // limit))
+    return [value / count] * count
+
+
+def _add_actions(actions, new):
+    # actions are compared by identity: two tweets can ask for exactly the same thing.
+    for action in new:
+        if not any(a is action for a in actions):
+            actions.append(action)
+
+
+def plan(actions, drive_limits, rotation_limits):
+    '''
+    Plans the motions for a list of actions, merging adjacent motions of the same kind
+    :param actions: The actions, in the order they were received
+    :param drive_limits: (min, max) cm for a single drive
+    :param rotation_limits: (min, max) degrees for a single turn
+    :return: A list of Motion
+    '''
+    merged = []
+    done = []   # actions whose motions have all cancelled out before anything was merged
+    for action in actions:
+        for type, value in action_motions(action):
+            if merged and merged[-1].type == type:
+                merged[-1].value += value
+                _add_actions(merged[-1].actions, [action])
+            else:
+                merged.append(Motion(type, value, [action]))
+
+            top = merged[-1]
+            if top.type == MotionType.TURN:
+                # only the final heading matters, so turn the short way round.
+                top.value = (top.value + 180.0) % 360.0 - 180.0
+            if abs(top.value) < 1e-9:
+                # opposing motions have cancelled out. the motions either side may now merge,
+                # and the actions are finished once the motion before is.
+                merged.pop()
+                _add_actions(merged[-1].actions if merged else done, top.actions)
+
+    motions = [Motion(MotionType.FORWARD, 0.0, done)] if done else []
+    for motion in merged:
+        low, high = rotation_limits if motion.type == MotionType.TURN else drive_limits
+        for value in _split(motion.value, low, high):
+            motions.append(Motion(motion.type, value, motion.actions))
+    return motions
@@ -1,4 +1,3 @@
-import math
 import WonderPy.core.wwMain
 from WonderPy.util import wwMath
 
@@ -25,6 +24,25 @@ Basic steps:
 
 class MyClass(object):
 
+    # map from the robots four buttons to indices of the eyering array.
+    # the LED at the top of the eye-ring (12 O'Clock) is index 0, increasing clockwise to 11.
+    # this will be used so that each of the three minor buttons light up a segment of 3 LEDs,
+    # and the main button lights up the remaining 3.
+    # it's worked out once here, rather than every time sensors arrive.
+    # misc/frameHelpers.py has the same table as DEFAULT_BUTTON_LEDS, with ButtonLEDs to apply it,
+    # but the tutorials only use WonderPy itself, so the table and the loop are written out here.
+    BUTTON_LEDS = (
+        ('button_1'   , ( 7, 8,  9)),
+        ('button_2'   , ( 3, 4,  5)),
+        ('button_3'   , (11, 0,  1)),
+        ('button_main', ( 2, 6, 10)),
+    )
+
+    def __init__(self):
+        # an array of 12 booleans, one for each LED in the eyering.
+        # it's made once and updated in place each time sensors arrive.
+        self.LEDs = [False] * 12
+
     def on_connect(self, robot):
         """
         Called when we connect to a robot. This method is optional. Do not Block in this method !
@@ -40,24 +58,12 @@ class MyClass(object):
         This means only call the stage_foo() flavor of robot commands, and not the do_foo() versions.
         """
 
-        # map from the robots four buttons to indices of the eyering array.
-        # the LED at the top of the eye-ring (12 O'Clock) is index 0, increasing clockwise to 11.
-        # this will be used so that each of the three minor buttons light up a segment of 3 LEDs,
-        # and the main button lights up the remaining 3.
-        dict = {
-            robot.sensors.button_1   : ( 7, 8,  9),
-            robot.sensors.button_2   : ( 3, 4,  5),
-            robot.sensors.button_3   : (11, 0,  1),
-            robot.sensors.button_main: ( 2, 6, 10),
-        }
-
-        # create an array of 12 booleans according to which buttons are pressed.
-        # there's probably a more pythonic way to do this.
-        LEDs = [False] * 12
-        for button in dict:
-            if button.pressed:
-                for index in dict[button]:
-                    LEDs[index] = True
+        # set the 12 booleans according to which buttons are pressed.
+        LEDs = self.LEDs
+        for button_name, indices in self.BUTTON_LEDS:
+            pressed = getattr(robot.sensors, button_name).pressed
+            for index in indices:
+                LEDs[index] = pressed
 
         # stage the command on the robot.
         # "staged" commands are saved up and only actually sent after a set of sensors is received.
@@ -66,12 +72,14 @@ class MyClass(object):
 
         # more fun: let's convert the 3 axes of the accelerometer to an RGB color.
         # the accelerometer reports 1.0 for "z" when the robot is at rest.
-        # we raise the value to the 3rd power to push small values closer to zero,
+        # we raise the value to the 3rd power (x * x * x is quicker than math.pow) to push small values closer to zero,
         # and then clamp to the range [0, 1].
         # this means that if the robot is say upside down, r g and b should all be 0.
-        r = wwMath.clamp01(math.pow(robot.sensors.accelerometer.x, 3))
-        g = wwMath.clamp01(math.pow(robot.sensors.accelerometer.y, 3))
-        b = wwMath.clamp01(math.pow(robot.sensors.accelerometer.z, 3))
+        accelerometer = robot.sensors.accelerometer
+        x, y, z = accelerometer.x, accelerometer.y, accelerometer.z
+        r = wwMath.clamp01(x * x * x)
+        g = wwMath.clamp01(y * y * y)
+        b = wwMath.clamp01(z * z * z)
         robot.cmds.RGB.stage_all(r, g, b)
 
 